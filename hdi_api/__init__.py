@@ -1,2 +1,8 @@
 from . import controllers
 from . import models
+
+
+def _post_load():
+    # Nạp sẵn registry/cache cho hdi_api_preload_databases khi khởi động (cần --load=...,hdi_api)
+    from .utils import prewarm
+    prewarm.install()
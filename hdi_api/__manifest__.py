@@ -9,10 +9,13 @@
     'depends': [
         'base',
         'web',
+        'bus',
         'hr_attendance',
         'hr',
         'hdi_hr',
         'hdi_hr_payroll',
+        'hdi_attendance_excuse',
+        'hdi_base',
     ],
     'external_dependencies': {
         'python': ['pyjwt', 'werkzeug'],
@@ -20,7 +23,9 @@
     'data': [
         'security/ir.model.access.csv',
         'data/jwt_token_blacklist_cron.xml',
+        'data/api_sync_tombstone_cron.xml',
     ],
+    'post_load': '_post_load',
     'installable': True,
     'auto_install': False,
 }
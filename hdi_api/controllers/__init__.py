@@ -4,3 +4,8 @@ from . import attendance_excuse_controller
 from . import employee_controller
 from . import time_off_controller
 from . import payslip_controller
+from . import batch_controller
+from . import home_controller
+from . import sync_controller
+from . import metrics_controller
+from . import event_controller
@@ -7,8 +7,15 @@ import json
 from datetime import datetime, timedelta
 from odoo import http
 from odoo.http import request
-
-from .auth_controller import _verify_token
+from odoo.addons.hdi_base.models.keyset_pagination_mixin import InvalidCursorError
+from odoo.addons.hdi_attendance_excuse.models.hr_attendance import (
+    MAX_PUNCHES_PER_REQUEST, PUNCH_ACCEPTED, PUNCH_DUPLICATE, PUNCH_REJECTED,
+)
+
+from .auth_controller import _verify_token, _verify_token_readonly, _get_bool_param
+from .home_controller import invalidate_home_cache
+from ..utils import api_cache
+from ..utils.db_session import get_env
 from ..utils.response_formatter import ResponseFormatter
 
 _logger = logging.getLogger(__name__)
@@ -17,16 +24,6 @@ _logger = logging.getLogger(__name__)
 class AttendanceAPI(http.Controller):
     """API endpoints cho chấm công"""
 
-    def _get_env(self):
-        """Lấy environment từ token"""
-        db_name = request.jwt_payload.get('db')
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-        cr = registry.cursor()
-        return odoo.api.Environment(cr, odoo.SUPERUSER_ID, {}), cr
-
     def _get_request_data(self):
         """Lấy dữ liệu từ request (hỗ trợ JSON và form data)"""
         try:
@@ -52,22 +49,18 @@ class AttendanceAPI(http.Controller):
         """Chấm công vào"""
         try:
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
 
-            try:
-                # Lấy GPS coordinates từ request (hỗ trợ cả JSON và form data)
-                data = self._get_request_data()
-                in_latitude = data.get('in_latitude')
-                in_longitude = data.get('in_longitude')
+            # Lấy GPS coordinates từ request (hỗ trợ cả JSON và form data)
+            data = self._get_request_data()
+            in_latitude = data.get('in_latitude')
+            in_longitude = data.get('in_longitude')
 
-                employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
-                result = env['hr.attendance'].api_check_in(employee.id, in_latitude, in_longitude)
-                cr.commit()
+            employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+            result = env['hr.attendance'].api_check_in(employee.id, in_latitude, in_longitude)
+            invalidate_home_cache(env, user_id)
 
-                return ResponseFormatter.success_response('Chấm công vào thành công', result, ResponseFormatter.HTTP_OK)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Chấm công vào thành công', result, ResponseFormatter.HTTP_OK)
 
         except Exception as e:
             _logger.error(f"Check-in error: {str(e)}", exc_info=True)
@@ -80,199 +73,249 @@ class AttendanceAPI(http.Controller):
         """Chấm công ra"""
         try:
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
-
-            try:
-                # Lấy GPS coordinates từ request
-                data = self._get_request_data()
-                out_latitude = data.get('out_latitude')
-                out_longitude = data.get('out_longitude')
-                
-                _logger.info(f"Check-out data received: out_latitude={out_latitude}, out_longitude={out_longitude}")
-                
-                employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
-                result = env['hr.attendance'].api_check_out(employee.id, out_latitude, out_longitude)
-                cr.commit()
-                
-                _logger.info(f"Check-out result: {result}")
-                
-                return ResponseFormatter.success_response('Chấm công ra thành công', result, ResponseFormatter.HTTP_OK)
-            except Exception as e:
-                cr.rollback()
-                raise
+            env = get_env()
+
+            # Lấy GPS coordinates từ request
+            data = self._get_request_data()
+            out_latitude = data.get('out_latitude')
+            out_longitude = data.get('out_longitude')
+            
+            _logger.info(f"Check-out data received: out_latitude={out_latitude}, out_longitude={out_longitude}")
+            
+            employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+            result = env['hr.attendance'].api_check_out(employee.id, out_latitude, out_longitude)
+            invalidate_home_cache(env, user_id)
+            
+            _logger.info(f"Check-out result: {result}")
+            
+            return ResponseFormatter.success_response('Chấm công ra thành công', result, ResponseFormatter.HTTP_OK)
         
         except Exception as e:
             _logger.error(f"Check-out error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
-    # ========== STATUS ==========
-    @http.route('/api/v1/attendance/status', type='http', auth='none', methods=['GET'], csrf=False)
+    # ========== OFFLINE PUNCHES ==========
+    @http.route('/api/v1/attendance/punches', type='http', auth='none', methods=['POST'], csrf=False)
     @_verify_token
+    def submit_punches(self):
+        """
+        Gửi bù hàng loạt lần chấm công offline
+
+        Body: {'punches': [{'key', 'type': 'in'|'out', 'timestamp': ISO 8601, 'latitude', 'longitude'}]}
+        - key: khóa idempotency do app tạo, gửi lại lần đã ghi nhận trả về 'duplicate'
+        - Kết quả theo từng lần chấm công: accepted / duplicate / rejected (kèm lý do)
+        """
+        try:
+            user_id = request.jwt_payload.get('user_id')
+            env = get_env()
+
+            data = self._get_request_data()
+            punches = data.get('punches') if isinstance(data, dict) else None
+            if not isinstance(punches, list) or not punches:
+                return ResponseFormatter.error_response('Danh sách chấm công (punches) là bắt buộc', ResponseFormatter.HTTP_BAD_REQUEST)
+            if len(punches) > MAX_PUNCHES_PER_REQUEST:
+                return ResponseFormatter.error_response(
+                    f'Tối đa {MAX_PUNCHES_PER_REQUEST} lần chấm công mỗi yêu cầu',
+                    ResponseFormatter.HTTP_BAD_REQUEST
+                )
+
+            employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+            if not employee:
+                return ResponseFormatter.error_response(
+                    'Không tìm thấy thông tin nhân viên',
+                    ResponseFormatter.HTTP_NOT_FOUND
+                )
+
+            results = env['hr.attendance'].api_submit_punches(employee.id, punches)
+            summary = {status: 0 for status in (PUNCH_ACCEPTED, PUNCH_DUPLICATE, PUNCH_REJECTED)}
+            for result in results:
+                summary[result['status']] += 1
+            if summary[PUNCH_ACCEPTED]:
+                invalidate_home_cache(env, user_id)
+
+            return ResponseFormatter.success_response(
+                'Đã xử lý danh sách chấm công',
+                {'summary': summary, 'results': results},
+                ResponseFormatter.HTTP_OK
+            )
+
+        except Exception as e:
+            _logger.error(f"Submit punches error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
+
+    # ========== STATUS ==========
+    @http.route('/api/v1/attendance/status', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_status(self):
         """Lấy trạng thái chấm công hiện tại"""
         try:
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
             
-            try:
-                employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
-                
-                # Kiểm tra có đang check-in không
-                current_attendance = env['hr.attendance'].search([
-                    ('employee_id', '=', employee.id),
-                    ('check_out', '=', False)
-                ], limit=1)
-
-                if current_attendance:
-                    result = {
-                        'is_checked_in': True,
-                        'attendance_id': current_attendance.id,
-                        'check_in': current_attendance.check_in.isoformat() if current_attendance.check_in else None,
-                        'in_latitude': current_attendance.in_latitude,
-                        'in_longitude': current_attendance.in_longitude,
-                        'employee_name': employee.name,
-                    }
-                else:
-                    result = {
-                        'is_checked_in': False,
-                        'employee_name': employee.name,
-                    }
-                
-                cr.commit()
-                return ResponseFormatter.success_response('Trạng thái chấm công', result, ResponseFormatter.HTTP_OK)
-            except Exception as e:
-                cr.rollback()
-                raise
+            employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+            
+            # Trả 304 nếu trạng thái không đổi kể từ lần gọi trước
+            open_domain = [('employee_id', '=', employee.id), ('check_out', '=', False)]
+            etag = ResponseFormatter.data_etag(env, [
+                ('hr.employee', [('id', '=', employee.id)]),
+                ('hr.attendance', open_domain),
+            ])
+            if ResponseFormatter.is_not_modified(etag):
+                return ResponseFormatter.not_modified_response(etag)
+
+            # Kiểm tra có đang check-in không
+            current_attendance = env['hr.attendance'].search(open_domain, limit=1)
+
+            if current_attendance:
+                result = {
+                    'is_checked_in': True,
+                    'attendance_id': current_attendance.id,
+                    'check_in': current_attendance.check_in or None,
+                    'in_latitude': current_attendance.in_latitude,
+                    'in_longitude': current_attendance.in_longitude,
+                    'employee_name': employee.name,
+                }
+            else:
+                result = {
+                    'is_checked_in': False,
+                    'employee_name': employee.name,
+                }
+            
+            return ResponseFormatter.success_response('Trạng thái chấm công', result, ResponseFormatter.HTTP_OK, etag=etag)
 
         except Exception as e:
             _logger.error(f"Get status error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== HISTORY ==========
-    @http.route('/api/v1/attendance/history', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token
+    @http.route('/api/v1/attendance/history', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_history(self):
         """Lấy lịch sử chấm công"""
         try:
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
             
-            try:
-                # Lấy params
-                limit = int(request.httprequest.args.get('limit', 30))
-                offset = int(request.httprequest.args.get('offset', 0))
-                from_date = request.httprequest.args.get('from_date')
-                to_date = request.httprequest.args.get('to_date')
-
-                employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
-                
-                # Build domain
-                domain = [('employee_id', '=', employee.id)]
-
-                if from_date:
-                    from_datetime = datetime.strptime(from_date, '%Y-%m-%d')
-                    domain.append(('check_in', '>=', from_datetime))
-
-                if to_date:
-                    to_datetime = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1)
-                    domain.append(('check_in', '<', to_datetime))
-
-                # Lấy danh sách chấm công
-                attendances = env['hr.attendance'].search(domain, limit=limit, offset=offset, order='check_in desc')
-                total_count = env['hr.attendance'].search_count(domain)
-
-                # Format data
-                attendance_list = []
-                for att in attendances:
-                    worked_hours = att.worked_hours if hasattr(att, 'worked_hours') else 0
-                    attendance_list.append({
-                        'id': att.id,
-                        'check_in': att.check_in.isoformat() if att.check_in else None,
-                        'check_out': att.check_out.isoformat() if att.check_out else None,
-                        'in_latitude': att.in_latitude,
-                        'in_longitude': att.in_longitude,
-                        'out_latitude': att.out_latitude,
-                        'out_longitude': att.out_longitude,
-                        'worked_hours': worked_hours,
-                    })
-
-                result = {
-                    'employee_name': employee.name,
-                    'attendances': attendance_list,
-                    'total_count': total_count,
-                    'limit': limit,
-                    'offset': offset,
-                }
-                
-                cr.commit()
-                return ResponseFormatter.success_response('Lịch sử chấm công', result, ResponseFormatter.HTTP_OK)
-            except Exception as e:
-                cr.rollback()
-                raise
+            # Lấy params
+            limit = int(request.httprequest.args.get('limit', 30))
+            offset = int(request.httprequest.args.get('offset', 0))
+            cursor = request.httprequest.args.get('cursor')
+            with_count = _get_bool_param(request.httprequest.args.get('with_count'))
+            from_date = request.httprequest.args.get('from_date')
+            to_date = request.httprequest.args.get('to_date')
+
+            employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+            
+            # Build domain
+            domain = [('employee_id', '=', employee.id)]
+
+            if from_date:
+                from_datetime = datetime.strptime(from_date, '%Y-%m-%d')
+                domain.append(('check_in', '>=', from_datetime))
+
+            if to_date:
+                to_datetime = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1)
+                domain.append(('check_in', '<', to_datetime))
+
+            # Lấy danh sách chấm công
+            Attendance = env['hr.attendance']
+            attendances, next_cursor = Attendance._keyset_search(domain, 'check_in', limit, cursor=cursor, offset=offset)
+            total_count = Attendance._keyset_total_count(domain, cursor, with_count)
+
+            # Format data
+            attendance_list = []
+            for att in attendances:
+                worked_hours = att.worked_hours if hasattr(att, 'worked_hours') else 0
+                attendance_list.append({
+                    'id': att.id,
+                    'check_in': att.check_in or None,
+                    'check_out': att.check_out or None,
+                    'in_latitude': att.in_latitude,
+                    'in_longitude': att.in_longitude,
+                    'out_latitude': att.out_latitude,
+                    'out_longitude': att.out_longitude,
+                    'worked_hours': worked_hours,
+                })
+
+            result = {
+                'employee_name': employee.name,
+                'attendances': attendance_list,
+                'total_count': total_count,
+                'limit': limit,
+                'offset': offset,
+                'next_cursor': next_cursor,
+            }
+            
+            return ResponseFormatter.success_response('Lịch sử chấm công', result, ResponseFormatter.HTTP_OK)
 
+        except InvalidCursorError as e:
+            return ResponseFormatter.error_response(str(e), ResponseFormatter.HTTP_BAD_REQUEST)
         except Exception as e:
             _logger.error(f"Get history error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
+    def _compute_summary(self, env, user_id, month, from_date, to_date):
+        """Tổng hợp chấm công của user trong [from_date, to_date)"""
+        employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+
+        # Lấy tất cả attendance trong tháng
+        attendances = env['hr.attendance'].search([
+            ('employee_id', '=', employee.id),
+            ('check_in', '>=', from_date),
+            ('check_in', '<', to_date),
+        ])
+
+        # Tính toán
+        total_days = 0
+        total_hours = 0
+        incomplete_days = 0
+
+        for att in attendances:
+            if att.check_in:
+                total_days += 1
+                if att.check_out:
+                    worked_hours = att.worked_hours if hasattr(att, 'worked_hours') else 0
+                    total_hours += worked_hours
+                else:
+                    incomplete_days += 1
+
+        return {
+            'employee_name': employee.name,
+            'month': month,
+            'total_days': total_days,
+            'total_hours': round(total_hours, 2),
+            'incomplete_days': incomplete_days,
+            'average_hours_per_day': round(total_hours / total_days, 2) if total_days > 0 else 0,
+        }
+
     # ========== SUMMARY ==========
-    @http.route('/api/v1/attendance/summary', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token
+    @http.route('/api/v1/attendance/summary', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_summary(self):
         """Lấy tổng hợp chấm công theo tháng"""
         try:
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
             
-            try:
-                # Lấy month param (YYYY-MM), mặc định là tháng hiện tại
-                month = request.httprequest.args.get('month', datetime.now().strftime('%Y-%m'))
+            # Lấy month param (YYYY-MM), mặc định là tháng hiện tại
+            month = request.httprequest.args.get('month', datetime.now().strftime('%Y-%m'))
 
-                year, month_num = map(int, month.split('-'))
-                from_date = datetime(year, month_num, 1)
+            year, month_num = map(int, month.split('-'))
+            from_date = datetime(year, month_num, 1)
 
-                # Tính ngày cuối tháng
-                if month_num == 12:
-                    to_date = datetime(year + 1, 1, 1)
-                else:
-                    to_date = datetime(year, month_num + 1, 1)
-
-                employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
-
-                # Lấy tất cả attendance trong tháng
-                attendances = env['hr.attendance'].search([
-                    ('employee_id', '=', employee.id),
-                    ('check_in', '>=', from_date),
-                    ('check_in', '<', to_date),
-                ])
-
-                # Tính toán
-                total_days = 0
-                total_hours = 0
-                incomplete_days = 0
-
-                for att in attendances:
-                    if att.check_in:
-                        total_days += 1
-                        if att.check_out:
-                            worked_hours = att.worked_hours if hasattr(att, 'worked_hours') else 0
-                            total_hours += worked_hours
-                        else:
-                            incomplete_days += 1
+            # Tính ngày cuối tháng
+            if month_num == 12:
+                to_date = datetime(year + 1, 1, 1)
+            else:
+                to_date = datetime(year, month_num + 1, 1)
 
-                result = {
-                    'employee_name': employee.name,
-                    'month': month,
-                    'total_days': total_days,
-                    'total_hours': round(total_hours, 2),
-                    'incomplete_days': incomplete_days,
-                    'average_hours_per_day': round(total_hours / total_days, 2) if total_days > 0 else 0,
-                }
-                
-                cr.commit()
-                return ResponseFormatter.success_response('Tổng hợp chấm công', result, ResponseFormatter.HTTP_OK)
-            except Exception as e:
-                cr.rollback()
-                raise
+            # Bấm nhiều lần liên tiếp: các request đồng thời dùng chung 1 lần tính
+            result = api_cache.single_flight(
+                ('attendance_summary', env.cr.dbname, user_id, month),
+                lambda: self._compute_summary(env, user_id, month, from_date, to_date),
+            )
+
+            return ResponseFormatter.success_response('Tổng hợp chấm công', result, ResponseFormatter.HTTP_OK)
 
         except Exception as e:
             _logger.error(f"Get summary error: {str(e)}", exc_info=True)
@@ -5,8 +5,11 @@ Xử lý các endpoint API cho giải trình chấm công
 import logging
 from odoo import http
 from odoo.http import request
+from odoo.addons.hdi_base.models.keyset_pagination_mixin import InvalidCursorError
 
-from .auth_controller import _verify_token_http, _get_json_data
+from .auth_controller import _verify_token_http, _get_json_data, _get_bool_param
+from .home_controller import invalidate_home_cache
+from ..utils.db_session import get_env
 from ..utils.response_formatter import ResponseFormatter
 
 _logger = logging.getLogger(__name__)
@@ -16,27 +19,10 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
     """API endpoints cho quản lý giải trình chấm công"""
 
     def _call_model_method(self, method_name, *args, **kwargs):
-        """Helper để gọi model method với xử lý database"""
-        jwt_payload = getattr(request, 'jwt_payload', {})
-        db_name = jwt_payload.get('db')
-        
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-        with registry.cursor() as cr:
-            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-            
-            try:
-                excuse_model = env['attendance.excuse'].sudo()
-                method = getattr(excuse_model, method_name)
-                result = method(*args, **kwargs)
-                cr.commit()
-                return result
-            except Exception as e:
-                cr.rollback()
-                _logger.error(f"Error in {method_name}: {str(e)}", exc_info=True)
-                raise
+        """Helper để gọi model method trong phiên database của request"""
+        excuse_model = get_env()['attendance.excuse'].sudo()
+        method = getattr(excuse_model, method_name)
+        return method(*args, **kwargs)
 
     # ========== CREATE ==========
     @http.route('/api/v1/attendance-excuse/create', type='http', auth='none', methods=['POST'], csrf=False)
@@ -49,6 +35,7 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             user_id = jwt_payload.get('user_id')
 
             result = self._call_model_method('api_create_excuse', data, user_id)
+            invalidate_home_cache(get_env(), user_id)
             return ResponseFormatter.success_response('Tạo giải trình thành công', result)
         
         except Exception as e:
@@ -66,25 +53,11 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             jwt_payload = getattr(request, 'jwt_payload', {})
             user_id = jwt_payload.get('user_id')
 
-            db_name = jwt_payload.get('db')
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                
-                try:
-                    excuse = env['attendance.excuse'].sudo().browse(excuse_id)
-                    result = excuse.api_get_excuse_detail(user_id)
-                    cr.commit()
-                    
-                    return ResponseFormatter.success_response('Lấy chi tiết giải trình thành công', result)
-                
-                except Exception as e:
-                    cr.rollback()
-                    _logger.error(f"Error in api_get_excuse_detail: {str(e)}", exc_info=True)
-                    raise
+            env = get_env()
+            excuse = env['attendance.excuse'].sudo().browse(excuse_id)
+            result = excuse.api_get_excuse_detail(user_id)
+            
+            return ResponseFormatter.success_response('Lấy chi tiết giải trình thành công', result)
 
         except Exception as e:
             _logger.error(f"Error in get_excuse: {str(e)}", exc_info=True)
@@ -105,9 +78,13 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             state = data.get('state')
 
             result = self._call_model_method('api_get_my_excuse_list', user_id, 
-                                            limit=limit, offset=offset, state=state)
+                                            limit=limit, offset=offset, state=state,
+                                            cursor=data.get('cursor'),
+                                            with_count=_get_bool_param(data.get('with_count')))
             return ResponseFormatter.success_response('Lấy danh sách giải trình thành công', result)
         
+        except InvalidCursorError as e:
+            return ResponseFormatter.error_response(str(e), ResponseFormatter.HTTP_BAD_REQUEST)
         except Exception as e:
             _logger.error(f"Error in get_excuse_list: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
@@ -123,25 +100,12 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             jwt_payload = getattr(request, 'jwt_payload', {})
             user_id = jwt_payload.get('user_id')
 
-            db_name = jwt_payload.get('db')
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                
-                try:
-                    excuse = env['attendance.excuse'].sudo().browse(excuse_id)
-                    result = excuse.api_submit_excuse(user_id)
-                    cr.commit()
-                    
-                    return ResponseFormatter.success_response('Submit giải trình thành công', result)
-                
-                except Exception as e:
-                    cr.rollback()
-                    _logger.error(f"Error in api_submit_excuse: {str(e)}", exc_info=True)
-                    raise
+            env = get_env()
+            excuse = env['attendance.excuse'].sudo().browse(excuse_id)
+            result = excuse.api_submit_excuse(user_id)
+            invalidate_home_cache(env, user_id)
+            
+            return ResponseFormatter.success_response('Submit giải trình thành công', result)
 
         except Exception as e:
             _logger.error(f"Error in submit_excuse: {str(e)}", exc_info=True)
@@ -158,38 +122,25 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             jwt_payload = getattr(request, 'jwt_payload', {})
             user_id = jwt_payload.get('user_id')
 
-            db_name = jwt_payload.get('db')
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                
-                try:
-                    excuse = env['attendance.excuse'].sudo().browse(excuse_id)
-                    
-                    # Kiểm tra quyền và state từ model write override
-                    update_data = {}
-                    if 'reason' in data:
-                        update_data['reason'] = data['reason']
-                    if 'requested_checkin' in data:
-                        update_data['requested_checkin'] = data['requested_checkin']
-                    if 'requested_checkout' in data:
-                        update_data['requested_checkout'] = data['requested_checkout']
-
-                    if update_data:
-                        excuse.write(update_data)
-
-                    result = excuse.api_get_excuse_detail(user_id)
-                    cr.commit()
-                    
-                    return ResponseFormatter.success_response('Cập nhật giải trình thành công', result)
-                
-                except Exception as e:
-                    cr.rollback()
-                    _logger.error(f"Error updating excuse: {str(e)}", exc_info=True)
-                    raise
+            env = get_env()
+            excuse = env['attendance.excuse'].sudo().browse(excuse_id)
+            
+            # Kiểm tra quyền và state từ model write override
+            update_data = {}
+            if 'reason' in data:
+                update_data['reason'] = data['reason']
+            if 'requested_checkin' in data:
+                update_data['requested_checkin'] = data['requested_checkin']
+            if 'requested_checkout' in data:
+                update_data['requested_checkout'] = data['requested_checkout']
+
+            if update_data:
+                excuse.write(update_data)
+                invalidate_home_cache(env, user_id)
+
+            result = excuse.api_get_excuse_detail(user_id)
+            
+            return ResponseFormatter.success_response('Cập nhật giải trình thành công', result)
 
         except Exception as e:
             _logger.error(f"Error in update_excuse: {str(e)}", exc_info=True)
@@ -204,25 +155,13 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             data = _get_json_data()
             excuse_id = data.get('excuse_id')
 
-            db_name = getattr(request, 'jwt_payload', {}).get('db')
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                
-                try:
-                    excuse = env['attendance.excuse'].sudo().browse(excuse_id)
-                    excuse.unlink()
-                    cr.commit()
-                    
-                    return ResponseFormatter.success_response('Xóa giải trình thành công', {'deleted': True})
-                
-                except Exception as e:
-                    cr.rollback()
-                    _logger.error(f"Error deleting excuse: {str(e)}", exc_info=True)
-                    raise
+            env = get_env()
+            excuse = env['attendance.excuse'].sudo().browse(excuse_id)
+            owner_user_id = excuse.employee_id.user_id.id
+            excuse.unlink()
+            invalidate_home_cache(env, owner_user_id)
+            
+            return ResponseFormatter.success_response('Xóa giải trình thành công', {'deleted': True})
 
         except Exception as e:
             _logger.error(f"Error in delete_excuse: {str(e)}", exc_info=True)
@@ -242,28 +181,16 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             if not excuse_id:
                 return ResponseFormatter.error_response('excuse_id là bắt buộc', ResponseFormatter.HTTP_BAD_REQUEST)
 
-            db_name = jwt_payload.get('db')
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                
-                try:
-                    excuse = env['attendance.excuse'].sudo().browse(excuse_id)
-                    
-                    # Call action_approve từ model
-                    excuse.api_approve_excuse(user_id, data.get('corrected_checkin'), data.get('corrected_checkout'))
-                    cr.commit()
-                    
-                    result = excuse.api_get_excuse_detail(user_id)
-                    return ResponseFormatter.success_response('Phê duyệt giải trình thành công', result)
-                
-                except Exception as e:
-                    cr.rollback()
-                    _logger.error(f"Error approving excuse: {str(e)}", exc_info=True)
-                    raise
+            env = get_env()
+            excuse = env['attendance.excuse'].sudo().browse(excuse_id)
+            
+            # Call action_approve từ model
+            excuse.api_approve_excuse(user_id, data.get('corrected_checkin'), data.get('corrected_checkout'))
+            # Số giải trình chờ duyệt của người gửi thay đổi
+            invalidate_home_cache(env, excuse.employee_id.user_id.id)
+            
+            result = excuse.api_get_excuse_detail(user_id)
+            return ResponseFormatter.success_response('Phê duyệt giải trình thành công', result)
 
         except Exception as e:
             _logger.error(f"Error in approve_excuse: {str(e)}", exc_info=True)
@@ -284,28 +211,15 @@ class MobileAppAttendanceExcuseAPI(http.Controller):
             if not excuse_id:
                 return ResponseFormatter.error_response('excuse_id là bắt buộc', ResponseFormatter.HTTP_BAD_REQUEST)
 
-            db_name = jwt_payload.get('db')
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                
-                try:
-                    excuse = env['attendance.excuse'].sudo().browse(excuse_id)
-                    
-                    # Call api_reject_excuse từ model
-                    excuse.api_reject_excuse(user_id, rejection_reason)
-                    cr.commit()
-                    
-                    result = excuse.api_get_excuse_detail(user_id)
-                    return ResponseFormatter.success_response('Từ chối giải trình thành công', result)
-                
-                except Exception as e:
-                    cr.rollback()
-                    _logger.error(f"Error rejecting excuse: {str(e)}", exc_info=True)
-                    raise
+            env = get_env()
+            excuse = env['attendance.excuse'].sudo().browse(excuse_id)
+            
+            # Call api_reject_excuse từ model
+            excuse.api_reject_excuse(user_id, rejection_reason)
+            invalidate_home_cache(env, excuse.employee_id.user_id.id)
+            
+            result = excuse.api_get_excuse_detail(user_id)
+            return ResponseFormatter.success_response('Từ chối giải trình thành công', result)
 
         except Exception as e:
             _logger.error(f"Error in reject_excuse: {str(e)}", exc_info=True)
@@ -6,57 +6,56 @@ from functools import wraps
 import jwt
 from odoo import http
 from odoo.http import request, Response
+from ..utils import jwt_keyring, metrics, rate_limit, replica, revocation_cache
+from ..utils.db_session import call_in_session, get_env, get_registry, is_error_response
 from ..utils.response_formatter import ResponseFormatter
 
 _logger = logging.getLogger(__name__)
 
-# Default secret key - sẽ được lấy từ config khi cần
-DEFAULT_JWT_SECRET_KEY = 'your-secret-key-change-in-production'
-
-
-def _get_jwt_secret_key():
-    """Lấy JWT secret key từ config hoặc sử dụng default"""
-    try:
-        return request.env['ir.config_parameter'].sudo().get_param(
-            'hdi_api.jwt_secret_key',
-            DEFAULT_JWT_SECRET_KEY
-        )
-    except Exception:
-        return DEFAULT_JWT_SECRET_KEY
-
-
-def _is_token_blacklisted(token, db_name):
-    """Kiểm tra token có trong blacklist không"""
+def _decode_token(token):
+    """Giải mã và xác thực chữ ký token bằng key ring cache (chọn key theo header 'kid')"""
+    header = jwt.get_unverified_header(token)
+    claims = jwt.decode(token, options={'verify_signature': False})
+    secret_key = jwt_keyring.get_verification_key(claims.get('db'), header.get('kid'))
+    if not secret_key:
+        raise jwt.InvalidTokenError('Unknown signing key')
+    return jwt.decode(token, secret_key, algorithms=['HS256'])
+
+
+def _encode_token(token_payload, env):
+    """Ký token bằng key hiện hành của database, kèm header 'kid'"""
+    kid, secret_key = jwt_keyring.get_key_ring(env.cr.dbname, env).signing_key
+    return jwt.encode(token_payload, secret_key, algorithm='HS256', headers={'kid': kid})
+
+
+def _issue_token(env, user):
+    """Phát hành token mới cho user, kèm token_version hiện tại của user"""
+    token_payload = {
+        'user_id': user.id,
+        'login': user.login,
+        'name': user.name,
+        'email': user.email or '',
+        'db': env.cr.dbname,
+        'token_version': user.api_token_version,
+        'iat': datetime.utcnow(),
+        'exp': datetime.utcnow() + timedelta(minutes=30)
+    }
+    return _encode_token(token_payload, env)
+
+
+def _is_token_blacklisted(env, token):
+    """Kiểm tra token có trong blacklist không (cache trong worker, chỉ hỏi DB khi không chắc)"""
     try:
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-        with registry.cursor() as cr:
-            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-            blacklist = env['jwt.token.blacklist'].sudo().search([
-                ('token_hash', '=', _hash_token(token))
-            ], limit=1)
-            return bool(blacklist)
+        return revocation_cache.is_revoked(env, _hash_token(token))
     except Exception:
         return False
 
 
-def _add_token_to_blacklist(token, user_id, db_name, exp_time):
-    """Thêm token vào blacklist"""
+def _add_token_to_blacklist(env, token, user_id, exp_time):
+    """Thêm token vào blacklist (commit cùng phiên request, sau đó báo cho các worker)"""
     try:
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-        with registry.cursor() as cr:
-            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-            env['jwt.token.blacklist'].sudo().create({
-                'token_hash': _hash_token(token),
-                'user_id': user_id,
-                'exp_time': exp_time,
-            })
-            cr.commit()
+        with env.cr.savepoint():
+            env['jwt.token.blacklist'].sudo()._revoke_token(_hash_token(token), user_id, exp_time)
     except Exception as e:
         _logger.warning(f"Failed to add token to blacklist: {str(e)}")
 
@@ -83,118 +82,105 @@ def _get_json_data():
         return {}
 
 
-def _verify_token(f):
-    """Decorator để kiểm tra JWT token - dùng cho HTTP routes"""
-
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
-
-        # Lấy token từ Authorization header
-        auth_header = request.httprequest.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]
+def _get_bool_param(value):
+    """Chuyển tham số query/JSON thành bool (None nếu không truyền)"""
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
 
-        if not token:
-            return ResponseFormatter.error_response('Token không được cung cấp', ResponseFormatter.HTTP_UNAUTHORIZED)
 
-        try:
-            secret_key = _get_jwt_secret_key()
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-
-            # Kiểm tra token có trong blacklist không
-            if _is_token_blacklisted(token, payload.get('db')):
-                return ResponseFormatter.error_response('Token đã bị vô hiệu hóa', ResponseFormatter.HTTP_UNAUTHORIZED)
-
-            request.jwt_payload = payload
-        except jwt.ExpiredSignatureError:
-            return ResponseFormatter.error_response('Token đã hết hạn', ResponseFormatter.HTTP_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return ResponseFormatter.error_response('Token không hợp lệ', ResponseFormatter.HTTP_UNAUTHORIZED)
+def _get_bearer_token():
+    """Lấy token từ Authorization header"""
+    auth_header = request.httprequest.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[7:]
+    return None
 
-        return f(*args, **kwargs)
 
-    return decorated_function
+def _token_decorator(error_factory, readonly=False):
+    """
+    Tạo decorator kiểm tra JWT token
 
+    Sau khi giải mã token, mở 1 phiên database duy nhất cho request (theo db trong token):
+    kiểm tra blacklist và toàn bộ controller dùng chung cursor này, phiên được
+    commit/rollback và đóng khi controller trả về.
 
-def _verify_token_json(f):
-    """Decorator để kiểm tra JWT token - dùng cho JSON routes (type='json')
-    Return dict để Odoo tự động wrap với JSON-RPC format"""
+    readonly=True: route chỉ đọc, được đọc từ replica (nếu có cấu hình) trừ khi user vừa ghi.
+    Route còn lại (không phải GET) khi thành công được ghi nhận là user vừa ghi.
+    """
 
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
-
-        # Lấy token từ Authorization header
-        auth_header = request.httprequest.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]
-
-        if not token:
-            return ResponseFormatter.error('Token không được cung cấp', ResponseFormatter.HTTP_UNAUTHORIZED)
-
-        try:
-            secret_key = _get_jwt_secret_key()
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-
-            # Kiểm tra token có trong blacklist không
-            if _is_token_blacklisted(token, payload.get('db')):
-                return ResponseFormatter.error('Token đã bị vô hiệu hóa', ResponseFormatter.HTTP_UNAUTHORIZED)
+    def decorator(f):
+        def verified_call(*args, **kwargs):
+            token = _get_bearer_token()
+            if not token:
+                return error_factory('Token không được cung cấp', ResponseFormatter.HTTP_UNAUTHORIZED)
 
+            try:
+                payload = _decode_token(token)
+            except jwt.ExpiredSignatureError:
+                return error_factory('Token đã hết hạn', ResponseFormatter.HTTP_UNAUTHORIZED)
+            except jwt.InvalidTokenError:
+                return error_factory('Token không hợp lệ', ResponseFormatter.HTTP_UNAUTHORIZED)
+
+            if not payload.get('db'):
+                return error_factory('Token không hợp lệ', ResponseFormatter.HTTP_UNAUTHORIZED)
             request.jwt_payload = payload
-        except jwt.ExpiredSignatureError:
-            return ResponseFormatter.error('Token đã hết hạn', ResponseFormatter.HTTP_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return ResponseFormatter.error('Token không hợp lệ', ResponseFormatter.HTTP_UNAUTHORIZED)
 
-        return f(*args, **kwargs)
+            def authorized_call():
+                env = get_env()
+                # Token phát hành trước lần "đăng xuất mọi thiết bị"/đổi mật khẩu gần nhất
+                if payload.get('token_version', 0) < revocation_cache.get_token_version(env, payload.get('user_id')):
+                    return error_factory('Token đã bị vô hiệu hóa', ResponseFormatter.HTTP_UNAUTHORIZED)
+                # Kiểm tra token có trong blacklist không (đăng xuất 1 thiết bị)
+                if _is_token_blacklisted(env, token):
+                    return error_factory('Token đã bị vô hiệu hóa', ResponseFormatter.HTTP_UNAUTHORIZED)
+                return f(*args, **kwargs)
 
-    return decorated_function
+            db_name, user_id = payload['db'], payload.get('user_id')
+            if readonly:
+                if not replica.is_enabled():
+                    return call_in_session(db_name, authorized_call)
+                use_replica = replica.can_read_from_replica(db_name, user_id)
+                return call_in_session(db_name, authorized_call, readonly=use_replica, reuse_request_cursor=use_replica)
 
+            response = call_in_session(db_name, authorized_call)
+            if request.httprequest.method != 'GET' and not is_error_response(response):
+                replica.note_write(db_name, user_id)
+            return response
 
-def _verify_token_http(f):
-    """Decorator để kiểm tra JWT token - dùng cho HTTP routes (type='http')
-    Return Response object"""
+        # Số liệu theo endpoint cho /api/v1/metrics (thời gian gồm cả commit)
+        instrumented_call = metrics.instrument(verified_call)
 
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Sub-request của /api/v1/batch: token đã được kiểm tra, phiên đã mở
+            if getattr(request, 'api_env', None) is not None:
+                return f(*args, **kwargs)
+            return instrumented_call(*args, **kwargs)
 
-        # Lấy token từ Authorization header
-        auth_header = request.httprequest.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]
+        return decorated_function
 
-        if not token:
-            return ResponseFormatter.error_response('Token không được cung cấp', ResponseFormatter.HTTP_UNAUTHORIZED)
+    return decorator
 
-        try:
-            secret_key = _get_jwt_secret_key()
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
 
-            # Kiểm tra token có trong blacklist không
-            if _is_token_blacklisted(token, payload.get('db')):
-                return ResponseFormatter.error_response('Token đã bị vô hiệu hóa', ResponseFormatter.HTTP_UNAUTHORIZED)
+# Decorator để kiểm tra JWT token - dùng cho HTTP routes
+_verify_token = _token_decorator(ResponseFormatter.error_response)
 
-            request.jwt_payload = payload
-        except jwt.ExpiredSignatureError:
-            return ResponseFormatter.error_response('Token đã hết hạn', ResponseFormatter.HTTP_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return ResponseFormatter.error_response('Token không hợp lệ', ResponseFormatter.HTTP_UNAUTHORIZED)
+# Decorator để kiểm tra JWT token - dùng cho JSON routes (type='json')
+# Return dict để Odoo tự động wrap với JSON-RPC format
+_verify_token_json = _token_decorator(ResponseFormatter.error)
 
-        return f(*args, **kwargs)
+# Decorator để kiểm tra JWT token - dùng cho HTTP routes (type='http'), return Response object
+_verify_token_http = _token_decorator(ResponseFormatter.error_response)
 
-    return decorated_function
+# Decorator để kiểm tra JWT token - dùng cho HTTP routes chỉ đọc (đọc từ replica nếu có)
+# Route cần khai báo thêm readonly=True để cursor của request Odoo cũng lấy trên replica
+_verify_token_readonly = _token_decorator(ResponseFormatter.error_response, readonly=True)
 
 
 def _authenticate_user(db_name, login, password):
     try:
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-
-        # Sử dụng method _login của res.users model
+        # Sử dụng method _login của res.users model (tự quản lý cursor riêng)
         # Trong Odoo 18, authenticate() yêu cầu credential dict
         credential = {
             'login': login,
@@ -202,24 +188,21 @@ def _authenticate_user(db_name, login, password):
             'type': 'password'
         }
 
-        with registry.cursor() as cr:
-            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-
-            try:
-                # Gọi _login thay vì authenticate
-                auth_info = env.registry['res.users']._login(
-                    db_name,
-                    credential,
-                    user_agent_env={}
-                )
+        try:
+            # Gọi _login thay vì authenticate
+            auth_info = get_registry(db_name)['res.users']._login(
+                db_name,
+                credential,
+                user_agent_env={}
+            )
 
-                # auth_info là dict chứa 'uid' và các thông tin khác
-                if auth_info and isinstance(auth_info, dict):
-                    return auth_info.get('uid')
+            # auth_info là dict chứa 'uid' và các thông tin khác
+            if auth_info and isinstance(auth_info, dict):
+                return auth_info.get('uid')
 
-            except Exception as e:
-                _logger.debug(f"Login failed: {str(e)}")
-                return None
+        except Exception as e:
+            _logger.debug(f"Login failed: {str(e)}")
+            return None
 
         return None
 
@@ -231,6 +214,7 @@ def _authenticate_user(db_name, login, password):
 class MobileAppAuthAPI(http.Controller):
 
     @http.route('/api/v1/auth/login', type='http', auth='none', methods=['POST'], csrf=False)
+    @metrics.instrument
     def login(self):
         try:
             # Sử dụng helper function để lấy JSON data
@@ -241,6 +225,12 @@ class MobileAppAuthAPI(http.Controller):
             if not login or not password:
                 return ResponseFormatter.error_response('Login và password là bắt buộc', ResponseFormatter.HTTP_BAD_REQUEST)
 
+            # Giới hạn số lần thử theo IP và tài khoản - từ chối trước khi truy vấn DB / băm mật khẩu
+            rate_keys = rate_limit.login_keys(request.httprequest.remote_addr, request.db, login)
+            retry_after = rate_limit.check(rate_keys)
+            if retry_after:
+                return ResponseFormatter.too_many_requests_response(retry_after)
+
             db_name = request.env.cr.dbname
 
             if not db_name:
@@ -269,7 +259,9 @@ class MobileAppAuthAPI(http.Controller):
                 uid = None
 
             if not uid:
+                rate_limit.report_failure(db_name, rate_keys)
                 return ResponseFormatter.error_response('Tài khoản hoặc mật khẩu không chính xác', ResponseFormatter.HTTP_UNAUTHORIZED)
+            rate_limit.report_success(db_name, rate_keys)
 
             user = request.env['res.users'].sudo().browse(uid)
 
@@ -277,18 +269,7 @@ class MobileAppAuthAPI(http.Controller):
                 return ResponseFormatter.error_response('Tài khoản không khả dụng', ResponseFormatter.HTTP_FORBIDDEN)
 
             # JWT
-            secret_key = _get_jwt_secret_key()
-            token_payload = {
-                'user_id': uid,
-                'login': user.login,
-                'name': user.name,
-                'email': user.email or '',
-                'db': db_name,
-                'iat': datetime.utcnow(),
-                'exp': datetime.utcnow() + timedelta(minutes=30)
-            }
-
-            token = jwt.encode(token_payload, secret_key, algorithm='HS256')
+            token = _issue_token(request.env, user)
 
             user_data = {
                 'id': user.id,
@@ -310,48 +291,18 @@ class MobileAppAuthAPI(http.Controller):
     def refresh_token(self):
         try:
             user_id = request.jwt_payload.get('user_id')
-            db_name = request.jwt_payload.get('db')
-            old_token_exp = request.jwt_payload.get('exp')
-
-            import odoo
-            from odoo.modules.registry import Registry
 
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                user = env['res.users'].browse(user_id)
+            env = get_env()
+            user = env['res.users'].browse(user_id)
 
-                if not user.exists():
-                    return ResponseFormatter.error_response('Người dùng không tồn tại', ResponseFormatter.HTTP_NOT_FOUND)
+            if not user.exists():
+                return ResponseFormatter.error_response('Người dùng không tồn tại', ResponseFormatter.HTTP_NOT_FOUND)
 
-                if not user.active:
-                    return ResponseFormatter.error_response('Tài khoản đã bị vô hiệu hóa', ResponseFormatter.HTTP_FORBIDDEN)
+            if not user.active:
+                return ResponseFormatter.error_response('Tài khoản đã bị vô hiệu hóa', ResponseFormatter.HTTP_FORBIDDEN)
 
-                user_info = {
-                    'id': user.id,
-                    'login': user.login,
-                    'name': user.name,
-                    'email': user.email or '',
-                }
-
-            # Blacklist token cũ
-            old_token = request.httprequest.headers.get('Authorization', '').replace('Bearer ', '')
-            if old_token and old_token_exp:
-                old_exp_time = datetime.utcfromtimestamp(old_token_exp)
-                _add_token_to_blacklist(old_token, user_id, db_name, old_exp_time)
-
-            secret_key = _get_jwt_secret_key()
-            token_payload = {
-                'user_id': user_info['id'],
-                'login': user_info['login'],
-                'name': user_info['name'],
-                'email': user_info['email'],
-                'db': db_name,
-                'iat': datetime.utcnow(),
-                'exp': datetime.utcnow() + timedelta(minutes=30)
-            }
-
-            token = jwt.encode(token_payload, secret_key, algorithm='HS256')
+            # Token cũ tự hết hạn sau tối đa 30 phút - không ghi blacklist cho mỗi lần làm mới
+            token = _issue_token(env, user)
 
             token_data = {
                 'token': token,
@@ -388,51 +339,54 @@ class MobileAppAuthAPI(http.Controller):
     def logout(self):
         try:
             # Lấy token từ header
-            auth_header = request.httprequest.headers.get('Authorization', '')
-            if auth_header.startswith('Bearer '):
-                token = auth_header[7:]
-
+            token = _get_bearer_token()
+            if token:
                 user_id = request.jwt_payload.get('user_id')
-                db_name = request.jwt_payload.get('db')
                 exp_time = datetime.utcfromtimestamp(request.jwt_payload.get('exp'))
 
                 # Thêm token vào blacklist
-                _add_token_to_blacklist(token, user_id, db_name, exp_time)
+                _add_token_to_blacklist(get_env(), token, user_id, exp_time)
 
             return ResponseFormatter.success_response('Đã đăng xuất thành công')
         except Exception as e:
             _logger.error(f"Logout error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response('Lỗi server khi xử lý yêu cầu', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
+    @http.route('/api/v1/auth/logout-all', type='http', auth='none', methods=['POST'], csrf=False)
+    @_verify_token
+    def logout_all(self):
+        """Đăng xuất khỏi mọi thiết bị: tăng token_version, mọi token đã phát hành bị từ chối"""
+        try:
+            user_id = request.jwt_payload.get('user_id')
+            get_env()['res.users'].browse(user_id)._bump_api_token_version()
+
+            return ResponseFormatter.success_response('Đã đăng xuất khỏi tất cả thiết bị')
+        except Exception as e:
+            _logger.error(f"Logout all error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response('Lỗi server khi xử lý yêu cầu', ResponseFormatter.HTTP_INTERNAL_ERROR)
+
     @http.route('/api/v1/auth/me', type='http', auth='none', methods=['GET'], csrf=False)
     @_verify_token
     def get_current_user(self):
         try:
             user_id = request.jwt_payload.get('user_id')
-            db_name = request.jwt_payload.get('db')
 
             # Lấy thông tin user
-            import odoo
-            from odoo.modules.registry import Registry
-
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                user = env['res.users'].browse(user_id)
-
-                if not user.exists():
-                    return ResponseFormatter.error_response('Người dùng không tồn tại', ResponseFormatter.HTTP_NOT_FOUND)
-
-                if not user.active:
-                    return ResponseFormatter.error_response('Tài khoản đã bị vô hiệu hóa', ResponseFormatter.HTTP_FORBIDDEN)
-
-                user_info = {
-                    'id': user.id,
-                    'name': user.name,
-                    'email': user.email or '',
-                    'login': user.login,
-                    'active': user.active
-                }
+            user = get_env()['res.users'].browse(user_id)
+
+            if not user.exists():
+                return ResponseFormatter.error_response('Người dùng không tồn tại', ResponseFormatter.HTTP_NOT_FOUND)
+
+            if not user.active:
+                return ResponseFormatter.error_response('Tài khoản đã bị vô hiệu hóa', ResponseFormatter.HTTP_FORBIDDEN)
+
+            user_info = {
+                'id': user.id,
+                'name': user.name,
+                'email': user.email or '',
+                'login': user.login,
+                'active': user.active
+            }
 
             return ResponseFormatter.success_response('Lấy thông tin người dùng thành công', user_info)
         except Exception as e:
@@ -469,39 +423,45 @@ class MobileAppAuthAPI(http.Controller):
             user_id = request.jwt_payload.get('user_id')
             db_name = request.jwt_payload.get('db')
 
-            import odoo
-            from odoo.modules.registry import Registry
+            user = get_env()['res.users'].browse(user_id)
 
-            registry = Registry(db_name)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
-                user = env['res.users'].browse(user_id)
+            if not user.exists():
+                return ResponseFormatter.error_response('Người dùng không tồn tại', ResponseFormatter.HTTP_NOT_FOUND)
 
-                if not user.exists():
-                    return ResponseFormatter.error_response('Người dùng không tồn tại', ResponseFormatter.HTTP_NOT_FOUND)
+            if not user.active:
+                return ResponseFormatter.error_response('Tài khoản đã bị vô hiệu hóa', ResponseFormatter.HTTP_FORBIDDEN)
 
-                if not user.active:
-                    return ResponseFormatter.error_response('Tài khoản đã bị vô hiệu hóa', ResponseFormatter.HTTP_FORBIDDEN)
+            # Giới hạn số lần kiểm tra mật khẩu cũ (dùng chung bucket với đăng nhập)
+            rate_keys = rate_limit.login_keys(
+                request.httprequest.remote_addr, db_name, request.jwt_payload.get('login'))
+            retry_after = rate_limit.check(rate_keys)
+            if retry_after:
+                return ResponseFormatter.too_many_requests_response(retry_after)
 
-                try:
-                    # Xác thực mật khẩu cũ bằng cách gọi _authenticate_user
-                    auth_uid = _authenticate_user(db_name, user.login, old_password)
+            try:
+                # Xác thực mật khẩu cũ bằng cách gọi _authenticate_user
+                auth_uid = _authenticate_user(db_name, user.login, old_password)
 
-                    if not auth_uid or auth_uid != user.id:
-                        return ResponseFormatter.error_response('Mật khẩu cũ không chính xác', ResponseFormatter.HTTP_UNAUTHORIZED)
+                if not auth_uid or auth_uid != user.id:
+                    rate_limit.report_failure(db_name, rate_keys)
+                    return ResponseFormatter.error_response('Mật khẩu cũ không chính xác', ResponseFormatter.HTTP_UNAUTHORIZED)
+                rate_limit.report_success(db_name, rate_keys)
 
-                    # Cập nhật mật khẩu mới (Odoo sẽ tự động hash)
-                    user.write({'password': new_password})
-                    cr.commit()
+                # Cập nhật mật khẩu mới (Odoo sẽ tự động hash) - đồng thời vô hiệu hóa mọi token cũ
+                user.write({'password': new_password})
 
-                    _logger.info(f"User {user.login} changed password successfully")
+                _logger.info(f"User {user.login} changed password successfully")
 
-                    return ResponseFormatter.success_response('Đổi mật khẩu thành công')
+                # Cấp token mới cho thiết bị hiện tại
+                token_data = {
+                    'token': _issue_token(user.env, user),
+                    'expires_in': 1800
+                }
+                return ResponseFormatter.success_response('Đổi mật khẩu thành công', token_data)
 
-                except Exception as pwd_error:
-                    cr.rollback()
-                    _logger.error(f"Password change failed for user {user.login}: {str(pwd_error)}", exc_info=True)
-                    return ResponseFormatter.error_response('Lỗi khi đổi mật khẩu', ResponseFormatter.HTTP_INTERNAL_ERROR)
+            except Exception as pwd_error:
+                _logger.error(f"Password change failed for user {user.login}: {str(pwd_error)}", exc_info=True)
+                return ResponseFormatter.error_response('Lỗi khi đổi mật khẩu', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
         except Exception as e:
             _logger.error(f"Change password error: {str(e)}", exc_info=True)
@@ -0,0 +1,154 @@
+"""
+API Controller cho batch request
+Gộp nhiều request của app (vd. lúc khởi động) vào 1 lần gọi: token được xác thực 1 lần,
+các sub-request chạy tuần tự trên cùng 1 cursor (cùng snapshot dữ liệu)
+"""
+import json
+import logging
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request as WerkzeugRequest
+
+from odoo import http
+from odoo.http import request
+
+from .auth_controller import _verify_token, _get_json_data
+from ..utils.db_session import call_in_savepoint, get_env
+from ..utils.response_formatter import ResponseFormatter
+
+_logger = logging.getLogger(__name__)
+
+MAX_BATCH_REQUESTS = 20
+# Không cho gọi trong batch
+BATCH_EXCLUDED_PATHS = {'/api/v1/batch', '/api/v1/auth/login', '/api/v1/events'}
+# Header client được gửi riêng cho từng sub-request (Authorization lấy từ request batch)
+SUB_REQUEST_HEADERS = ('If-None-Match', 'Accept-Language')
+# Header của sub-response trả lại cho client
+SUB_RESPONSE_HEADERS = ('ETag', 'Cache-Control')
+
+
+class BatchAPI(http.Controller):
+    """API endpoint thực hiện nhiều request trong 1 lần gọi"""
+
+    def _build_sub_request(self, item):
+        """
+        Tạo werkzeug Request cho 1 sub-request
+
+        Args:
+            item (dict): {'method', 'path', 'params', 'headers', 'body'}
+
+        Returns:
+            Request: request dùng thay cho request.httprequest khi gọi controller
+        """
+        outer = request.httprequest
+        item_headers = {name.lower(): value for name, value in (item.get('headers') or {}).items()}
+        headers = {'Authorization': outer.headers.get('Authorization', '')}
+        for name in SUB_REQUEST_HEADERS:
+            if item_headers.get(name.lower()):
+                headers[name] = item_headers[name.lower()]
+
+        body = item.get('body')
+        builder = EnvironBuilder(
+            path=item['path'],
+            base_url=outer.host_url,
+            method=(item.get('method') or 'GET').upper(),
+            query_string=item.get('params') or None,
+            headers=headers,
+            data=json.dumps(body) if body is not None else None,
+            content_type='application/json' if body is not None else None,
+        )
+        try:
+            return WerkzeugRequest(builder.get_environ())
+        finally:
+            builder.close()
+
+    def _dispatch_sub_request(self, env, routing_map, item):
+        """Tìm route của sub-request và gọi controller trong 1 savepoint của phiên hiện tại"""
+        try:
+            sub_request = self._build_sub_request(item)
+        except (TypeError, ValueError) as e:
+            return ResponseFormatter.error_response(f'Sub-request không hợp lệ: {str(e)}', ResponseFormatter.HTTP_BAD_REQUEST)
+
+        try:
+            endpoint, args = routing_map.bind_to_environ(sub_request.environ).match()
+        except HTTPException as e:
+            return ResponseFormatter.error_response(e.description or e.name, e.code)
+
+        if getattr(endpoint, 'routing', {}).get('type') != 'http':
+            return ResponseFormatter.error_response('Endpoint không hỗ trợ trong batch', ResponseFormatter.HTTP_BAD_REQUEST)
+
+        # Controller đọc tham số/body/header từ request.httprequest: thay tạm bằng sub-request
+        outer_httprequest, outer_params = request.httprequest, getattr(request, 'params', {})
+        request.httprequest = sub_request
+        request.params = dict(sub_request.args.to_dict(), **args)
+        try:
+            return call_in_savepoint(env, endpoint, **args)
+        finally:
+            request.httprequest, request.params = outer_httprequest, outer_params
+
+    def _sub_response_result(self, item_id, response):
+        """Chuyển Response của sub-request thành 1 phần tử trong kết quả batch"""
+        body = response.get_data()
+        return {
+            'id': item_id,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in SUB_RESPONSE_HEADERS if name in response.headers},
+            'body': json.loads(body) if body and response.mimetype == 'application/json' else None,
+        }
+
+    def _run_sub_request(self, env, routing_map, index, item):
+        if not isinstance(item, dict):
+            return self._sub_response_result(index, ResponseFormatter.error_response(
+                'Sub-request phải là object', ResponseFormatter.HTTP_BAD_REQUEST))
+
+        item_id = item.get('id', index)
+        path = item.get('path')
+        if not isinstance(path, str) or not path.startswith('/api/') or path.split('?')[0] in BATCH_EXCLUDED_PATHS:
+            return self._sub_response_result(item_id, ResponseFormatter.error_response(
+                'Đường dẫn không hợp lệ trong batch', ResponseFormatter.HTTP_BAD_REQUEST))
+
+        try:
+            response = self._dispatch_sub_request(env, routing_map, item)
+        except Exception as e:
+            _logger.error(f"Batch sub-request {path} error: {str(e)}", exc_info=True)
+            response = ResponseFormatter.error_response('Lỗi server khi xử lý yêu cầu', ResponseFormatter.HTTP_INTERNAL_ERROR)
+        return self._sub_response_result(item_id, response)
+
+    # ========== BATCH ==========
+    @http.route('/api/v1/batch', type='http', auth='none', methods=['POST'], csrf=False)
+    @_verify_token
+    def batch(self):
+        """
+        Thực hiện nhiều request trong 1 lần gọi
+
+        Body: {"requests": [{"id": "me", "method": "GET", "path": "/api/v1/auth/me",
+                             "params": {...}, "headers": {"If-None-Match": "..."}, "body": {...}}]}
+        Kết quả theo đúng thứ tự: [{"id", "status", "headers", "body"}]. Sub-request lỗi
+        chỉ rollback phần việc của nó, các sub-request còn lại vẫn được thực hiện.
+        """
+        try:
+            data = _get_json_data()
+            items = data if isinstance(data, list) else data.get('requests')
+
+            if not isinstance(items, list) or not items:
+                return ResponseFormatter.error_response('Danh sách requests là bắt buộc', ResponseFormatter.HTTP_BAD_REQUEST)
+
+            if len(items) > MAX_BATCH_REQUESTS:
+                return ResponseFormatter.error_response(
+                    f'Tối đa {MAX_BATCH_REQUESTS} request trong 1 batch',
+                    ResponseFormatter.HTTP_BAD_REQUEST
+                )
+
+            env = get_env()
+            routing_map = env['ir.http'].routing_map()
+            results = [
+                self._run_sub_request(env, routing_map, index, item)
+                for index, item in enumerate(items)
+            ]
+
+            return ResponseFormatter.success_response('Thực hiện batch thành công', {'responses': results})
+
+        except Exception as e:
+            _logger.error(f"Batch error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response('Lỗi server khi xử lý yêu cầu', ResponseFormatter.HTTP_INTERNAL_ERROR)
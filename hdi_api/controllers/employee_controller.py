@@ -2,38 +2,155 @@
 API Controller for Employee
 Xử lý các endpoint API cho thông tin nhân viên
 """
+import base64
 import logging
 from odoo import http
 from odoo.http import request
+from odoo.tools.mimetypes import guess_mimetype
+from odoo.addons.hdi_base.models.keyset_pagination_mixin import InvalidCursorError
 
-from .auth_controller import _verify_token_http, _get_json_data
+from .auth_controller import _verify_token_readonly, _get_json_data, _get_bool_param
+from ..utils import api_cache
+from ..utils.db_session import get_env
 from ..utils.response_formatter import ResponseFormatter
 
 _logger = logging.getLogger(__name__)
 
+# Danh mục dùng chung cho mọi user: cache theo database, tự làm mới sau TTL
+DEPARTMENTS_CACHE = 'departments'
+JOBS_CACHE = 'jobs'
+SHARED_LIST_CACHE_TTL = 60
+
+
+def _m2o_id(value):
+    return value['id'] if value else False
+
+
+def _m2o_name(value):
+    return value['name'] if value else ''
+
+
+def _or_empty(value):
+    return value or ''
+
+
+def _image_text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else (value or False)
+
+
+# Trường trả về của /api/v1/employee/list: tên trường API -> (trường ORM, hàm chuyển giá trị)
+EMPLOYEE_LIST_FIELDS = {
+    'id': ('id', None),
+    'name': ('name', None),
+    'work_email': ('work_email', _or_empty),
+    'mobile_phone': ('mobile_phone', _or_empty),
+    'work_phone': ('work_phone', _or_empty),
+    'department_id': ('department_id', _m2o_id),
+    'department_name': ('department_id', _m2o_name),
+    'job_id': ('job_id', _m2o_id),
+    'job_title': ('job_id', _m2o_name),
+    'parent_id': ('parent_id', _m2o_id),
+    'parent_name': ('parent_id', _m2o_name),
+    'company_id': ('company_id', _m2o_id),
+    'company_name': ('company_id', _m2o_name),
+    'active': ('active', None),
+    'avatar_url': ('write_date', None),
+    # Ảnh base64 inline - chỉ trả khi client yêu cầu rõ, nên dùng avatar_url
+    'image_128': ('image_128', _image_text),
+}
+DEFAULT_EMPLOYEE_LIST_FIELDS = [name for name in EMPLOYEE_LIST_FIELDS if name != 'image_128']
+
+# Avatar có version (write_date) trong URL nên cache dài hạn được
+AVATAR_CACHE_MAX_AGE = 7 * 24 * 3600
+AVATAR_SIZES = ('128', '256', '512', '1024', '1920')
+
+
+def get_department_list(env):
+    """Danh sách phòng ban đang hoạt động (dữ liệu thuần, dùng chung qua cache)"""
+    departments = env['hr.department'].sudo().search([
+        ('active', '=', True)
+    ], order='name asc')
+
+    department_list = []
+    for dept in departments:
+        department_list.append({
+            'id': dept.id,
+            'name': dept.name,
+            'parent_id': dept.parent_id.id if dept.parent_id else False,
+            'parent_name': dept.parent_id.name if dept.parent_id else '',
+            'manager_id': dept.manager_id.id if dept.manager_id else False,
+            'manager_name': dept.manager_id.name if dept.manager_id else '',
+            'total_employee': dept.total_employee or 0,
+        })
+    return department_list
+
+
+def get_job_list(env):
+    """Danh sách chức vụ đang hoạt động (dữ liệu thuần, dùng chung qua cache)"""
+    jobs = env['hr.job'].sudo().search([
+        ('active', '=', True)
+    ], order='name asc')
+
+    job_list = []
+    for job in jobs:
+        job_list.append({
+            'id': job.id,
+            'name': job.name,
+            'department_id': job.department_id.id if job.department_id else False,
+            'department_name': job.department_id.name if job.department_id else '',
+            'no_of_employee': job.no_of_employee or 0,
+        })
+    return job_list
+
 
 class EmployeeController(http.Controller):
     """API endpoints cho nhân viên"""
 
-    def _get_env(self):
-        """Lấy environment từ token"""
-        db_name = request.jwt_payload.get('db')
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-        cr = registry.cursor()
-        return odoo.api.Environment(cr, odoo.SUPERUSER_ID, {}), cr
+    def _parse_list_fields(self, requested):
+        """Danh sách trường API từ tham số fields (list hoặc chuỗi 'a,b'); None nếu có trường lạ"""
+        if not requested:
+            return DEFAULT_EMPLOYEE_LIST_FIELDS
+        if isinstance(requested, str):
+            requested = [name.strip() for name in requested.split(',') if name.strip()]
+        if any(name not in EMPLOYEE_LIST_FIELDS for name in requested):
+            return None
+        return ['id'] + [name for name in requested if name != 'id']
+
+    def _read_list_fields(self, employees, field_names):
+        """Đọc các trường cần thiết bằng 1 lần web_read (many2one chỉ lấy id, name)"""
+        specification = {}
+        for name in field_names:
+            orm_field = EMPLOYEE_LIST_FIELDS[name][0]
+            if employees._fields[orm_field].type == 'many2one':
+                specification[orm_field] = {'fields': {'name': {}}}
+            else:
+                specification[orm_field] = {}
+
+        result = []
+        for row in employees.web_read(specification):
+            values = {}
+            for name in field_names:
+                orm_field, convert = EMPLOYEE_LIST_FIELDS[name]
+                if name == 'avatar_url':
+                    values[name] = self._avatar_url(row['id'], row['write_date'])
+                else:
+                    values[name] = convert(row[orm_field]) if convert else row[orm_field]
+            result.append(values)
+        return result
+
+    def _avatar_url(self, employee_id, write_date):
+        version = int(write_date.timestamp()) if write_date else 0
+        return f'/api/v1/employee/{employee_id}/avatar?v={version}'
 
     # ========== GET LIST ==========
-    @http.route('/api/v1/employee/list', type='http', auth='none', methods=['POST'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/v1/employee/list', type='http', auth='none', methods=['POST'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_employee_list(self):
         """Lấy danh sách nhân viên với tìm kiếm và lọc"""
         try:
             data = _get_json_data()
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
 
             # Lấy tham số từ request
             search_text = data.get('search', '')
@@ -42,166 +159,159 @@ class EmployeeController(http.Controller):
             active = data.get('active', True)
             limit = data.get('limit', 50)
             offset = data.get('offset', 0)
+            cursor = data.get('cursor')
+            with_count = _get_bool_param(data.get('with_count'))
+
+            # Xây dựng domain tìm kiếm
+            domain = []
+
+            if active is not None:
+                domain.append(('active', '=', active))
+
+            if search_text:
+                domain.append('|')
+                domain.append('|')
+                domain.append(('name', 'ilike', search_text))
+                domain.append(('work_email', 'ilike', search_text))
+                domain.append(('mobile_phone', 'ilike', search_text))
+
+            if department_id:
+                domain.append(('department_id', '=', department_id))
+
+            if job_id:
+                domain.append(('job_id', '=', job_id))
+
+            # Tìm kiếm nhân viên
+            Employee = env['hr.employee'].sudo()
+            employees, next_cursor = Employee._keyset_search(
+                domain, 'name', limit, cursor=cursor, descending=False, offset=offset)
+
+            # Đếm tổng số bản ghi (trang đầu hoặc khi client yêu cầu)
+            total_count = Employee._keyset_total_count(domain, cursor, with_count)
+
+            # Chỉ đọc các cột client cần (fields=...), 1 lần đọc cho cả trang
+            field_names = self._parse_list_fields(data.get('fields'))
+            if field_names is None:
+                return ResponseFormatter.error_response(
+                    f"fields chỉ nhận: {', '.join(EMPLOYEE_LIST_FIELDS)}", ResponseFormatter.HTTP_BAD_REQUEST)
+            employee_list = self._read_list_fields(employees, field_names)
+
+            result = {
+                'employees': employee_list,
+                'total_count': total_count,
+                'limit': limit,
+                'offset': offset,
+                'next_cursor': next_cursor,
+            }
+
+            return ResponseFormatter.success_response('Lấy danh sách nhân viên thành công', result, ResponseFormatter.HTTP_OK)
+
+        except InvalidCursorError as e:
+            return ResponseFormatter.error_response(str(e), ResponseFormatter.HTTP_BAD_REQUEST)
+        except Exception as e:
+            _logger.error(f"Get employee list error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
-            try:
-                # Xây dựng domain tìm kiếm
-                domain = []
-
-                if active is not None:
-                    domain.append(('active', '=', active))
-
-                if search_text:
-                    domain.append('|')
-                    domain.append('|')
-                    domain.append(('name', 'ilike', search_text))
-                    domain.append(('work_email', 'ilike', search_text))
-                    domain.append(('mobile_phone', 'ilike', search_text))
-
-                if department_id:
-                    domain.append(('department_id', '=', department_id))
-
-                if job_id:
-                    domain.append(('job_id', '=', job_id))
-
-                # Tìm kiếm nhân viên
-                employees = env['hr.employee'].sudo().search(
-                    domain,
-                    limit=limit,
-                    offset=offset,
-                    order='name asc'
-                )
-
-                # Đếm tổng số bản ghi
-                total_count = env['hr.employee'].sudo().search_count(domain)
-
-                # Chuẩn bị dữ liệu trả về
-                employee_list = []
-                for emp in employees:
-                    employee_list.append({
-                        'id': emp.id,
-                        'name': emp.name,
-                        'work_email': emp.work_email or '',
-                        'mobile_phone': emp.mobile_phone or '',
-                        'work_phone': emp.work_phone or '',
-                        'department_id': emp.department_id.id if emp.department_id else False,
-                        'department_name': emp.department_id.name if emp.department_id else '',
-                        'job_id': emp.job_id.id if emp.job_id else False,
-                        'job_title': emp.job_id.name if emp.job_id else '',
-                        'parent_id': emp.parent_id.id if emp.parent_id else False,
-                        'parent_name': emp.parent_id.name if emp.parent_id else '',
-                        'company_id': emp.company_id.id if emp.company_id else False,
-                        'company_name': emp.company_id.name if emp.company_id else '',
-                        'active': emp.active,
-                        'image_128': emp.image_128.decode('utf-8') if emp.image_128 else False,
-                    })
-
-                result = {
-                    'employees': employee_list,
-                    'total_count': total_count,
-                    'limit': limit,
-                    'offset': offset,
-                }
-
-                cr.commit()
-                return ResponseFormatter.success_response('Lấy danh sách nhân viên thành công', result, ResponseFormatter.HTTP_OK)
-
-            except Exception as e:
-                cr.rollback()
-                raise
+    # ========== GET AVATAR ==========
+    @http.route('/api/v1/employee/<int:employee_id>/avatar', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
+    def get_employee_avatar(self, employee_id):
+        """Ảnh đại diện nhân viên dạng bytes, có ETag và Cache-Control dài hạn"""
+        try:
+            size = request.httprequest.args.get('size', '128')
+            if size not in AVATAR_SIZES:
+                return ResponseFormatter.error_response('size không hợp lệ', ResponseFormatter.HTTP_BAD_REQUEST)
+
+            env = get_env()
+            employee = env['hr.employee'].sudo().browse(employee_id).exists()
+            if not employee:
+                return ResponseFormatter.error_response('Không tìm thấy nhân viên', ResponseFormatter.HTTP_NOT_FOUND)
+
+            # ETag từ checksum attachment - không cần đọc nội dung ảnh
+            field_name = f'image_{size}'
+            attachment = env['ir.attachment'].sudo().search_read([
+                ('res_model', '=', 'hr.employee'),
+                ('res_field', '=', field_name),
+                ('res_id', '=', employee.id),
+            ], ['checksum', 'mimetype'], limit=1)
+            if attachment:
+                etag = f'W/"{attachment[0]["checksum"]}"'
+                mimetype = attachment[0]['mimetype']
+            else:
+                # Chưa có ảnh: dùng avatar mặc định (SVG sinh từ tên)
+                field_name = f'avatar_{size}'
+                etag = f'W/"{employee.id}-{int(employee.write_date.timestamp())}"'
+                mimetype = None
+
+            if ResponseFormatter.is_not_modified(etag):
+                return ResponseFormatter.not_modified_response(etag, AVATAR_CACHE_MAX_AGE)
+
+            content = base64.b64decode(employee[field_name] or b'')
+            if not content:
+                return ResponseFormatter.error_response('Nhân viên chưa có ảnh', ResponseFormatter.HTTP_NOT_FOUND)
+            return ResponseFormatter.binary_response(
+                content,
+                mimetype or guess_mimetype(content, default='image/png'),
+                etag=etag,
+                max_age=AVATAR_CACHE_MAX_AGE,
+            )
 
         except Exception as e:
-            _logger.error(f"Get employee list error: {str(e)}", exc_info=True)
+            _logger.error(f"Get employee avatar error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== GET DETAIL ==========
-    @http.route('/api/employee/detail', type='http', auth='none', methods=['POST'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/employee/detail', type='http', auth='none', methods=['POST'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_employee_detail(self):
         """Lấy thông tin chi tiết nhân viên"""
         try:
             data = _get_json_data()
             employee_id = data.get('employee_id')
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
 
-            try:
-                employee_data = env['hr.employee'].api_get_employee_detail(employee_id, user_id)
-                cr.commit()
+            employee_data = env['hr.employee'].api_get_employee_detail(employee_id, user_id)
 
-                return ResponseFormatter.success_response('Lấy thông tin nhân viên thành công', employee_data, ResponseFormatter.HTTP_OK)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Lấy thông tin nhân viên thành công', employee_data, ResponseFormatter.HTTP_OK)
 
         except Exception as e:
             _logger.error(f"Get employee detail error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== GET DEPARTMENTS ==========
-    @http.route('/api/v1/employee/departments', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/v1/employee/departments', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_departments(self):
-        """Lấy danh sách phòng ban"""
+        """Lấy danh sách phòng ban (cache dùng chung SHARED_LIST_CACHE_TTL giây)"""
         try:
-            env, cr = self._get_env()
-
-            try:
-                departments = env['hr.department'].sudo().search([
-                    ('active', '=', True)
-                ], order='name asc')
-
-                department_list = []
-                for dept in departments:
-                    department_list.append({
-                        'id': dept.id,
-                        'name': dept.name,
-                        'parent_id': dept.parent_id.id if dept.parent_id else False,
-                        'parent_name': dept.parent_id.name if dept.parent_id else '',
-                        'manager_id': dept.manager_id.id if dept.manager_id else False,
-                        'manager_name': dept.manager_id.name if dept.manager_id else '',
-                        'total_employee': dept.total_employee or 0,
-                    })
-
-                cr.commit()
-                return ResponseFormatter.success_response('Lấy danh sách phòng ban thành công', department_list, ResponseFormatter.HTTP_OK)
-
-            except Exception as e:
-                cr.rollback()
-                raise
+            env = get_env()
+
+            department_list = api_cache.get_or_compute(
+                DEPARTMENTS_CACHE, SHARED_LIST_CACHE_TTL, (env.cr.dbname,),
+                lambda: get_department_list(env),
+            )
+
+            return ResponseFormatter.success_response('Lấy danh sách phòng ban thành công', department_list, ResponseFormatter.HTTP_OK)
 
         except Exception as e:
             _logger.error(f"Get departments error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== GET JOBS ==========
-    @http.route('/api/v1/employee/jobs', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/v1/employee/jobs', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_jobs(self):
-        """Lấy danh sách chức vụ"""
+        """Lấy danh sách chức vụ (cache dùng chung SHARED_LIST_CACHE_TTL giây)"""
         try:
-            env, cr = self._get_env()
-
-            try:
-                jobs = env['hr.job'].sudo().search([
-                    ('active', '=', True)
-                ], order='name asc')
-
-                job_list = []
-                for job in jobs:
-                    job_list.append({
-                        'id': job.id,
-                        'name': job.name,
-                        'department_id': job.department_id.id if job.department_id else False,
-                        'department_name': job.department_id.name if job.department_id else '',
-                        'no_of_employee': job.no_of_employee or 0,
-                    })
-
-                cr.commit()
-                return ResponseFormatter.success_response('Lấy danh sách chức vụ thành công', job_list, ResponseFormatter.HTTP_OK)
-
-            except Exception as e:
-                cr.rollback()
-                raise
+            env = get_env()
+
+            job_list = api_cache.get_or_compute(
+                JOBS_CACHE, SHARED_LIST_CACHE_TTL, (env.cr.dbname,),
+                lambda: get_job_list(env),
+            )
+
+            return ResponseFormatter.success_response('Lấy danh sách chức vụ thành công', job_list, ResponseFormatter.HTTP_OK)
 
         except Exception as e:
             _logger.error(f"Get jobs error: {str(e)}", exc_info=True)
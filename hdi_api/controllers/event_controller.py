@@ -0,0 +1,159 @@
+"""
+API Controller cho luồng sự kiện
+App nhận ngay sự kiện giải trình được duyệt/từ chối, nghỉ phép được duyệt,
+phiếu lương được công bố và đăng xuất bắt buộc thay vì gọi lại danh sách định kỳ
+
+Kết nối chờ lâu: ở chế độ prefork nên chuyển /api/v1/events tới cổng gevent
+(giống /websocket) để không chiếm HTTP worker
+"""
+import logging
+import time
+
+import odoo
+from odoo import http
+from odoo.http import request, Response
+from odoo.tools import config
+
+from .auth_controller import _verify_token_readonly
+from ..utils import event_stream, json_codec
+from ..utils.response_formatter import ResponseFormatter
+
+_logger = logging.getLogger(__name__)
+
+# SSE: giữ kết nối tối đa STREAM_MAX_DURATION giây rồi để client kết nối lại (kiểm tra lại token)
+STREAM_MAX_DURATION = 300
+# Gửi comment giữ kết nối qua proxy
+HEARTBEAT_INTERVAL = 25
+# Long-poll: chờ tối đa LONGPOLL_TIMEOUT giây
+LONGPOLL_TIMEOUT = 30
+# Listener không hoạt động: tự hỏi lại DB theo chu kỳ này
+FALLBACK_POLL_INTERVAL = 5
+# Client tự kết nối lại sau (ms)
+SSE_RETRY_MS = 3000
+# Kết thúc kết nối sớm hơn limit_time_real của worker prefork (giây)
+TIME_LIMIT_MARGIN = 10
+
+
+def _max_wait(duration):
+    """
+    Thời gian giữ kết nối tối đa
+
+    Ngoài gevent, request chạy trong HTTP worker bị kill khi vượt limit_time_real:
+    kết thúc trước giới hạn đó để client kết nối lại bình thường.
+    """
+    limit = config.get('limit_time_real') or 0
+    if odoo.evented or limit <= 0:
+        return duration
+    return max(1, min(duration, limit - TIME_LIMIT_MARGIN))
+
+
+def _get_last_event_id():
+    """Id sự kiện cuối cùng client đã nhận: header Last-Event-ID (SSE) hoặc query last_id"""
+    value = request.httprequest.headers.get('Last-Event-ID') or request.httprequest.args.get('last_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _wait_for_events(db_name, user_id, last_id, deadline, waiter):
+    """
+    Chờ tới khi có sự kiện hoặc hết hạn - không giữ cursor trong lúc chờ
+
+    Chỉ đọc lại DB khi được đánh thức, khi listener kết nối lại (có thể lỡ thông báo)
+    hoặc theo chu kỳ FALLBACK_POLL_INTERVAL nếu listener không hoạt động
+    """
+    waiter.clear()
+    generation = event_stream.listener_generation()
+    last_id, events = event_stream.fetch(db_name, user_id, last_id)
+    while not events:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        interval = HEARTBEAT_INTERVAL if generation is not None else FALLBACK_POLL_INTERVAL
+        woken = waiter.wait(min(remaining, interval))
+        current_generation = event_stream.listener_generation()
+        if woken or generation is None or current_generation != generation:
+            waiter.clear()
+            generation = current_generation
+            last_id, events = event_stream.fetch(db_name, user_id, last_id)
+    return last_id, events
+
+
+def _sse_message(event):
+    data = json_codec.dumps(event['payload']).decode('utf-8')
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode('utf-8')
+
+
+def _stream_sse(db_name, user_id, last_id, expires_at):
+    deadline = time.monotonic() + min(_max_wait(STREAM_MAX_DURATION), max(0, expires_at - time.time()))
+    with event_stream.subscribe(db_name, user_id) as waiter:
+        if last_id is None:
+            last_id, _events = event_stream.fetch(db_name, user_id, None)
+        # Dòng id không kèm data: client ghi nhận mốc (Last-Event-ID) mà không phát sự kiện
+        yield f"retry: {SSE_RETRY_MS}\nid: {last_id}\n\n".encode('utf-8')
+        while time.monotonic() < deadline:
+            heartbeat_deadline = min(deadline, time.monotonic() + HEARTBEAT_INTERVAL)
+            last_id, events = _wait_for_events(db_name, user_id, last_id, heartbeat_deadline, waiter)
+            for event in events:
+                yield _sse_message(event)
+            if any(event['type'] == event_stream.EVENT_FORCED_LOGOUT for event in events):
+                return
+            if not events:
+                yield b": ping\n\n"
+
+
+def _long_poll(db_name, user_id, last_id):
+    with event_stream.subscribe(db_name, user_id) as waiter:
+        if last_id is None:
+            last_id, events = event_stream.fetch(db_name, user_id, None)
+        else:
+            last_id, events = _wait_for_events(
+                db_name, user_id, last_id, time.monotonic() + _max_wait(LONGPOLL_TIMEOUT), waiter)
+    response_dict = ResponseFormatter.success('Lấy sự kiện thành công', {'last_id': last_id, 'events': events})
+    yield json_codec.dumps(response_dict)
+
+
+class EventAPI(http.Controller):
+    """API endpoint luồng sự kiện theo user"""
+
+    # ========== EVENTS ==========
+    @http.route('/api/v1/events', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
+    def events(self):
+        """
+        Sự kiện của user từ bus.bus
+
+        - Accept: text/event-stream → Server-Sent Events, kết nối giữ tối đa STREAM_MAX_DURATION giây
+        - Ngược lại → long-poll: trả JSON {'last_id', 'events'} ngay khi có sự kiện
+          hoặc sau LONGPOLL_TIMEOUT giây
+        - Tiếp tục từ sự kiện đã nhận qua header Last-Event-ID hoặc query last_id;
+          lần đầu (không có mốc) chỉ trả về mốc hiện tại
+
+        Token chỉ được kiểm tra khi mở kết nối; phần chờ chạy sau khi phiên DB
+        của request đã đóng (response dạng stream).
+        """
+        try:
+            payload = request.jwt_payload
+            db_name, user_id = payload['db'], payload.get('user_id')
+            last_id = _get_last_event_id()
+
+            if 'text/event-stream' in request.httprequest.headers.get('Accept', ''):
+                return Response(
+                    _stream_sse(db_name, user_id, last_id, payload.get('exp') or 0),
+                    status=ResponseFormatter.HTTP_OK,
+                    content_type='text/event-stream; charset=utf-8',
+                    headers=[('Cache-Control', 'no-store'), ('X-Accel-Buffering', 'no')],
+                    direct_passthrough=True,
+                )
+            return Response(
+                _long_poll(db_name, user_id, last_id),
+                status=ResponseFormatter.HTTP_OK,
+                content_type='application/json; charset=utf-8',
+                headers=[('Cache-Control', 'no-store')],
+                direct_passthrough=True,
+            )
+
+        except Exception as e:
+            _logger.error(f"Events error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
@@ -0,0 +1,148 @@
+"""
+API Controller cho màn hình chính của app
+Gộp trạng thái chấm công, giờ làm hôm nay, tổng hợp tháng, lương tháng hiện tại,
+phép còn lại và số giải trình chờ duyệt vào 1 response (cache ngắn theo user)
+"""
+import logging
+from datetime import datetime, time
+
+import pytz
+from dateutil.relativedelta import relativedelta
+from odoo import fields, http
+from odoo.http import request
+from odoo.osv import expression
+
+from .auth_controller import _verify_token_readonly
+from ..utils import api_cache
+from ..utils.db_session import get_env
+from ..utils.response_formatter import ResponseFormatter
+
+_logger = logging.getLogger(__name__)
+
+HOME_CACHE = 'home'
+# Đủ để gộp các lần mở app dồn dập, dữ liệu tự làm mới sau vài giây
+HOME_CACHE_TTL = 10
+
+
+def invalidate_home_cache(env, user_id):
+    """Bỏ cache màn hình chính của user sau khi transaction hiện tại commit"""
+    if user_id:
+        api_cache.invalidate_after_commit(env, HOME_CACHE, (env.cr.dbname, user_id))
+
+
+class HomeAPI(http.Controller):
+    """API endpoint cho màn hình chính"""
+
+    def _get_attendance_data(self, env, employee, now, local_today):
+        """
+        Trạng thái chấm công, giờ làm hôm nay và tổng hợp tháng - 1 câu truy vấn
+
+        now là UTC (giống check_in); đầu ngày / đầu tháng tính theo múi giờ nhân viên rồi đổi về UTC
+        """
+        today, _tomorrow = env['hr.attendance']._get_local_day_bounds(employee, now)
+        tz = pytz.timezone(employee._get_tz() or 'UTC')
+        month_start = tz.localize(datetime.combine(local_today.replace(day=1), time.min))
+        month_start = month_start.astimezone(pytz.UTC).replace(tzinfo=None)
+        attendances = env['hr.attendance'].search_fetch(
+            expression.AND([
+                [('employee_id', '=', employee.id)],
+                expression.OR([[('check_in', '>=', month_start)], [('check_out', '=', False)]]),
+            ]),
+            ['check_in', 'check_out', 'worked_hours', 'in_latitude', 'in_longitude'],
+            order='check_in desc',
+        )
+
+        current = attendances.filtered(lambda att: not att.check_out)[:1]
+        # Cùng cách tính với /api/v1/attendance/summary
+        month_attendances = attendances.filtered(lambda att: att.check_in >= month_start)
+        total_days = len(month_attendances)
+        total_hours = sum(att.worked_hours for att in month_attendances if att.check_out)
+        incomplete_days = sum(1 for att in month_attendances if not att.check_out)
+
+        today_hours = sum(att.worked_hours for att in attendances if att.check_out and att.check_in >= today)
+        if current and current.check_in >= today:
+            today_hours += (now - current.check_in).total_seconds() / 3600.0
+
+        status = {'is_checked_in': bool(current)}
+        if current:
+            status.update({
+                'attendance_id': current.id,
+                'check_in': current.check_in,
+                'in_latitude': current.in_latitude,
+                'in_longitude': current.in_longitude,
+            })
+
+        summary = {
+            'month': local_today.strftime('%Y-%m'),
+            'total_days': total_days,
+            'total_hours': round(total_hours, 2),
+            'incomplete_days': incomplete_days,
+            'average_hours_per_day': round(total_hours / total_days, 2) if total_days > 0 else 0,
+        }
+        return status, round(today_hours, 2), summary
+
+    def _get_current_payslip(self, env, employee, local_today):
+        """Bảng lương tháng hiện tại (cùng điều kiện với /api/v1/payslip/current-month)"""
+        first_day = local_today.replace(day=1)
+        last_day = first_day + relativedelta(months=1, days=-1)
+        payslip = env['hr.payslip'].search_fetch([
+            ('employee_id', '=', employee.id),
+            ('date_from', '>=', first_day),
+            ('date_to', '<=', last_day),
+        ], ['name', 'state', 'net_wage'], limit=1, order='date_from desc')
+        if not payslip:
+            return None
+        return {
+            'id': payslip.id,
+            'name': payslip.name,
+            'state': payslip.state,
+            'net_wage': payslip.net_wage,
+        }
+
+    def _compute_home(self, env, user_id):
+        employee = env['hr.employee'].search_fetch([('user_id', '=', user_id)], ['name'], limit=1)
+        if not employee:
+            return None
+
+        now = fields.Datetime.now()
+        local_today = pytz.UTC.localize(now).astimezone(pytz.timezone(employee._get_tz() or 'UTC')).date()
+        status, today_hours, summary = self._get_attendance_data(env, employee, now, local_today)
+        return {
+            'employee_id': employee.id,
+            'employee_name': employee.name,
+            'attendance_status': status,
+            'today_worked_hours': today_hours,
+            'month_summary': summary,
+            'current_payslip': self._get_current_payslip(env, employee, local_today),
+            'remaining_leaves': env['hr.leave'].sudo()._get_remaining_days_by_type(employee),
+            'pending_excuse_count': env['attendance.excuse'].search_count([
+                ('employee_id', '=', employee.id),
+                ('state', '=', 'submitted'),
+            ]),
+        }
+
+    # ========== HOME ==========
+    @http.route('/api/v1/home', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
+    def get_home(self):
+        """Dữ liệu màn hình chính - cache theo user trong HOME_CACHE_TTL giây (single-flight)"""
+        try:
+            user_id = request.jwt_payload.get('user_id')
+            env = get_env()
+
+            # Bấm nhiều lần liên tiếp: các request đồng thời dùng chung 1 lần tính
+            result = api_cache.get_or_compute(
+                HOME_CACHE, HOME_CACHE_TTL, (env.cr.dbname, user_id),
+                lambda: self._compute_home(env, user_id),
+            )
+            if result is None:
+                return ResponseFormatter.error_response(
+                    'Không tìm thấy thông tin nhân viên',
+                    ResponseFormatter.HTTP_NOT_FOUND
+                )
+
+            return ResponseFormatter.success_response('Lấy dữ liệu màn hình chính thành công', result)
+
+        except Exception as e:
+            _logger.error(f"Get home error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
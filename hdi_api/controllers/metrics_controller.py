@@ -0,0 +1,38 @@
+"""
+API Controller cho số liệu giám sát
+Xuất số liệu theo endpoint (Prometheus text) cho hệ thống giám sát
+"""
+import hmac
+
+from odoo import http
+from odoo.http import Response
+from odoo.tools import config
+
+from .auth_controller import _get_bearer_token
+from ..utils import metrics
+from ..utils.response_formatter import ResponseFormatter
+
+# Token tĩnh cho Prometheus trong odoo.conf (hdi_api_metrics_token); chưa cấu hình thì endpoint tắt
+METRICS_TOKEN_OPTION = 'hdi_api_metrics_token'
+
+
+class MetricsAPI(http.Controller):
+    """API endpoint số liệu giám sát"""
+
+    @http.route('/api/v1/metrics', type='http', auth='none', methods=['GET'], csrf=False)
+    def get_metrics(self):
+        """Số liệu theo route/status của mọi worker - yêu cầu Authorization: Bearer <hdi_api_metrics_token>"""
+        expected = config.get(METRICS_TOKEN_OPTION)
+        if not expected:
+            return ResponseFormatter.error_response('Không tìm thấy', ResponseFormatter.HTTP_NOT_FOUND)
+
+        token = _get_bearer_token() or ''
+        if not hmac.compare_digest(token.encode(), str(expected).encode()):
+            return ResponseFormatter.error_response('Token không hợp lệ', ResponseFormatter.HTTP_UNAUTHORIZED)
+
+        return Response(
+            metrics.render(),
+            status=ResponseFormatter.HTTP_OK,
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+            headers=[('Cache-Control', 'no-store')],
+        )
@@ -0,0 +1,126 @@
+"""
+API Controller cho đồng bộ delta
+Client offline chỉ tải các bản ghi được tạo, sửa hoặc xóa kể từ watermark lần trước
+"""
+import base64
+import binascii
+import logging
+from datetime import datetime, timedelta
+
+from odoo import http
+from odoo.http import request
+
+from .auth_controller import _verify_token_readonly
+from ..models.api_sync import SYNC_TOMBSTONE_RETENTION
+from ..utils.db_session import get_env
+from ..utils.response_formatter import ResponseFormatter
+
+_logger = logging.getLogger(__name__)
+
+# Tên nhóm trong response -> (model, specification cho web_read)
+SYNC_MODELS = {
+    'attendances': ('hr.attendance', {
+        'check_in': {}, 'check_out': {}, 'worked_hours': {},
+        'in_latitude': {}, 'in_longitude': {}, 'out_latitude': {}, 'out_longitude': {},
+    }),
+    'excuses': ('attendance.excuse', {
+        'attendance_id': {}, 'date': {}, 'excuse_type': {}, 'state': {}, 'reason': {},
+        'original_checkin': {}, 'original_checkout': {},
+        'requested_checkin': {}, 'requested_checkout': {},
+    }),
+    'leaves': ('hr.leave', {
+        'holiday_status_id': {'fields': {'name': {}}},
+        'date_from': {}, 'date_to': {}, 'number_of_days': {}, 'state': {},
+    }),
+    'payslips': ('hr.payslip', {
+        'name': {}, 'number': {}, 'date_from': {}, 'date_to': {}, 'state': {},
+        'basic_wage': {}, 'gross_wage': {}, 'net_wage': {},
+    }),
+}
+
+# write_date là thời điểm bắt đầu transaction: lùi watermark để không bỏ sót
+# bản ghi của transaction dài commit sau lần đồng bộ (client nhận trùng thì ghi đè)
+SYNC_SAFETY_MARGIN = timedelta(minutes=5)
+
+
+def _encode_watermark(value):
+    return base64.urlsafe_b64encode(value.isoformat().encode()).decode().rstrip('=')
+
+
+def _decode_watermark(watermark):
+    """Giải mã watermark do server phát hành - ValueError nếu không hợp lệ"""
+    padded = watermark + '=' * (-len(watermark) % 4)
+    try:
+        value = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f'Invalid watermark: {e}') from e
+    since = datetime.fromisoformat(value)
+    # Watermark do server phát hành là UTC không kèm múi giờ (giống write_date)
+    if since.tzinfo is not None:
+        raise ValueError('Watermark must not carry a timezone')
+    return since
+
+
+class SyncAPI(http.Controller):
+    """API endpoint đồng bộ delta cho app offline"""
+
+    # ========== SYNC ==========
+    @http.route('/api/v1/sync', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
+    def sync(self):
+        """
+        Đồng bộ delta dữ liệu chấm công, giải trình, nghỉ phép và bảng lương của user
+
+        Query: since=<watermark> từ lần đồng bộ trước (bỏ trống: đồng bộ toàn bộ)
+        Kết quả: {'watermark', 'full_resync', 'changed': {nhóm: [bản ghi]}, 'deleted': {nhóm: [id]}}
+        """
+        try:
+            user_id = request.jwt_payload.get('user_id')
+            env = get_env()
+
+            employee = env['hr.employee'].search([('user_id', '=', user_id)], limit=1)
+            if not employee:
+                return ResponseFormatter.error_response(
+                    'Không tìm thấy thông tin nhân viên',
+                    ResponseFormatter.HTTP_NOT_FOUND
+                )
+
+            since = None
+            watermark = request.httprequest.args.get('since')
+            if watermark:
+                try:
+                    since = _decode_watermark(watermark)
+                except ValueError:
+                    return ResponseFormatter.error_response('Watermark không hợp lệ', ResponseFormatter.HTTP_BAD_REQUEST)
+
+            now = env.cr.now()
+            # Tombstone cũ đã bị dọn: không xác định được bản ghi đã xóa, client đồng bộ lại toàn bộ
+            full_resync = since is None or since < now - SYNC_TOMBSTONE_RETENTION
+            if full_resync:
+                since = None
+
+            changed = {}
+            for group, (model_name, specification) in SYNC_MODELS.items():
+                domain = [('employee_id', '=', employee.id)]
+                if since:
+                    domain.append(('write_date', '>=', since))
+                records = env[model_name].search(domain, order='write_date, id')
+                changed[group] = records.web_read(dict(specification, write_date={})) if records else []
+
+            deleted = {group: [] for group in SYNC_MODELS}
+            if since:
+                deleted_ids = env['hdi.api.sync.tombstone']._get_deleted_ids(
+                    employee.id, [model_name for model_name, _spec in SYNC_MODELS.values()], since)
+                deleted = {group: deleted_ids[model_name] for group, (model_name, _spec) in SYNC_MODELS.items()}
+
+            result = {
+                'watermark': _encode_watermark(now - SYNC_SAFETY_MARGIN),
+                'full_resync': full_resync,
+                'changed': changed,
+                'deleted': deleted,
+            }
+            return ResponseFormatter.success_response('Đồng bộ dữ liệu thành công', result)
+
+        except Exception as e:
+            _logger.error(f"Sync error: {str(e)}", exc_info=True)
+            return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
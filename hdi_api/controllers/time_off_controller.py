@@ -5,72 +5,75 @@ Xử lý các endpoint API cho quản lý nghỉ phép
 import logging
 from odoo import http
 from odoo.http import request
+from odoo.addons.hdi_base.models.keyset_pagination_mixin import InvalidCursorError
 
-from .auth_controller import _verify_token_http, _get_json_data
+from .auth_controller import _verify_token_http, _verify_token_readonly, _get_json_data, _get_bool_param
+from ..utils import api_cache
+from ..utils.db_session import get_env
 from ..utils.response_formatter import ResponseFormatter
 
 _logger = logging.getLogger(__name__)
 
+# Loại nghỉ dùng chung cho mọi user: cache theo database, tự làm mới sau TTL
+LEAVE_TYPES_CACHE = 'leave_types'
+LEAVE_TYPES_CACHE_TTL = 60
+
 
 class TimeOffController(http.Controller):
     """API endpoints cho quản lý time off/nghỉ phép"""
 
-    def _get_env(self):
-        """Lấy environment từ token"""
-        db_name = request.jwt_payload.get('db')
-        import odoo
-        from odoo.modules.registry import Registry
-
-        registry = Registry(db_name)
-        cr = registry.cursor()
-        return odoo.api.Environment(cr, odoo.SUPERUSER_ID, {}), cr
-
     # ========== GET LEAVE TYPES ==========
-    @http.route('/api/time-off/types', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/time-off/types', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_leave_types(self):
-        """Lấy danh sách các loại nghỉ"""
+        """Lấy danh sách các loại nghỉ (cache dùng chung LEAVE_TYPES_CACHE_TTL giây)"""
         try:
-            env, cr = self._get_env()
+            env = get_env()
+
+            types_data = api_cache.get_or_compute(
+                LEAVE_TYPES_CACHE, LEAVE_TYPES_CACHE_TTL, (env.cr.dbname,),
+                lambda: env['hr.leave'].sudo().api_get_leave_types(),
+            )
             
-            try:
-                types_data = env['hr.leave'].sudo().api_get_leave_types()
-                cr.commit()
-                
-                return ResponseFormatter.success_response('Lấy danh sách loại nghỉ thành công', types_data)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Lấy danh sách loại nghỉ thành công', types_data)
 
         except Exception as e:
             _logger.error(f"Get leave types error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== GET REMAINING DAYS ==========
-    @http.route('/api/time-off/remaining-days', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/time-off/remaining-days', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_remaining_days(self):
         """Lấy số ngày phép còn lại"""
         try:
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
+
+            # Trả 304 nếu loại nghỉ, phân bổ và đơn đã duyệt của nhân viên không đổi
+            employee = env['res.users'].browse(user_id).employee_id
+            etag = None
+            if employee:
+                etag = ResponseFormatter.data_etag(env, [
+                    ('hr.employee', [('id', '=', employee.id)]),
+                    ('hr.leave.type', [('active', '=', True)]),
+                    ('hr.leave.allocation', [('employee_id', '=', employee.id), ('state', '=', 'validate')]),
+                    ('hr.leave', [('employee_id', '=', employee.id), ('state', '=', 'validate')]),
+                ])
+                if ResponseFormatter.is_not_modified(etag):
+                    return ResponseFormatter.not_modified_response(etag)
+
+            result = env['hr.leave'].sudo().api_get_remaining_days(user_id)
             
-            try:
-                result = env['hr.leave'].sudo().api_get_remaining_days(user_id)
-                cr.commit()
-                
-                return ResponseFormatter.success_response('Lấy số ngày phép còn lại thành công', result)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Lấy số ngày phép còn lại thành công', result, etag=etag)
 
         except Exception as e:
             _logger.error(f"Get remaining days error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== GET LEAVE LIST ==========
-    @http.route('/api/time-off/list', type='http', auth='none', methods=['GET'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/time-off/list', type='http', auth='none', methods=['GET'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_leave_list(self):
         """Lấy danh sách đơn xin nghỉ"""
         try:
@@ -78,41 +81,36 @@ class TimeOffController(http.Controller):
             limit = int(request.httprequest.args.get('limit', 10))
             offset = int(request.httprequest.args.get('offset', 0))
             state = request.httprequest.args.get('state')
+            cursor = request.httprequest.args.get('cursor')
+            with_count = _get_bool_param(request.httprequest.args.get('with_count'))
+            
+            env = get_env()
             
-            env, cr = self._get_env()
+            result = env['hr.leave'].sudo().api_get_leave_list(
+                user_id, limit=limit, offset=offset, state=state, cursor=cursor, with_count=with_count)
             
-            try:
-                result = env['hr.leave'].sudo().api_get_leave_list(user_id, limit=limit, offset=offset, state=state)
-                cr.commit()
-                
-                return ResponseFormatter.success_response('Lấy danh sách đơn xin nghỉ thành công', result)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Lấy danh sách đơn xin nghỉ thành công', result)
 
+        except InvalidCursorError as e:
+            return ResponseFormatter.error_response(str(e), ResponseFormatter.HTTP_BAD_REQUEST)
         except Exception as e:
             _logger.error(f"Get leave list error: {str(e)}", exc_info=True)
             return ResponseFormatter.error_response(f'Lỗi: {str(e)}', ResponseFormatter.HTTP_INTERNAL_ERROR)
 
     # ========== GET LEAVE DETAIL ==========
-    @http.route('/api/time-off/detail', type='http', auth='none', methods=['POST'], csrf=False)
-    @_verify_token_http
+    @http.route('/api/time-off/detail', type='http', auth='none', methods=['POST'], csrf=False, readonly=True)
+    @_verify_token_readonly
     def get_leave_detail(self):
         """Lấy chi tiết đơn xin nghỉ"""
         try:
             data = _get_json_data()
             leave_id = data.get('leave_id')
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
             
-            try:
-                leave_data = env['hr.leave'].sudo().api_get_leave_detail(leave_id, user_id)
-                cr.commit()
-                
-                return ResponseFormatter.success_response('Lấy chi tiết đơn xin nghỉ thành công', leave_data)
-            except Exception as e:
-                cr.rollback()
-                raise
+            leave_data = env['hr.leave'].sudo().api_get_leave_detail(leave_id, user_id)
+            
+            return ResponseFormatter.success_response('Lấy chi tiết đơn xin nghỉ thành công', leave_data)
 
         except Exception as e:
             _logger.error(f"Get leave detail error: {str(e)}", exc_info=True)
@@ -126,16 +124,11 @@ class TimeOffController(http.Controller):
         try:
             data = _get_json_data()
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
+            
+            result = env['hr.leave'].sudo().api_create_leave(data, user_id)
             
-            try:
-                result = env['hr.leave'].sudo().api_create_leave(data, user_id)
-                cr.commit()
-                
-                return ResponseFormatter.success_response('Tạo đơn xin nghỉ thành công', result)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Tạo đơn xin nghỉ thành công', result)
 
         except Exception as e:
             _logger.error(f"Create leave error: {str(e)}", exc_info=True)
@@ -149,17 +142,12 @@ class TimeOffController(http.Controller):
         try:
             data = _get_json_data()
             user_id = request.jwt_payload.get('user_id')
-            env, cr = self._get_env()
+            env = get_env()
+            
+            leave = env['hr.leave'].sudo().browse(leave_id)
+            result = leave.api_update_leave(data, user_id)
             
-            try:
-                leave = env['hr.leave'].sudo().browse(leave_id)
-                result = leave.api_update_leave(data, user_id)
-                cr.commit()
-                
-                return ResponseFormatter.success_response('Cập nhật đơn xin nghỉ thành công', result)
-            except Exception as e:
-                cr.rollback()
-                raise
+            return ResponseFormatter.success_response('Cập nhật đơn xin nghỉ thành công', result)
 
         except Exception as e:
             _logger.error(f"Update leave error: {str(e)}", exc_info=True)
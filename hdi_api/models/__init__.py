@@ -1,2 +1,5 @@
 from . import ir_config_parameter
 from . import jwt_token_blacklist
+from . import res_users
+from . import api_sync
+from . import api_event
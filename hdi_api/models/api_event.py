@@ -0,0 +1,65 @@
+from odoo import models
+
+from ..utils import event_stream
+
+
+def _track_state_changes(records, vals, target_states):
+    """Trạng thái cũ của các bản ghi nếu lần ghi này có thể chuyển sang target_states"""
+    if vals.get('state') not in target_states:
+        return {}
+    return {record.id: record.state for record in records}
+
+
+def _changed_records(records, previous_states):
+    return records.filtered(lambda record: record.id in previous_states and previous_states[record.id] != record.state)
+
+
+class AttendanceExcuse(models.Model):
+    _inherit = 'attendance.excuse'
+
+    def write(self, vals):
+        previous_states = _track_state_changes(self, vals, ('approved', 'rejected'))
+        res = super().write(vals)
+        for excuse in _changed_records(self, previous_states):
+            event_type = (event_stream.EVENT_EXCUSE_APPROVED if excuse.state == 'approved'
+                          else event_stream.EVENT_EXCUSE_REJECTED)
+            event_stream.send(self.env, excuse.employee_id.user_id.ids, event_type, {
+                'excuse_id': excuse.id,
+                'date': excuse.date,
+                'excuse_type': excuse.excuse_type,
+                'state': excuse.state,
+            })
+        return res
+
+
+class HrLeave(models.Model):
+    _inherit = 'hr.leave'
+
+    def write(self, vals):
+        previous_states = _track_state_changes(self, vals, ('validate',))
+        res = super().write(vals)
+        for leave in _changed_records(self, previous_states):
+            event_stream.send(self.env, leave.employee_id.user_id.ids, event_stream.EVENT_LEAVE_VALIDATED, {
+                'leave_id': leave.id,
+                'holiday_status_id': leave.holiday_status_id.id,
+                'date_from': leave.date_from,
+                'date_to': leave.date_to,
+                'state': leave.state,
+            })
+        return res
+
+
+class HrPayslip(models.Model):
+    _inherit = 'hr.payslip'
+
+    def write(self, vals):
+        # Phiếu lương chuyển sang 'Đã duyệt' là lúc công bố cho nhân viên
+        previous_states = _track_state_changes(self, vals, ('done',))
+        res = super().write(vals)
+        for payslip in _changed_records(self, previous_states):
+            event_stream.send(self.env, payslip.employee_id.user_id.ids, event_stream.EVENT_PAYSLIP_PUBLISHED, {
+                'payslip_id': payslip.id,
+                'date_from': payslip.date_from,
+                'date_to': payslip.date_to,
+            })
+        return res
@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+# Giữ tombstone đủ lâu cho client offline lâu ngày; quá hạn thì client phải đồng bộ lại toàn bộ
+SYNC_TOMBSTONE_RETENTION = timedelta(days=90)
+
+
+class ApiSyncTombstone(models.Model):
+    _name = 'hdi.api.sync.tombstone'
+    _description = 'API Sync Tombstone'
+    _order = 'create_date desc'
+
+    res_model = fields.Char(
+        string='Model',
+        required=True,
+        help='Model của bản ghi đã xóa'
+    )
+    res_id = fields.Integer(
+        string='Record ID',
+        required=True,
+        help='ID của bản ghi đã xóa'
+    )
+    employee_id = fields.Integer(
+        string='Employee ID',
+        help='Nhân viên sở hữu bản ghi tại thời điểm xóa'
+    )
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Đồng bộ delta đọc tombstone theo nhân viên và thời điểm xóa
+        create_index(
+            self.env.cr,
+            'hdi_api_sync_tombstone_employee_create_date_idx',
+            self._table,
+            ['employee_id', 'create_date'],
+        )
+        return res
+
+    @api.model
+    def _record_deletions(self, records):
+        """Ghi tombstone cho các bản ghi sắp bị xóa"""
+        self.sudo().create([{
+            'res_model': record._name,
+            'res_id': record.id,
+            'employee_id': record.employee_id.id,
+        } for record in records])
+
+    @api.model
+    def _get_deleted_ids(self, employee_id, res_models, since):
+        """{model: [id]} các bản ghi của nhân viên bị xóa từ thời điểm since"""
+        deleted = {res_model: [] for res_model in res_models}
+        for tombstone in self.sudo().search_fetch([
+            ('employee_id', '=', employee_id),
+            ('create_date', '>=', since),
+            ('res_model', 'in', res_models),
+        ], ['res_model', 'res_id'], order='id'):
+            deleted[tombstone.res_model].append(tombstone.res_id)
+        return deleted
+
+    @api.model
+    def _cleanup_old_tombstones(self):
+        """Xóa tombstone quá thời hạn lưu (1 câu DELETE, không qua ORM)"""
+        self.env.cr.execute(
+            "DELETE FROM hdi_api_sync_tombstone WHERE create_date < %s",
+            [fields.Datetime.now() - SYNC_TOMBSTONE_RETENTION],
+        )
+        self.invalidate_model()
+        return True
+
+
+def _create_sync_index(model):
+    """Index (employee_id, write_date) cho đồng bộ delta của 1 model có bảng"""
+    create_index(
+        model.env.cr,
+        f'{model._table}_employee_write_date_idx',
+        model._table,
+        ['employee_id', 'write_date'],
+    )
+
+
+class ApiSyncMixin(models.AbstractModel):
+    """Bản ghi của nhân viên được đồng bộ delta qua /api/v1/sync
+
+    Model kế thừa phải có employee_id. Thay đổi được nhận biết qua write_date
+    (index theo nhân viên tạo trong _auto_init của từng model), bản ghi bị xóa
+    được ghi vào tombstone.
+    """
+    _name = 'hdi.api.sync.mixin'
+    _description = 'API Delta Sync Mixin'
+
+    def unlink(self):
+        self.env['hdi.api.sync.tombstone']._record_deletions(self)
+        return super().unlink()
+
+
+class HrAttendance(models.Model):
+    _name = 'hr.attendance'
+    _inherit = ['hr.attendance', 'hdi.api.sync.mixin']
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        _create_sync_index(self)
+        return res
+
+
+class AttendanceExcuse(models.Model):
+    _name = 'attendance.excuse'
+    _inherit = ['attendance.excuse', 'hdi.api.sync.mixin']
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        _create_sync_index(self)
+        return res
+
+
+class HrLeave(models.Model):
+    _name = 'hr.leave'
+    _inherit = ['hr.leave', 'hdi.api.sync.mixin']
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        _create_sync_index(self)
+        return res
+
+
+class HrPayslip(models.Model):
+    _name = 'hr.payslip'
+    _inherit = ['hr.payslip', 'hdi.api.sync.mixin']
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        _create_sync_index(self)
+        return res
@@ -1,8 +1,95 @@
-from odoo import models, fields
+import json
+from datetime import datetime, timedelta
+
+from odoo import api, models, fields
+
+from ..utils import jwt_keyring, revocation_cache
+
+JWT_SECRET_KEY_PARAM = 'hdi_api.jwt_secret_key'
+JWT_RETIRED_KEYS_PARAM = 'hdi_api.jwt_retired_keys'
+
+# Key cũ còn hiệu lực thêm 1 vòng đời token (30 phút) + dự phòng lệch giờ
+JWT_KEY_GRACE_PERIOD = timedelta(minutes=35)
 
 
 class IrConfigParameter(models.Model):
     _inherit = 'ir.config_parameter'
-    
+
     # Thêm config parameters cho API JWT
     # Các parameter sẽ được lưu trong database
+    #   hdi_api.jwt_secret_key: key ký token hiện hành (đổi giá trị = xoay key)
+    #   hdi_api.jwt_retired_keys: JSON các key cũ [{kid, key, expires}] - tự quản lý
+
+    @api.model
+    def _get_jwt_key_ring(self):
+        """Key ring hiện hành: {'current': kid, 'keys': {kid: key}} gồm key hiện hành và key cũ chưa hết hạn"""
+        current = self.get_param(JWT_SECRET_KEY_PARAM) or jwt_keyring.DEFAULT_JWT_SECRET_KEY
+        now = datetime.utcnow().isoformat()
+        keys = {
+            entry['kid']: entry['key']
+            for entry in self._get_retired_jwt_keys()
+            if entry.get('expires', '') > now
+        }
+        current_kid = jwt_keyring.key_id(current)
+        keys[current_kid] = current
+        return {'current': current_kid, 'keys': keys}
+
+    @api.model
+    def _get_retired_jwt_keys(self):
+        try:
+            return json.loads(self.get_param(JWT_RETIRED_KEYS_PARAM) or '[]')
+        except ValueError:
+            return []
+
+    @api.model
+    def _retire_jwt_keys(self, secret_keys):
+        """Giữ các key vừa bị thay để token đã phát hành còn dùng được tới khi hết hạn"""
+        now = datetime.utcnow()
+        entries = [e for e in self._get_retired_jwt_keys() if e.get('expires', '') > now.isoformat()]
+        expires = (now + JWT_KEY_GRACE_PERIOD).isoformat()
+        for secret_key in secret_keys:
+            kid = jwt_keyring.key_id(secret_key)
+            entries = [e for e in entries if e['kid'] != kid]
+            entries.append({'kid': kid, 'key': secret_key, 'expires': expires})
+        self.sudo().set_param(JWT_RETIRED_KEYS_PARAM, json.dumps(entries))
+
+    def _get_jwt_secret_values(self):
+        return {param.value for param in self if param.key == JWT_SECRET_KEY_PARAM and param.value}
+
+    def _notify_jwt_key_ring_changed(self):
+        """Sau khi commit: bỏ key ring cache của database ở mọi worker"""
+        if not any(param.key and param.key.startswith('hdi_api.jwt_') for param in self):
+            return
+        data = self.env.cr.postcommit.data
+        if data.get('hdi_api.jwt_keyring_notified'):
+            return
+        data['hdi_api.jwt_keyring_notified'] = True
+        db_name = self.env.cr.dbname
+
+        @self.env.cr.postcommit.add
+        def _notify_workers():
+            jwt_keyring.invalidate(db_name)
+            revocation_cache.notify(db_name, 'keyring')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._notify_jwt_key_ring_changed()
+        return records
+
+    def write(self, vals):
+        old_secrets = self._get_jwt_secret_values() if {'key', 'value'} & set(vals) else set()
+        res = super().write(vals)
+        retired = old_secrets - self._get_jwt_secret_values()
+        if retired:
+            self._retire_jwt_keys(retired)
+        self._notify_jwt_key_ring_changed()
+        return res
+
+    def unlink(self):
+        old_secrets = self._get_jwt_secret_values()
+        self._notify_jwt_key_ring_changed()
+        res = super().unlink()
+        if old_secrets:
+            self.env['ir.config_parameter']._retire_jwt_keys(old_secrets)
+        return res
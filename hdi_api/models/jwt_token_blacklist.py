@@ -1,7 +1,11 @@
+import calendar
+
 from odoo import api, fields, models
 from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT
 from datetime import datetime, timedelta
 
+from ..utils import revocation_cache
+
 
 class JwtTokenBlacklist(models.Model):
     _name = 'jwt.token.blacklist'
@@ -11,8 +15,7 @@ class JwtTokenBlacklist(models.Model):
     token_hash = fields.Char(
         string='Token Hash',
         required=True,
-        index=True,
-        help='SHA256 hash của token'
+        help='SHA256 hash của token (đã có index từ ràng buộc unique)'
     )
     user_id = fields.Integer(
         string='User ID',
@@ -35,11 +38,43 @@ class JwtTokenBlacklist(models.Model):
         ('token_hash_unique', 'unique(token_hash)', 'Token hash phải là duy nhất'),
     ]
 
+    @api.model
+    def _revoke_token(self, token_hash, user_id, exp_time):
+        """Thu hồi token: lưu DB và báo cho các worker khác sau khi commit"""
+        record = self.create({
+            'token_hash': token_hash,
+            'user_id': user_id,
+            'exp_time': exp_time,
+        })
+        db_name = self.env.cr.dbname
+        exp = calendar.timegm(exp_time.utctimetuple())
+
+        @self.env.cr.postcommit.add
+        def _notify_workers():
+            revocation_cache.remember(db_name, token_hash, exp)
+            revocation_cache.notify(db_name, 'revoke', hash=token_hash, exp=exp)
+
+        return record
+
+    @api.model
+    def _is_token_revoked(self, token_hash):
+        """Tra cứu trực tiếp DB (chỉ dùng khi cache không chắc chắn)"""
+        return bool(self.search_count([('token_hash', '=', token_hash)], limit=1))
+
+    @api.model
+    def _get_active_revocations(self):
+        """token_hash -> exp (timestamp UTC) của các token chưa hết hạn"""
+        self.flush_model(['token_hash', 'exp_time'])
+        self.env.cr.execute("""
+            SELECT token_hash, EXTRACT(EPOCH FROM exp_time)
+              FROM jwt_token_blacklist
+             WHERE exp_time >= NOW() AT TIME ZONE 'UTC'
+        """)
+        return {token_hash: float(exp) for token_hash, exp in self.env.cr.fetchall()}
+
     @api.model
     def _cleanup_expired_tokens(self):
-        """Xóa các token đã hết hạn khỏi blacklist"""
-        expired_records = self.search([
-            ('exp_time', '<', datetime.utcnow())
-        ])
-        expired_records.unlink()
+        """Xóa các token đã hết hạn khỏi blacklist (1 câu DELETE, không qua ORM)"""
+        self.env.cr.execute("DELETE FROM jwt_token_blacklist WHERE exp_time < NOW() AT TIME ZONE 'UTC'")
+        self.invalidate_model()
         return True
@@ -0,0 +1,52 @@
+from odoo import api, fields, models
+
+from ..utils import event_stream, revocation_cache
+
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    api_token_version = fields.Integer(
+        string='API Token Version',
+        default=0,
+        copy=False,
+        readonly=True,
+        help='Tăng lên khi đăng xuất mọi thiết bị hoặc đổi mật khẩu - token có token_version nhỏ hơn bị từ chối'
+    )
+
+    @api.model
+    def _get_api_token_version(self, uid):
+        self.env.cr.execute("SELECT api_token_version FROM res_users WHERE id = %s", [uid])
+        row = self.env.cr.fetchone()
+        return (row and row[0]) or 0
+
+    def _bump_api_token_version(self):
+        """Vô hiệu hóa toàn bộ token đã phát hành của các user (tăng bộ đếm bằng 1 câu UPDATE)"""
+        if not self:
+            return {}
+        self.env.cr.execute("""
+            UPDATE res_users
+               SET api_token_version = COALESCE(api_token_version, 0) + 1
+             WHERE id IN %s
+         RETURNING id, api_token_version
+        """, [tuple(self.ids)])
+        versions = dict(self.env.cr.fetchall())
+        self.invalidate_recordset(['api_token_version'])
+        db_name = self.env.cr.dbname
+        # Báo app đang mở luồng sự kiện đăng xuất ngay
+        event_stream.send(self.env, self.ids, event_stream.EVENT_FORCED_LOGOUT, {})
+
+        @self.env.cr.postcommit.add
+        def _notify_workers():
+            for uid, version in versions.items():
+                revocation_cache.remember_token_version(db_name, uid, version)
+                revocation_cache.notify(db_name, 'token_version', uid=uid, version=version)
+
+        return versions
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'password' in vals:
+            # Đổi mật khẩu (từ API hoặc backend) → đăng xuất mọi thiết bị
+            self._bump_api_token_version()
+        return res
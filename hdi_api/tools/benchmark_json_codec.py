@@ -0,0 +1,77 @@
+"""
+Đo thời gian mã hóa và kích thước response: json.dumps + isoformat từng trường (cách cũ),
+json_codec (json chuẩn / orjson) và nén gzip / brotli
+
+Không cần database, chạy trong odoo shell (để import được hdi_api):
+    odoo-bin shell -d <database> --no-http < hdi_api/tools/benchmark_json_codec.py
+"""
+import gzip
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from odoo.addons.hdi_api.utils import json_codec
+from odoo.addons.hdi_api.utils.response_formatter import ResponseFormatter
+
+ROUNDS = 2000
+ROWS = 50
+
+
+def _build_rows():
+    """Lịch sử giải trình ROWS dòng, nội dung tiếng Việt (giống /api/v1/attendance-excuse/list)"""
+    start = datetime(2024, 10, 1, 1, 30)
+    return [{
+        'id': index,
+        'date': (start + timedelta(days=index)).date(),
+        'excuse_type': 'late_or_early',
+        'state': 'submitted',
+        'reason': 'Đi muộn do tắc đường ở nút giao Ngã Tư Sở, đã báo trưởng phòng qua điện thoại',
+        'employee_name': 'Nguyễn Thị Phương Thảo',
+        'check_in': start + timedelta(days=index),
+        'check_out': start + timedelta(days=index, hours=9),
+        'create_date': start + timedelta(days=index, hours=10),
+        'approver_name': 'Trần Quốc Hưng',
+    } for index in range(ROWS)]
+
+
+def _legacy_dumps(rows):
+    """Luồng trước json_codec: controller gọi isoformat() từng trường rồi json.dumps"""
+    items = [{
+        key: value.isoformat() if isinstance(value, (date, datetime)) else value
+        for key, value in row.items()
+    } for row in rows]
+    response = ResponseFormatter.success('Lấy danh sách giải trình thành công', {'excuses': items})
+    return json.dumps(response, ensure_ascii=False).encode('utf-8')
+
+
+def _measure(label, func):
+    """Thời gian trung bình mỗi lần (micro giây) và kích thước body"""
+    body = func()
+    start = time.perf_counter()
+    for _index in range(ROUNDS):
+        func()
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    print(f'{label:<32} {elapsed * 1e6:8.0f} us  {len(body):7} bytes')
+
+
+def run():
+    rows = _build_rows()
+
+    def response():
+        return ResponseFormatter.success('Lấy danh sách giải trình thành công', {'excuses': rows})
+
+    _measure('json.dumps + isoformat', lambda: _legacy_dumps(rows))
+    _measure('json_codec json', lambda: json_codec.ENCODERS['json'](response()))
+    if 'orjson' not in json_codec.ENCODERS:
+        print('orjson chưa được cài, bỏ qua các phép đo orjson')
+        return
+    encode = json_codec.ENCODERS['orjson']
+    _measure('json_codec orjson', lambda: encode(response()))
+    _measure(f'orjson + gzip level {json_codec.GZIP_LEVEL}',
+             lambda: gzip.compress(encode(response()), compresslevel=json_codec.GZIP_LEVEL, mtime=0))
+    if json_codec.brotli is not None:
+        _measure(f'orjson + brotli quality {json_codec.BROTLI_QUALITY}',
+                 lambda: json_codec.brotli.compress(encode(response()), quality=json_codec.BROTLI_QUALITY))
+
+
+run()
@@ -0,0 +1,325 @@
+"""
+Công cụ kiểm thử tải cho API hdi_api (chỉ dùng thư viện chuẩn Python)
+
+- Tạo N user + nhân viên thử tải (login loadtest_0001...) qua XML-RPC bằng tài khoản admin
+- Đăng nhập qua /api/v1/auth/login để lấy JWT cho từng user
+- Chạy các kịch bản thực tế với số luồng cấu hình được:
+    morning  - cao điểm chấm công buổi sáng: home, check-in, status
+    payslip  - ngày trả lương: danh sách, tháng hiện tại, chi tiết bảng lương
+    excuse   - gửi giải trình: lịch sử, tạo, submit, danh sách giải trình
+    mixed    - trộn 3 kịch bản trên theo trọng số
+- Báo cáo p50/p95/p99, tỉ lệ lỗi và số câu SQL mỗi request theo từng endpoint
+
+Số câu SQL lấy từ header X-Query-Count: bật hdi_api_query_count_header = True trong
+odoo.conf của instance thử tải. Instance cần dbfilter chỉ khớp 1 database để route
+đăng nhập xác định được database. Đăng nhập đúng không tính vào giới hạn theo IP
+(lượt chỉ bị giữ khi request đang xử lý) nên không cần nâng hdi_api_login_rate_ip;
+mỗi tài khoản được hdi_api_login_rate_login_success lần đăng nhập đúng (mặc định 30/300).
+
+Ví dụ:
+    python hdi_api/tools/loadtest.py --url http://localhost:8069 --db hdi \\
+        --admin-password admin --users 200 --scenario morning --concurrency 50
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import xmlrpc.client
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+LOGIN_PREFIX = 'loadtest_'
+DEFAULT_PASSWORD = 'Loadtest@2024'
+SCENARIO_WEIGHTS = {'morning': 5, 'payslip': 2, 'excuse': 1}
+# Số lần thử đăng nhập mỗi user khi bị giới hạn (429)
+LOGIN_MAX_ATTEMPTS = 5
+# Số lần đăng nhập song song: dưới giới hạn mặc định theo IP (30 request đang xử lý)
+LOGIN_CONCURRENCY = 20
+
+
+class Stats:
+    """Thống kê theo endpoint: thời gian, mã trạng thái, số câu SQL, kích thước response"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.queries = defaultdict(list)
+        self.sizes = defaultdict(list)
+
+    def record(self, endpoint, status, elapsed, query_count, size):
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+            if query_count is not None:
+                self.queries[endpoint].append(query_count)
+            self.sizes[endpoint].append(size)
+
+    @staticmethod
+    def _percentile(values, percent):
+        # Nearest-rank
+        ordered = sorted(values)
+        return ordered[max(0, math.ceil(percent / 100.0 * len(ordered)) - 1)]
+
+    def report(self, wall_time):
+        header = (f"{'endpoint':<42}{'count':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                  f"{'err %':>7}{'sql/req':>9}{'bytes':>8}  status")
+        lines = [header, '-' * len(header)]
+        for endpoint in sorted(self.latencies):
+            latencies = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            count = len(latencies)
+            errors = sum(n for status, n in statuses.items() if status == 0 or status >= 400)
+            queries = self.queries[endpoint]
+            sql = f'{sum(queries) / len(queries):.1f}' if queries else '-'
+            lines.append(
+                f'{endpoint:<42}{count:>7}{count / wall_time:>8.1f}'
+                f'{self._percentile(latencies, 50) * 1000:>9.1f}'
+                f'{self._percentile(latencies, 95) * 1000:>9.1f}'
+                f'{self._percentile(latencies, 99) * 1000:>9.1f}'
+                f'{errors * 100.0 / count:>7.1f}{sql:>9}'
+                f'{sum(self.sizes[endpoint]) // count:>8}  '
+                + ' '.join(f'{status}:{n}' for status, n in sorted(statuses.items()))
+            )
+        return '\n'.join(lines)
+
+
+class ApiClient:
+    """Gọi API JSON và ghi thống kê (status 0: lỗi kết nối/timeout)"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+
+    def call(self, method, path, token=None, params=None, body=None, label=None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'identity'}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        req = urllib.request.Request(url, data=data, headers=headers, method=method)
+        start = time.perf_counter()
+        status, payload, query_count, size = 0, None, None, 0
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                raw = response.read()
+                status, query_count = response.status, response.headers.get('X-Query-Count')
+        except urllib.error.HTTPError as e:
+            raw = e.read()
+            status, query_count = e.code, e.headers.get('X-Query-Count')
+        except (urllib.error.URLError, OSError):
+            raw = b''
+        elapsed = time.perf_counter() - start
+
+        size = len(raw)
+        if raw:
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                payload = None
+        self.stats.record(label or f'{method} {path}', status, elapsed,
+                          int(query_count) if query_count else None, size)
+        return status, payload
+
+
+def _data(payload):
+    return (payload or {}).get('data') or {}
+
+
+# ========== SEED ==========
+
+def seed_users(url, db, admin_login, admin_password, count, password, reset_attendance=False):
+    """Tạo (nếu chưa có) count user thử tải, mỗi user có 1 nhân viên và 1 bản ghi chấm công hôm qua"""
+    common = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/common', allow_none=True)
+    uid = common.authenticate(db, admin_login, admin_password, {})
+    if not uid:
+        raise SystemExit('Không đăng nhập được bằng tài khoản admin')
+    models = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/object', allow_none=True)
+
+    def execute(model, method, *args, **kwargs):
+        return models.execute_kw(db, uid, admin_password, model, method, list(args), kwargs)
+
+    logins = [f'{LOGIN_PREFIX}{index:04d}' for index in range(1, count + 1)]
+    existing = {user['login']: user['id'] for user in execute(
+        'res.users', 'search_read', [('login', 'in', logins)], fields=['login'])}
+    missing = [login for login in logins if login not in existing]
+    if missing:
+        user_ids = execute('res.users', 'create', [
+            {'name': f'Load Test {login[len(LOGIN_PREFIX):]}', 'login': login, 'password': password}
+            for login in missing
+        ])
+        existing.update(zip(missing, user_ids))
+
+    user_ids = [existing[login] for login in logins]
+    employees = {emp['user_id'][0]: emp['id'] for emp in execute(
+        'hr.employee', 'search_read', [('user_id', 'in', user_ids)], fields=['user_id'])}
+    new_employee_users = [user_id for user_id in user_ids if user_id not in employees]
+    if new_employee_users:
+        employee_ids = execute('hr.employee', 'create', [
+            {'name': f'Load Test Employee {user_id}', 'user_id': user_id} for user_id in new_employee_users
+        ])
+        employees.update(zip(new_employee_users, employee_ids))
+
+    employee_ids = list(employees.values())
+    if reset_attendance:
+        attendance_ids = execute('hr.attendance', 'search', [('employee_id', 'in', employee_ids)])
+        if attendance_ids:
+            execute('hr.attendance', 'unlink', attendance_ids)
+
+    # Bản ghi chấm công hôm qua (đi muộn) để kịch bản giải trình có dữ liệu
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    has_attendance = {att['employee_id'][0] for att in execute(
+        'hr.attendance', 'search_read',
+        [('employee_id', 'in', employee_ids), ('check_out', '!=', False)], fields=['employee_id'])}
+    vals_list = [{
+        'employee_id': employee_id,
+        'check_in': f'{yesterday} 03:00:00',
+        'check_out': f'{yesterday} 10:00:00',
+    } for employee_id in employee_ids if employee_id not in has_attendance]
+    if vals_list:
+        execute('hr.attendance', 'create', vals_list)
+
+    print(f'Seeded {len(logins)} users ({len(missing)} new), {len(vals_list)} attendances')
+    return logins
+
+
+def login_users(client, logins, password, concurrency):
+    """
+    Lấy JWT cho từng user qua /api/v1/auth/login
+
+    Mọi user đăng nhập từ cùng 1 IP: mỗi request đang xử lý giữ 1 lượt theo IP (trả lại khi đúng
+    mật khẩu), nên chỉ chạy tối đa LOGIN_CONCURRENCY request song song. Bị giới hạn (429, vd. chạy
+    lại nhiều lần vượt giới hạn đăng nhập đúng của tài khoản) thì chờ theo Retry-After rồi thử lại.
+    """
+    def login(user_login):
+        for _attempt in range(LOGIN_MAX_ATTEMPTS):
+            status, payload = client.call('POST', '/api/v1/auth/login',
+                                          body={'login': user_login, 'password': password})
+            if status != 429:
+                return _data(payload).get('token') if status == 200 else None
+            # Retry-After cũng có trong data.retry_after của response
+            time.sleep(float(_data(payload).get('retry_after') or 1) + random.random())
+        return None
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, LOGIN_CONCURRENCY)) as pool:
+        tokens = [token for token in pool.map(login, logins) if token]
+    print(f'Logged in {len(tokens)}/{len(logins)} users')
+    if len(tokens) < len(logins):
+        raise SystemExit(f'Chỉ {len(tokens)}/{len(logins)} user đăng nhập được: kiểm tra mật khẩu thử tải '
+                         f'và giới hạn đăng nhập (hdi_api_login_rate_*) của instance')
+    return tokens
+
+
+# ========== SCENARIOS ==========
+
+def scenario_morning(client, token):
+    client.call('GET', '/api/v1/home', token)
+    client.call('POST', '/api/v1/attendance/check-in', token,
+                body={'in_latitude': 21.0285, 'in_longitude': 105.8542})
+    client.call('GET', '/api/v1/attendance/status', token)
+
+
+def scenario_payslip(client, token):
+    _status, payload = client.call('POST', '/api/v1/payslip/list', token, body={})
+    client.call('GET', '/api/v1/payslip/current-month', token)
+    payslips = _data(payload).get('payslips') or []
+    if payslips:
+        client.call('POST', '/api/v1/payslip/detail', token, body={'payslip_id': payslips[0]['id']})
+
+
+def scenario_excuse(client, token):
+    _status, payload = client.call('GET', '/api/v1/attendance/history', token, params={'limit': 1})
+    attendances = _data(payload).get('attendances') or []
+    if attendances:
+        _status, payload = client.call('POST', '/api/v1/attendance-excuse/create', token, body={
+            'attendance_id': attendances[0]['id'],
+            'excuse_type': 'late_or_early',
+            'reason': 'Kiểm thử tải',
+        })
+        excuse_id = _data(payload).get('id')
+        if excuse_id:
+            client.call('POST', '/api/v1/attendance-excuse/submit', token, body={'excuse_id': excuse_id})
+    client.call('POST', '/api/v1/attendance-excuse/list', token, body={'limit': 10})
+
+
+SCENARIOS = {
+    'morning': scenario_morning,
+    'payslip': scenario_payslip,
+    'excuse': scenario_excuse,
+}
+
+
+def run_load(client, tokens, scenario, concurrency, iterations, duration):
+    """Chạy kịch bản: mỗi lượt lấy 1 user kế tiếp, dừng khi đủ số lượt hoặc hết thời gian"""
+    names = list(SCENARIO_WEIGHTS)
+    weights = [SCENARIO_WEIGHTS[name] for name in names]
+    deadline = time.monotonic() + duration if duration else None
+    total = iterations or (None if duration else len(tokens))
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with counter_lock:
+                index = next(counter)
+            if (total is not None and index >= total) or (deadline and time.monotonic() >= deadline):
+                return
+            name = random.choices(names, weights)[0] if scenario == 'mixed' else scenario
+            SCENARIOS[name](client, tokens[index % len(tokens)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _index in range(concurrency)]:
+            future.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kiểm thử tải API hdi_api')
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--admin-login', default='admin')
+    parser.add_argument('--admin-password', default='admin')
+    parser.add_argument('--users', type=int, default=50, help='Số user thử tải')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Mật khẩu của các user thử tải')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS) + ['mixed'], default='mixed')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=0,
+                        help='Tổng số lượt kịch bản (mặc định: mỗi user 1 lượt)')
+    parser.add_argument('--duration', type=float, default=0, help='Chạy trong N giây (thay cho --iterations)')
+    parser.add_argument('--reset-attendance', action='store_true',
+                        help='Xóa chấm công của user thử tải trước khi chạy (để check-in lại được)')
+    parser.add_argument('--seed-only', action='store_true')
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    logins = seed_users(url, args.db, args.admin_login, args.admin_password, args.users,
+                        args.password, args.reset_attendance)
+    if args.seed_only:
+        return
+
+    stats = Stats()
+    client = ApiClient(url, stats)
+    # Thống kê đăng nhập tách riêng, không lẫn vào kết quả kịch bản
+    tokens = login_users(ApiClient(url, Stats()), logins, args.password, args.concurrency)
+
+    wall_time = run_load(client, tokens, args.scenario, args.concurrency, args.iterations, args.duration)
+    print(f'\nScenario {args.scenario}: {len(tokens)} users, concurrency {args.concurrency}, {wall_time:.1f}s\n')
+    print(stats.report(wall_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,11 @@
+from . import db_session
+from . import json_codec
 from . import response_formatter
+from . import revocation_cache
+from . import api_cache
+from . import metrics
+from . import replica
+from . import rate_limit
+from . import prewarm
+from . import event_stream
+from . import jwt_keyring
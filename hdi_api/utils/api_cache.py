@@ -0,0 +1,156 @@
+"""
+Cache ngắn hạn (TTL vài giây) cho kết quả API trong bộ nhớ worker
+- Mỗi cache có tên, khóa là tuple giá trị JSON (vd. (db, user_id))
+- Xóa khóa sau khi commit ở worker hiện tại và báo cho các worker khác qua
+  kênh NOTIFY của revocation_cache; nếu listener mất kết nối, dữ liệu cũ
+  tồn tại tối đa bằng TTL
+- Single-flight: các request đồng thời cùng khóa trong 1 worker (chế độ threaded/gevent)
+  chờ 1 lần tính và dùng chung kết quả
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from . import revocation_cache
+
+# Request chờ lần tính của request khác tối đa (giây), quá hạn thì tự tính
+SINGLE_FLIGHT_TIMEOUT = 30
+
+
+class TTLCache:
+    """Cache LRU có thời hạn, an toàn giữa các thread"""
+
+    def __init__(self, ttl, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Giá trị còn hạn của khóa, None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, ttl, max_size=10000):
+    """Lấy (hoặc tạo) cache theo tên - dùng chung trong worker"""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(name, TTLCache(ttl, max_size))
+    return cache
+
+
+def _on_invalidate(message):
+    cache = _caches.get(message.get('cache'))
+    if cache is not None:
+        cache.invalidate(tuple(message['key']))
+
+
+revocation_cache.register_handler('api_cache', _on_invalidate)
+
+
+def invalidate_after_commit(env, name, key):
+    """Xóa khóa khỏi cache ở mọi worker sau khi transaction hiện tại commit"""
+    data = env.cr.postcommit.data.setdefault('hdi_api.api_cache_invalidated', set())
+    if (name, key) in data:
+        return
+    data.add((name, key))
+    db_name = env.cr.dbname
+
+    @env.cr.postcommit.add
+    def _invalidate():
+        cache = _caches.get(name)
+        if cache is not None:
+            cache.invalidate(key)
+        revocation_cache.notify(db_name, 'api_cache', cache=name, key=list(key))
+
+
+class _Flight:
+    """1 lần tính đang chạy: các request cùng khóa chờ event"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key, compute):
+    """
+    Gọi compute() 1 lần cho các request đồng thời cùng khóa, dùng chung kết quả
+
+    Khóa gồm (endpoint, user hoặc phạm vi dữ liệu, tham số). Kết quả phải là dữ liệu thuần
+    (dict/list, không chứa recordset) và không được sửa sau khi trả về vì được dùng chung.
+    Lần tính bị lỗi thì mỗi request chờ tự tính lại.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.event.wait(SINGLE_FLIGHT_TIMEOUT) and not flight.failed:
+            return flight.result
+        return compute()
+
+    try:
+        flight.result = compute()
+        return flight.result
+    except Exception:
+        flight.failed = True
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.event.set()
+
+
+def get_or_compute(name, ttl, key, compute):
+    """
+    Giá trị trong cache, hoặc tính 1 lần (single-flight) rồi lưu
+
+    compute() trả về None: không lưu cache (vd. không tìm thấy dữ liệu)
+    """
+    cache = get_cache(name, ttl)
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    def compute_and_store():
+        result = compute()
+        if result is not None:
+            cache.set(key, result)
+        return result
+
+    return single_flight((name,) + tuple(key), compute_and_store)
@@ -0,0 +1,129 @@
+"""
+Phiên làm việc database cho API
+Mỗi request dùng đúng 1 cursor gắn với database trong JWT,
+được commit/rollback và đóng bởi decorator xác thực token
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+import odoo
+from odoo.http import request
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Header trả về số câu SQL của request (bật bằng hdi_api_query_count_header = True
+# trong odoo.conf, dùng cho tools/loadtest.py - không bật trên production)
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+# Cache registry theo database trong worker
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+class _RollbackResponse(Exception):
+    """Dùng nội bộ để rollback khi controller trả về response lỗi"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def get_registry(db_name):
+    """Lấy registry của database, cache theo db (làm mới khi Odoo tạo registry mới)"""
+    registry = _registries.get(db_name)
+    if registry is None or Registry.registries.get(db_name) is not registry:
+        with _registries_lock:
+            registry = Registry(db_name)
+            _registries[db_name] = registry
+    return registry
+
+
+def is_error_response(response):
+    """Response lỗi: HTTP status >= 400 (type='http') hoặc code >= 400 (type='json')"""
+    if isinstance(response, dict):
+        return (response.get('code') or 200) >= 400
+    return (getattr(response, 'status_code', None) or 200) >= 400
+
+
+@contextmanager
+def api_session(db_name, readonly=False, reuse_request_cursor=True):
+    """
+    Mở phiên làm việc cho 1 request và yield environment superuser
+
+    - Dùng lại cursor của request Odoo nếu cùng database, ngược lại
+      lấy 1 cursor từ registry đã cache
+    - readonly: cursor mới được lấy trên replica (Odoo tự quay về primary khi không có replica)
+    - reuse_request_cursor=False: luôn mở cursor riêng (route chỉ đọc nhưng cần đọc primary)
+    - Commit khi thành công, rollback khi có exception
+    - Cursor tự mở luôn được đóng (trả kết nối về pool)
+    """
+    request_env = getattr(request, 'env', None)
+    if reuse_request_cursor and request_env is not None and request.db == db_name:
+        cr, owned = request_env.cr, False
+    else:
+        cr, owned = get_registry(db_name).cursor(readonly=readonly), True
+
+    try:
+        yield odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        cr.commit()
+    except Exception:
+        cr.rollback()
+        raise
+    finally:
+        if owned:
+            cr.close()
+
+
+def call_in_session(db_name, func, readonly=False, reuse_request_cursor=True):
+    """
+    Gọi func trong phiên của request hiện tại
+
+    Response lỗi (4xx/5xx) cũng được rollback dù controller đã bắt exception.
+    Số câu SQL của phiên (gồm cả flush khi commit) được lưu vào request.api_query_count.
+    """
+    cr, start_count = None, 0
+    try:
+        with api_session(db_name, readonly, reuse_request_cursor) as env:
+            request.api_env = env
+            cr, start_count = env.cr, env.cr.sql_log_count
+            response = func()
+            if is_error_response(response):
+                raise _RollbackResponse(response)
+    except _RollbackResponse as rollback:
+        response = rollback.response
+    finally:
+        request.api_env = None
+        if cr is not None:
+            request.api_query_count = cr.sql_log_count - start_count
+
+    if config.get('hdi_api_query_count_header') and hasattr(response, 'headers'):
+        response.headers[QUERY_COUNT_HEADER] = str(request.api_query_count)
+    return response
+
+
+def call_in_savepoint(env, func, *args, **kwargs):
+    """
+    Gọi func trong 1 savepoint của phiên hiện tại
+
+    Response lỗi chỉ rollback phần việc của func, phần còn lại của phiên vẫn giữ nguyên
+    (dùng cho từng sub-request của /api/v1/batch).
+    """
+    try:
+        with env.cr.savepoint():
+            response = func(*args, **kwargs)
+            if is_error_response(response):
+                raise _RollbackResponse(response)
+            return response
+    except _RollbackResponse as rollback:
+        return rollback.response
+
+
+def get_env():
+    """Environment (superuser) của phiên hiện tại - do decorator xác thực token mở"""
+    env = getattr(request, 'api_env', None)
+    if env is None:
+        raise RuntimeError('API session is not opened for this request')
+    return env
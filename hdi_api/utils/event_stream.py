@@ -0,0 +1,105 @@
+"""
+Sự kiện theo user cho app di động qua /api/v1/events
+- Sự kiện được lưu trong bus.bus trên kênh riêng của mỗi user (client kết nối lại
+  lấy tiếp theo id sự kiện cuối cùng đã nhận)
+- Worker nghe kênh 'imbus' của bus.bus (chung kết nối listener của revocation_cache)
+  để đánh thức các request đang chờ của đúng user
+- Request đang chờ không giữ cursor: mỗi lần đọc sự kiện mở 1 cursor ngắn rồi đóng ngay
+"""
+import json
+import threading
+from contextlib import contextmanager
+
+import odoo
+from odoo.addons.bus.models.bus import channel_with_db, json_dump
+
+from . import revocation_cache
+from .db_session import get_registry
+
+EVENT_CHANNEL_PREFIX = 'hdi_api_events_'
+
+EVENT_EXCUSE_APPROVED = 'excuse_approved'
+EVENT_EXCUSE_REJECTED = 'excuse_rejected'
+EVENT_LEAVE_VALIDATED = 'leave_validated'
+EVENT_PAYSLIP_PUBLISHED = 'payslip_published'
+EVENT_FORCED_LOGOUT = 'forced_logout'
+
+MAX_EVENTS_PER_FETCH = 100
+
+_lock = threading.Lock()
+# (db, kênh của user) -> các threading.Event của request đang chờ
+_waiters = {}
+
+
+def user_channel(user_id):
+    return f'{EVENT_CHANNEL_PREFIX}{user_id}'
+
+
+def send(env, user_ids, event_type, payload):
+    """Gửi sự kiện cho các user (bus.bus chỉ phát đi sau khi transaction commit)"""
+    bus = env['bus.bus'].sudo()
+    for user_id in set(user_ids):
+        if user_id:
+            bus._sendone(user_channel(user_id), event_type, payload)
+
+
+def _on_bus_notify(payload):
+    """Thông báo 'imbus': danh sách kênh [db, kênh] vừa có tin mới"""
+    try:
+        channels = json.loads(payload)
+    except ValueError:
+        return
+    with _lock:
+        for channel in channels:
+            if isinstance(channel, list):
+                for waiter in _waiters.get(tuple(channel), ()):
+                    waiter.set()
+
+
+revocation_cache.register_channel('imbus', _on_bus_notify)
+
+
+def listener_generation():
+    """Thế hệ listener (None khi không hoạt động: request chờ phải tự hỏi lại DB theo chu kỳ)"""
+    return revocation_cache.get_generation()
+
+
+@contextmanager
+def subscribe(db_name, user_id):
+    """Đăng ký chờ sự kiện của user - yield threading.Event được set khi có tin mới"""
+    key = (db_name, user_channel(user_id))
+    waiter = threading.Event()
+    with _lock:
+        _waiters.setdefault(key, set()).add(waiter)
+    try:
+        yield waiter
+    finally:
+        with _lock:
+            waiters = _waiters.get(key, set())
+            waiters.discard(waiter)
+            if not waiters:
+                _waiters.pop(key, None)
+
+
+def fetch(db_name, user_id, last_id):
+    """
+    Đọc sự kiện của user có id > last_id (cursor mở và đóng ngay trong hàm)
+
+    last_id=None: client chưa có mốc, bắt đầu từ tin mới nhất hiện có (không gửi lại lịch sử)
+    Trả về (last_id mới, [{'id', 'type', 'payload'}])
+    """
+    channel = json_dump(channel_with_db(db_name, user_channel(user_id)))
+    with get_registry(db_name).cursor() as cr:
+        if last_id is None:
+            cr.execute("SELECT COALESCE(MAX(id), 0) FROM bus_bus")
+            return cr.fetchone()[0], []
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        messages = env['bus.bus'].search_fetch(
+            [('channel', '=', channel), ('id', '>', last_id)],
+            ['message'], order='id', limit=MAX_EVENTS_PER_FETCH,
+        )
+        events = []
+        for message in messages:
+            notification = json.loads(message.message)
+            events.append({'id': message.id, 'type': notification['type'], 'payload': notification['payload']})
+    return (events[-1]['id'] if events else last_id), events
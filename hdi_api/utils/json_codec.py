@@ -0,0 +1,104 @@
+"""
+Mã hóa JSON và nén response cho API
+- Encoder chọn được qua odoo.conf (hdi_api_json_encoder = orjson | json),
+  mặc định orjson nếu đã cài, không thì json chuẩn
+- date/datetime được mã hóa trực tiếp (ISO 8601) - controller không cần gọi .isoformat()
+- Nén gzip/brotli theo Accept-Encoding khi body vượt ngưỡng
+"""
+import gzip
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+from odoo.tools import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_logger = logging.getLogger(__name__)
+
+# Body nhỏ hơn ngưỡng này không nén (chi phí nén lớn hơn lợi ích)
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def _default(value):
+    """Kiểu dữ liệu json chuẩn không tự mã hóa được"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _dumps_json(data):
+    return json.dumps(data, ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def _dumps_orjson(data):
+    # orjson tự xử lý date/datetime, dùng _default cho phần còn lại
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS = {'json': _dumps_json}
+if orjson is not None:
+    ENCODERS['orjson'] = _dumps_orjson
+
+
+def register_encoder(name, func):
+    """Đăng ký encoder khác: func(data) -> bytes (UTF-8)"""
+    ENCODERS[name] = func
+
+
+def get_encoder():
+    name = config.get('hdi_api_json_encoder') or ('orjson' if orjson is not None else 'json')
+    encoder = ENCODERS.get(name)
+    if encoder is None:
+        _logger.warning("Unknown hdi_api_json_encoder %s, using json", name)
+        encoder = _dumps_json
+    return encoder
+
+
+def dumps(data):
+    """Mã hóa dữ liệu thành JSON (bytes UTF-8) bằng encoder đang cấu hình"""
+    return get_encoder()(data)
+
+
+def _accepted_encodings(accept_encoding):
+    """Tập encoding client chấp nhận (bỏ các mục q=0)"""
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        name, _sep, params = item.strip().partition(';')
+        if name and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            accepted.add(name.lower())
+    return accepted
+
+
+def compress(body, accept_encoding):
+    """
+    Nén body theo Accept-Encoding
+
+    Returns:
+        tuple: (body, content_encoding) - content_encoding là None nếu không nén
+    """
+    if len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
@@ -0,0 +1,106 @@
+"""
+Key ring ký JWT cache trong bộ nhớ worker
+- Mỗi database có 1 key hiện hành (ký token mới) và các key cũ còn hiệu lực tới khi token hết hạn
+- Token mang header 'kid' để chọn key khi xác thực, không cần truy vấn DB
+- Làm mới khi tham số hệ thống thay đổi (thông báo 'keyring' trên kênh NOTIFY của revocation_cache)
+"""
+import hashlib
+import logging
+import threading
+import time
+
+import odoo
+from odoo import http
+
+from . import revocation_cache
+from .db_session import get_registry
+
+_logger = logging.getLogger(__name__)
+
+# Default secret key - dùng khi chưa cấu hình hdi_api.jwt_secret_key
+DEFAULT_JWT_SECRET_KEY = 'your-secret-key-change-in-production'
+
+# Khoảng cách tối thiểu giữa 2 lần nạp lại khi gặp kid lạ (tránh bị spam token giả)
+RELOAD_MIN_INTERVAL = 5
+
+
+def key_id(secret_key):
+    """kid của 1 secret key: 16 ký tự đầu SHA256 (không lộ key)"""
+    return hashlib.sha256(secret_key.encode()).hexdigest()[:16]
+
+
+class KeyRing:
+    """Các key còn hiệu lực của 1 database"""
+
+    def __init__(self, current_kid, keys, generation):
+        self.current_kid = current_kid
+        self.keys = keys
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+
+    @property
+    def signing_key(self):
+        """(kid, key) dùng để ký token mới"""
+        return self.current_kid, self.keys[self.current_kid]
+
+
+_lock = threading.Lock()
+_rings = {}
+
+
+def invalidate(db_name):
+    with _lock:
+        _rings.pop(db_name, None)
+
+
+revocation_cache.register_handler('keyring', lambda message: invalidate(message['db']))
+
+
+def _load(db_name, env, generation):
+    if env is not None:
+        data = env['ir.config_parameter'].sudo()._get_jwt_key_ring()
+    else:
+        if not http.db_filter([db_name]):
+            raise ValueError(f'Database {db_name} is not served')
+        with get_registry(db_name).cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            data = env['ir.config_parameter']._get_jwt_key_ring()
+
+    ring = KeyRing(data['current'], data['keys'], generation)
+    with _lock:
+        _rings[db_name] = ring
+    return ring
+
+
+def get_key_ring(db_name, env=None):
+    """
+    Key ring của database
+
+    Dùng bản cache nếu được nạp trong thế hệ listener hiện tại;
+    khi listener không hoạt động thì luôn nạp lại (get_param có ormcache nên vẫn rẻ).
+    """
+    generation = revocation_cache.get_generation()
+    ring = _rings.get(db_name)
+    if ring is not None and generation is not None and ring.generation == generation:
+        return ring
+    return _load(db_name, env, generation)
+
+
+def get_verification_key(db_name, kid):
+    """Key để xác thực token theo kid (token cũ không có kid dùng key hiện hành); None nếu không tìm thấy"""
+    if not db_name:
+        return None
+    try:
+        ring = get_key_ring(db_name)
+        if kid is None:
+            return ring.keys[ring.current_kid]
+
+        key = ring.keys.get(kid)
+        if key is None and time.monotonic() - ring.loaded_at > RELOAD_MIN_INTERVAL:
+            # Key mới có thể vừa được xoay ở worker khác, chưa kịp nhận thông báo
+            invalidate(db_name)
+            key = get_key_ring(db_name).keys.get(kid)
+        return key
+    except Exception as e:
+        _logger.warning(f"Cannot load JWT key ring for {db_name}: {str(e)}")
+        return None
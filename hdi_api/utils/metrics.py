@@ -0,0 +1,205 @@
+"""
+Số liệu theo endpoint cho API (định dạng Prometheus)
+- Số request, histogram thời gian xử lý, số câu SQL và kích thước response
+  theo route (đã chuẩn hóa id), method và status code
+- Mỗi worker giữ số liệu trong bộ nhớ và định kỳ ghi snapshot ra
+  <data_dir>/hdi_api_metrics/<pid>.json; /api/v1/metrics gộp snapshot của mọi worker
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from functools import wraps
+
+from odoo.http import request
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+HISTOGRAMS = {
+    'duration': LATENCY_BUCKETS,
+    'queries': QUERY_BUCKETS,
+    'size': SIZE_BUCKETS,
+}
+
+# Ghi snapshot ra file tối đa 1 lần mỗi FLUSH_INTERVAL giây
+FLUSH_INTERVAL = 10
+# Snapshot của worker đã dừng quá lâu thì bỏ
+SNAPSHOT_MAX_AGE = 24 * 3600
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+_lock = threading.Lock()
+# (route, method, status) -> {'count': n, '<histogram>': [đếm theo bucket + Inf], '<histogram>_sum': tổng}
+_series = {}
+_last_flush = 0.0
+
+
+def _metrics_dir():
+    return os.path.join(config['data_dir'], 'hdi_api_metrics')
+
+
+def _new_series():
+    series = {'count': 0}
+    for name, buckets in HISTOGRAMS.items():
+        series[name] = [0] * (len(buckets) + 1)
+        series[f'{name}_sum'] = 0
+    return series
+
+
+def _observe(series, name, value):
+    buckets = HISTOGRAMS[name]
+    index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    series[name][index] += 1
+    series[f'{name}_sum'] += value
+
+
+def route_label(path):
+    """Route dùng làm nhãn: thay các đoạn số (id) bằng {id} để giới hạn số chuỗi số liệu"""
+    return _ID_SEGMENT.sub('/{id}', path)
+
+
+def observe_request(response, elapsed, query_count=None):
+    """Ghi nhận 1 request API"""
+    if response is None:
+        status, size = 500, 0
+    elif isinstance(response, dict):
+        status, size = response.get('code') or 200, 0
+    else:
+        status, size = response.status_code, response.content_length or 0
+
+    httprequest = request.httprequest
+    key = (route_label(httprequest.path), httprequest.method, str(status))
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = _new_series()
+        series['count'] += 1
+        _observe(series, 'duration', elapsed)
+        _observe(series, 'size', size)
+        if query_count is not None:
+            _observe(series, 'queries', query_count)
+    _maybe_flush()
+
+
+def instrument(func):
+    """Decorator ghi nhận số liệu cho route API (số câu SQL do call_in_session điền vào request)"""
+    @wraps(func)
+    def instrumented(*args, **kwargs):
+        start = time.perf_counter()
+        request.api_query_count = None
+        response = None
+        try:
+            response = func(*args, **kwargs)
+            return response
+        finally:
+            observe_request(response, time.perf_counter() - start, request.api_query_count)
+
+    return instrumented
+
+
+def _snapshot():
+    with _lock:
+        return [[list(key), {name: list(value) if isinstance(value, list) else value
+                             for name, value in series.items()}]
+                for key, series in _series.items()]
+
+
+def _maybe_flush(force=False):
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    directory = _metrics_dir()
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump(_snapshot(), snapshot_file)
+        os.replace(tmp_path, path)
+    except OSError:
+        _logger.debug("Could not write API metrics snapshot %s", path, exc_info=True)
+
+
+def _merge(total, entries):
+    for key, series in entries:
+        key = tuple(key)
+        merged = total.get(key)
+        if merged is None:
+            total[key] = series
+            continue
+        for name, value in series.items():
+            if isinstance(value, list):
+                merged[name] = [a + b for a, b in zip(merged[name], value)]
+            else:
+                merged[name] += value
+
+
+def _collect():
+    """Gộp số liệu của worker hiện tại (trực tiếp) và snapshot của các worker khác"""
+    _maybe_flush(force=True)
+    total = {}
+    directory = _metrics_dir()
+    try:
+        filenames = os.listdir(directory)
+    except OSError:
+        filenames = []
+    own_file = f'{os.getpid()}.json'
+    now = time.time()
+    for filename in filenames:
+        if not filename.endswith('.json') or filename == own_file:
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if now - os.path.getmtime(path) > SNAPSHOT_MAX_AGE:
+                os.unlink(path)
+                continue
+            with open(path) as snapshot_file:
+                _merge(total, json.load(snapshot_file))
+        except (OSError, ValueError):
+            continue
+    _merge(total, _snapshot())
+    return total
+
+
+def _labels(key, extra=''):
+    route, method, status = (value.replace('\\', '\\\\').replace('"', '\\"') for value in key)
+    return f'{{route="{route}",method="{method}",status="{status}"{extra}}}'
+
+
+def _render_histogram(lines, metric, name, series_by_key):
+    buckets = HISTOGRAMS[name]
+    for key, series in series_by_key:
+        cumulative = 0
+        for bound, count in zip(buckets + ('+Inf',), series[name]):
+            cumulative += count
+            le = ',le="%s"' % bound
+            lines.append(f'{metric}_bucket{_labels(key, le)} {cumulative}')
+        lines.append(f'{metric}_sum{_labels(key)} {series[name + "_sum"]}')
+        lines.append(f'{metric}_count{_labels(key)} {cumulative}')
+
+
+def render():
+    """Số liệu gộp của mọi worker ở định dạng Prometheus text (version 0.0.4)"""
+    series_by_key = sorted(_collect().items())
+    lines = [
+        '# HELP hdi_api_requests_total API requests by route, method and status.',
+        '# TYPE hdi_api_requests_total counter',
+    ]
+    lines += [f'hdi_api_requests_total{_labels(key)} {series["count"]}' for key, series in series_by_key]
+
+    for metric, name, help_text in (
+        ('hdi_api_request_duration_seconds', 'duration', 'API request latency in seconds.'),
+        ('hdi_api_request_queries', 'queries', 'SQL queries per API request.'),
+        ('hdi_api_response_size_bytes', 'size', 'API response body size in bytes (as sent).'),
+    ):
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+        _render_histogram(lines, metric, name, series_by_key)
+    return '\n'.join(lines) + '\n'
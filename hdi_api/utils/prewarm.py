@@ -0,0 +1,99 @@
+"""
+Nạp sẵn registry và cache cho các database phục vụ API
+- Danh sách database: hdi_api_preload_databases trong odoo.conf (cách nhau bởi dấu phẩy)
+- Chỉ nạp cache cấp tiến trình: ormcache của registry (routing, tham số hệ thống)
+  và api_cache (loại nghỉ, phòng ban, chức vụ); cache bản ghi của ORM không sống qua transaction
+- Chạy cùng bước preload registry của Odoo (server.preload_registries), trước khi fork
+  worker ở chế độ prefork: worker kế thừa registry và ormcache đã nạp
+- Chỉ hoạt động khi hdi_api được nạp như server-wide module (--load=base,web,hdi_api)
+  để hook post_load chạy lúc khởi động server
+"""
+import logging
+import time
+
+import odoo
+from odoo.service import server
+from odoo.tools import config
+
+from . import api_cache
+from .db_session import get_registry
+
+_logger = logging.getLogger(__name__)
+
+
+def get_preload_databases():
+    """
+    Các database cần nạp sẵn
+
+    Lúc khởi động chưa có request nên không áp dụng được dbfilter (phụ thuộc host);
+    nếu cấu hình db_name thì chỉ giữ các database nằm trong db_name.
+    """
+    names = [name.strip() for name in (config.get('hdi_api_preload_databases') or '').split(',')]
+    names = [name for name in names if name]
+    if names and config.get('db_name'):
+        exposed = {name.strip() for name in config['db_name'].split(',')}
+        names = [name for name in names if name in exposed]
+    return names
+
+
+def _warm_env(env):
+    """Các cache cấp tiến trình dùng ở request đầu tiên của mỗi database (worker kế thừa khi fork)"""
+    # Lazy import: controllers import utils
+    from ..controllers.employee_controller import (
+        DEPARTMENTS_CACHE, JOBS_CACHE, SHARED_LIST_CACHE_TTL, get_department_list, get_job_list,
+    )
+    from ..controllers.time_off_controller import LEAVE_TYPES_CACHE, LEAVE_TYPES_CACHE_TTL
+
+    # Bảng định tuyến (ormcache 'routing' của registry)
+    env['ir.http'].routing_map()
+    # Tham số key ring JWT (get_param có ormcache)
+    env['ir.config_parameter']._get_jwt_key_ring()
+    # Danh mục dùng chung trong api_cache (sống theo TTL, phục vụ đợt request đầu sau khởi động)
+    key = (env.cr.dbname,)
+    api_cache.get_or_compute(LEAVE_TYPES_CACHE, LEAVE_TYPES_CACHE_TTL, key,
+                             lambda: env['hr.leave'].sudo().api_get_leave_types())
+    api_cache.get_or_compute(DEPARTMENTS_CACHE, SHARED_LIST_CACHE_TTL, key, lambda: get_department_list(env))
+    api_cache.get_or_compute(JOBS_CACHE, SHARED_LIST_CACHE_TTL, key, lambda: get_job_list(env))
+
+
+def warm_database(db_name):
+    """Nạp registry và cache của 1 database - trả về False nếu không thành công"""
+    start = time.monotonic()
+    try:
+        registry = get_registry(db_name)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            if env['ir.module.module']._get('hdi_api').state != 'installed':
+                _logger.info("hdi_api is not installed in %s, skip API cache pre-warming", db_name)
+                return True
+            _warm_env(env)
+    except Exception:
+        _logger.exception("Could not pre-warm API caches for database %s", db_name)
+        return False
+    _logger.info("Pre-warmed API caches for database %s in %.2fs", db_name, time.monotonic() - start)
+    return True
+
+
+def warm_databases(db_names=None):
+    """Nạp sẵn các database (mặc định theo hdi_api_preload_databases)"""
+    db_names = get_preload_databases() if db_names is None else db_names
+    return all([warm_database(db_name) for db_name in db_names])
+
+
+def install():
+    """Gắn vào bước preload registry của Odoo (gọi từ hook post_load, chỉ 1 lần)"""
+    preload_registries = server.preload_registries
+    if getattr(preload_registries, '_hdi_api_prewarm', False):
+        return
+
+    def preload_with_api_caches(dbnames):
+        rc = preload_registries(dbnames)
+        # Nạp sẵn là tối ưu: lỗi không được làm hỏng việc khởi động server
+        try:
+            warm_databases()
+        except Exception:
+            _logger.exception("API cache pre-warming failed")
+        return rc
+
+    preload_with_api_caches._hdi_api_prewarm = True
+    server.preload_registries = preload_with_api_caches
@@ -0,0 +1,185 @@
+"""
+Giới hạn số lần thử đăng nhập / kiểm tra mật khẩu (token bucket)
+- Mỗi khóa (IP, hoặc database + login) có 1 bucket trong bộ nhớ worker: tối đa
+  `capacity` lần thử liên tiếp, hồi lại đầy đủ sau `period` giây
+- Kiểm tra hoàn toàn trong bộ nhớ: request bị từ chối không chạm DB và không băm mật khẩu
+- Mỗi lần thử giữ trước 1 lượt ở mọi bucket (chặn cả loạt request song song trước khi băm),
+  có kết quả thì chỉ tính vào 1 ngân sách: sai → bucket 'ip'/'login', đúng → bucket
+  'login_success' (lớn hơn, chặn vòng lặp thử lại của client dù mật khẩu đúng)
+- Lượt bị tính được báo cho các worker khác qua kênh NOTIFY của revocation_cache
+  để mọi worker cùng trừ bucket (listener mất kết nối thì mỗi worker giới hạn riêng)
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+from odoo.tools import config
+
+from . import revocation_cache
+
+_logger = logging.getLogger(__name__)
+
+# Mặc định (số lần thử, chu kỳ giây), chỉnh bằng hdi_api_login_rate_<scope> (vd. hdi_api_login_rate_ip)
+# trong odoo.conf theo dạng "<số lần>/<giây>", vd. "30/60"
+LOGIN_RATE_LIMITS = {
+    # Lần thử sai - nhiều nhân viên có thể dùng chung IP (NAT văn phòng)
+    'ip': (30, 60),
+    'login': (5, 300),
+    # Lần đăng nhập đúng của 1 tài khoản
+    'login_success': (30, 300),
+}
+# Ngân sách lần thử sai / lần thử đúng
+FAILURE_SCOPES = ('ip', 'login')
+SUCCESS_SCOPES = ('login_success',)
+MAX_BUCKETS = 100000
+
+_lock = threading.Lock()
+# (scope, khóa...) -> [số lần thử còn lại, thời điểm cập nhật (time.monotonic())]
+_buckets = {}
+# scope -> (capacity, period) đã đọc từ odoo.conf
+_limits = {}
+
+
+def _parse_limit(scope):
+    """Đọc hdi_api_login_rate_<scope>; giá trị sai thì cảnh báo và dùng mặc định"""
+    default = LOGIN_RATE_LIMITS[scope]
+    value = config.get(f'hdi_api_login_rate_{scope}')
+    if not value:
+        return default
+    try:
+        capacity, period = (float(part) for part in str(value).split('/'))
+    except ValueError:
+        capacity = period = 0
+    if capacity >= 1 and period > 0:
+        return capacity, period
+    _logger.warning("Invalid hdi_api_login_rate_%s %r (expected \"<attempts>/<seconds>\"), using %s/%s",
+                    scope, value, *default)
+    return default
+
+
+def _get_limit(scope):
+    limit = _limits.get(scope)
+    if limit is None:
+        limit = _limits[scope] = _parse_limit(scope)
+    return limit
+
+
+def _refill(bucket, capacity, rate, now):
+    bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+    bucket[1] = now
+
+
+def _prune(now):
+    """Bỏ các bucket đã hồi đầy (tương đương chưa có)"""
+    for key in list(_buckets):
+        capacity, period = _get_limit(key[0])
+        bucket = _buckets[key]
+        _refill(bucket, capacity, capacity / period, now)
+        if bucket[0] >= capacity:
+            del _buckets[key]
+
+
+def _consume(keys, now):
+    """Trừ 1 lượt cho mọi khóa nếu tất cả còn lượt - trả về số giây phải chờ (0 nếu được phép)"""
+    retry_after = 0
+    with _lock:
+        if len(_buckets) >= MAX_BUCKETS:
+            _prune(now)
+        buckets = []
+        for key in keys:
+            capacity, period = _get_limit(key[0])
+            rate = capacity / period
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = _buckets[key] = [capacity, now]
+            _refill(bucket, capacity, rate, now)
+            if bucket[0] < 1:
+                retry_after = max(retry_after, math.ceil((1 - bucket[0]) / rate))
+            buckets.append(bucket)
+        if retry_after:
+            return retry_after
+        for bucket in buckets:
+            bucket[0] -= 1
+    return 0
+
+
+def _deduct(keys, now):
+    """Trừ 1 lượt cho mọi khóa (lượt báo từ worker khác)"""
+    with _lock:
+        if len(_buckets) >= MAX_BUCKETS:
+            _prune(now)
+        for key in keys:
+            capacity, period = _get_limit(key[0])
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = _buckets[key] = [capacity, now]
+            _refill(bucket, capacity, capacity / period, now)
+            bucket[0] = max(0, bucket[0] - 1)
+
+
+def _refund(keys, now):
+    """Trả lại lượt đã giữ trong check() (bucket đã bị bỏ thì coi như đầy)"""
+    with _lock:
+        for key in keys:
+            bucket = _buckets.get(key)
+            if bucket is not None:
+                capacity, period = _get_limit(key[0])
+                _refill(bucket, capacity, capacity / period, now)
+                bucket[0] = min(capacity, bucket[0] + 1)
+
+
+def _on_attempt(message):
+    # Worker gửi đã tự trừ trong check()
+    if message.get('pid') == os.getpid():
+        return
+    _deduct([tuple(key) for key in message['keys']], time.monotonic())
+
+
+revocation_cache.register_handler('login_attempt', _on_attempt)
+
+
+def login_keys(ip, db_name, login):
+    """Các khóa giới hạn cho 1 lần thử: theo IP và theo tài khoản (login không phân biệt hoa thường)"""
+    keys = [('ip', ip or '')]
+    if login:
+        account = (db_name or '', str(login).strip().lower())
+        keys += [('login',) + account, ('login_success',) + account]
+    return keys
+
+
+def check(keys):
+    """
+    Giữ 1 lượt thử ở mọi khóa trước khi xác thực - trả về số giây phải chờ (Retry-After)
+    nếu vượt giới hạn, 0 nếu được phép
+
+    Sau khi xác thực phải gọi report_failure() hoặc report_success() để tính lượt vào đúng ngân sách
+    """
+    # Khởi động listener để nhận lần thử từ worker khác
+    revocation_cache.get_generation()
+    return _consume([tuple(key) for key in keys], time.monotonic())
+
+
+def _settle(db_name, keys, charged_scopes):
+    """Trả lại lượt không thuộc charged_scopes, báo các lượt bị tính cho worker khác"""
+    keys = [tuple(key) for key in keys]
+    _refund([key for key in keys if key[0] not in charged_scopes], time.monotonic())
+    charged = [list(key) for key in keys if key[0] in charged_scopes]
+    if not charged:
+        return
+    try:
+        revocation_cache.notify(db_name, 'login_attempt', pid=os.getpid(), keys=charged)
+    except Exception:
+        # Không đồng bộ được thì mỗi worker vẫn giới hạn riêng
+        _logger.warning("Could not broadcast login attempt", exc_info=True)
+
+
+def report_failure(db_name, keys):
+    """Lần thử sai: tính vào bucket lần thử sai, trả lại lượt thành công đã giữ"""
+    _settle(db_name, keys, FAILURE_SCOPES)
+
+
+def report_success(db_name, keys):
+    """Lần thử đúng: tính vào bucket lần thử thành công, trả lại lượt thử sai đã giữ"""
+    _settle(db_name, keys, SUCCESS_SCOPES)
@@ -0,0 +1,69 @@
+"""
+Định tuyến endpoint chỉ đọc sang database replica
+- Dùng kết nối replica có sẵn của Odoo (db_replica_host / db_replica_port trong odoo.conf);
+  registry.cursor(readonly=True) tự quay về primary khi replica không kết nối được
+- Chống đọc dữ liệu cũ: user vừa ghi (request không phải GET thành công) được đọc
+  từ primary trong REPLICA_STALENESS_WINDOW giây; mốc ghi được báo cho các worker
+  khác qua kênh NOTIFY của revocation_cache
+"""
+import threading
+import time
+
+from odoo.tools import config
+
+from . import revocation_cache
+
+# Mặc định (giây), chỉnh bằng hdi_api_replica_staleness trong odoo.conf
+REPLICA_STALENESS_WINDOW = 10
+MAX_TRACKED_USERS = 100000
+
+_lock = threading.Lock()
+# (db, uid) -> thời điểm ghi gần nhất (time.time())
+_last_writes = {}
+
+
+def is_enabled():
+    """Có cấu hình replica không"""
+    return bool(config.get('db_replica_host') or config.get('db_replica_port'))
+
+
+def _staleness_window():
+    return float(config.get('hdi_api_replica_staleness') or REPLICA_STALENESS_WINDOW)
+
+
+def _remember_write(db_name, uid, timestamp):
+    with _lock:
+        if len(_last_writes) >= MAX_TRACKED_USERS:
+            # Bỏ các mốc đã quá cửa sổ
+            threshold = time.time() - _staleness_window()
+            for key in [key for key, value in _last_writes.items() if value < threshold]:
+                del _last_writes[key]
+        _last_writes[(db_name, uid)] = max(_last_writes.get((db_name, uid), 0), timestamp)
+
+
+def _on_user_write(message):
+    _remember_write(message['db'], message['uid'], message['ts'])
+
+
+revocation_cache.register_handler('user_write', _on_user_write)
+
+
+def note_write(db_name, uid):
+    """Ghi nhận user vừa ghi dữ liệu (gọi sau khi commit)"""
+    if not is_enabled() or not uid:
+        return
+    timestamp = time.time()
+    _remember_write(db_name, uid, timestamp)
+    revocation_cache.notify(db_name, 'user_write', uid=uid, ts=timestamp)
+
+
+def can_read_from_replica(db_name, uid):
+    """Đọc từ replica được không: đã cấu hình replica và user không vừa ghi"""
+    if not is_enabled():
+        return False
+    # Listener không hoạt động thì không biết được ghi ở worker khác: đọc primary
+    if revocation_cache.get_generation() is None:
+        return False
+    with _lock:
+        last_write = _last_writes.get((db_name, uid))
+    return last_write is None or time.time() - last_write > _staleness_window()
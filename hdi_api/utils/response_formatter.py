@@ -2,8 +2,10 @@
 Response formatter chung cho tất cả API
 Cung cấp các method để tạo response với format chuẩn
 """
-import json
-from odoo.http import Response
+import hashlib
+from odoo.http import Response, request
+
+from . import json_codec
 
 
 class ResponseFormatter:
@@ -12,10 +14,12 @@ class ResponseFormatter:
     # HTTP Status Codes
     HTTP_OK = 200
     HTTP_CREATED = 201
+    HTTP_NOT_MODIFIED = 304
     HTTP_BAD_REQUEST = 400
     HTTP_UNAUTHORIZED = 401
     HTTP_FORBIDDEN = 403
     HTTP_NOT_FOUND = 404
+    HTTP_TOO_MANY_REQUESTS = 429
     HTTP_INTERNAL_ERROR = 500
     
     # Status strings
@@ -63,26 +67,32 @@ class ResponseFormatter:
         }
 
     @staticmethod
-    def make_response(response_dict, status_code=200):
+    def make_response(response_dict, status_code=200, headers=None):
         """
         Tạo HTTP Response object từ dict
         
         Args:
             response_dict (dict): Response dict (từ success() hoặc error())
             status_code (int): HTTP status code
+            headers (list): Header bổ sung [(tên, giá trị)]
         
         Returns:
-            Response: Odoo Response object với JSON content
+            Response: Odoo Response object với JSON content (nén gzip/br nếu client hỗ trợ)
         """
+        body = json_codec.dumps(response_dict)
+        headers = [('Content-Type', 'application/json; charset=utf-8'), ('Vary', 'Accept-Encoding')] + list(headers or [])
+        body, content_encoding = json_codec.compress(body, request.httprequest.headers.get('Accept-Encoding'))
+        if content_encoding:
+            headers.append(('Content-Encoding', content_encoding))
         return Response(
-            json.dumps(response_dict, ensure_ascii=False),
+            body,
             status=status_code,
             mimetype='application/json',
-            headers={'Content-Type': 'application/json; charset=utf-8'}
+            headers=headers
         )
 
     @staticmethod
-    def success_response(message, data=None, status_code=HTTP_OK):
+    def success_response(message, data=None, status_code=HTTP_OK, etag=None):
         """
         Tạo success response và return HTTP Response object
         
@@ -90,15 +100,17 @@ class ResponseFormatter:
             message (str): Thông báo thành công
             data (dict): Dữ liệu trả về
             status_code (int): HTTP status code
+            etag (str): ETag của dữ liệu (từ data_etag()) - client gửi lại qua If-None-Match
         
         Returns:
             Response: Odoo Response object
         """
         response_dict = ResponseFormatter.success(message, data, status_code)
-        return ResponseFormatter.make_response(response_dict, status_code)
+        headers = ResponseFormatter.cache_headers(etag) if etag else None
+        return ResponseFormatter.make_response(response_dict, status_code, headers)
 
     @staticmethod
-    def error_response(message, status_code=HTTP_BAD_REQUEST, data=None):
+    def error_response(message, status_code=HTTP_BAD_REQUEST, data=None, headers=None):
         """
         Tạo error response và return HTTP Response object
         
@@ -106,9 +118,128 @@ class ResponseFormatter:
             message (str): Thông báo lỗi
             status_code (int): HTTP status code
             data (dict): Dữ liệu bổ sung
+            headers (list): Header bổ sung [(tên, giá trị)], vd. Retry-After
         
         Returns:
             Response: Odoo Response object
         """
         response_dict = ResponseFormatter.error(message, status_code, data)
-        return ResponseFormatter.make_response(response_dict, status_code)
+        return ResponseFormatter.make_response(response_dict, status_code, headers)
+
+    @staticmethod
+    def too_many_requests_response(retry_after):
+        """
+        Response 429 khi vượt giới hạn số lần thử, kèm Retry-After (giây)
+        
+        Args:
+            retry_after (int): Số giây client phải chờ trước khi thử lại
+        
+        Returns:
+            Response: Odoo Response object
+        """
+        return ResponseFormatter.error_response(
+            'Quá nhiều lần thử, vui lòng thử lại sau',
+            ResponseFormatter.HTTP_TOO_MANY_REQUESTS,
+            {'retry_after': retry_after},
+            [('Retry-After', str(retry_after))]
+        )
+
+    @staticmethod
+    def is_not_modified(etag):
+        """
+        Kiểm tra header If-None-Match của request có khớp ETag không
+
+        Args:
+            etag (str): ETag hiện tại của tài nguyên
+
+        Returns:
+            bool: True nếu client đã có bản mới nhất (trả 304)
+        """
+        if_none_match = request.httprequest.headers.get('If-None-Match', '')
+        if not if_none_match or not etag:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        # So sánh yếu: bỏ tiền tố W/ ở cả 2 phía
+        current = etag[2:] if etag.startswith('W/') else etag
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return any((tag[2:] if tag.startswith('W/') else tag) == current for tag in candidates)
+
+    @staticmethod
+    def cache_headers(etag=None, max_age=None):
+        """
+        Header cache cho response
+
+        Args:
+            etag (str): ETag của tài nguyên
+            max_age (int): Số giây client được dùng bản cache (None: luôn hỏi lại server)
+
+        Returns:
+            list: Danh sách (header, value)
+        """
+        headers = []
+        if etag:
+            headers.append(('ETag', etag))
+        if max_age:
+            headers.append(('Cache-Control', f'private, max-age={max_age}'))
+        else:
+            headers.append(('Cache-Control', 'private, no-cache'))
+        return headers
+
+    @staticmethod
+    def not_modified_response(etag, max_age=None):
+        """
+        Tạo response 304 Not Modified (không có body)
+
+        Args:
+            etag (str): ETag hiện tại
+            max_age (int): Cache-Control max-age
+
+        Returns:
+            Response: Odoo Response object
+        """
+        return Response(
+            status=ResponseFormatter.HTTP_NOT_MODIFIED,
+            headers=ResponseFormatter.cache_headers(etag, max_age)
+        )
+
+    @staticmethod
+    def binary_response(content, mimetype, etag=None, max_age=None):
+        """
+        Tạo response trả về dữ liệu nhị phân (ảnh, file)
+
+        Args:
+            content (bytes): Nội dung
+            mimetype (str): Kiểu nội dung
+            etag (str): ETag của nội dung
+            max_age (int): Cache-Control max-age
+
+        Returns:
+            Response: Odoo Response object
+        """
+        headers = [('Content-Length', str(len(content)))] + ResponseFormatter.cache_headers(etag, max_age)
+        return Response(content, status=ResponseFormatter.HTTP_OK, mimetype=mimetype, headers=headers)
+
+    @staticmethod
+    def data_etag(env, sources, version=None):
+        """
+        Tạo ETag yếu cho dữ liệu đọc từ các bản ghi, không cần đọc/serialize bản ghi
+
+        Mỗi nguồn chỉ tốn 1 câu aggregate (count, max(write_date), sum(id)): thêm, sửa
+        hoặc xóa bản ghi trong domain đều làm ETag thay đổi.
+
+        Args:
+            env: Environment của request
+            sources (list): [(model_name, domain)] các bản ghi tạo nên response
+            version: Giá trị bổ sung (vd. tháng đang xem, tham số request)
+
+        Returns:
+            str: ETag dạng W/"..."
+        """
+        parts = [str(version)] if version is not None else []
+        for model_name, domain in sources:
+            [(count, last_write, id_sum)] = env[model_name].sudo()._read_group(
+                domain, [], ['__count', 'write_date:max', 'id:sum'])
+            parts.append(f'{model_name}:{count}:{last_write}:{id_sum}')
+        digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:32]
+        return f'W/"{digest}"'
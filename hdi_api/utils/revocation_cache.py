@@ -0,0 +1,259 @@
+"""
+Cache thu hồi JWT trong bộ nhớ worker
+- Giữ bản sao các token_hash đã bị thu hồi (chưa hết hạn) của từng database
+- Đồng bộ giữa các worker qua Postgres LISTEN/NOTIFY (kênh trên database 'postgres',
+  giống cơ chế của bus.bus)
+- Chỉ truy vấn DB khi cache không chắc chắn: chưa nạp, đã tràn dung lượng
+  hoặc listener mất kết nối
+- Cache bộ đếm token_version theo user (đăng xuất mọi thiết bị / đổi mật khẩu)
+"""
+import json
+import logging
+import selectors
+import threading
+import time
+from collections import OrderedDict
+
+import odoo
+
+_logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'hdi_api_jwt'
+MAX_REVOKED_PER_DB = 50000
+LISTEN_TIMEOUT = 50
+RECONNECT_DELAY = 5
+
+
+class _DbRevocations:
+    """Các token bị thu hồi của 1 database: token_hash -> exp (timestamp)"""
+
+    def __init__(self):
+        self.hashes = OrderedDict()
+        self.generation = None
+        self.truncated = False
+
+    def add(self, token_hash, exp):
+        self.hashes[token_hash] = exp
+        self.hashes.move_to_end(token_hash)
+        while len(self.hashes) > MAX_REVOKED_PER_DB:
+            self.hashes.popitem(last=False)
+            self.truncated = True
+
+    def prune(self, now):
+        for token_hash in [h for h, exp in self.hashes.items() if exp < now]:
+            del self.hashes[token_hash]
+
+    def lookup(self, token_hash, generation, now):
+        """True: đã thu hồi, False: chắc chắn chưa, None: không chắc (cần hỏi DB)"""
+        exp = self.hashes.get(token_hash)
+        if exp is not None and exp >= now:
+            return True
+        if self.generation == generation and not self.truncated:
+            return False
+        return None
+
+
+_lock = threading.RLock()
+_databases = {}
+# db -> (generation, {uid: token_version})
+_user_versions = {}
+_listener = None
+# Tăng mỗi lần listener kết nối lại; None khi listener không hoạt động
+_generation = None
+_generation_seq = 0
+
+
+def _get_db_state(db_name):
+    state = _databases.get(db_name)
+    if state is None:
+        state = _databases[db_name] = _DbRevocations()
+    return state
+
+
+def _set_listening(listening):
+    global _generation, _generation_seq
+    with _lock:
+        if listening:
+            _generation_seq += 1
+            _generation = _generation_seq
+        else:
+            _generation = None
+
+
+def _on_revoke(message):
+    with _lock:
+        _get_db_state(message['db']).add(message['hash'], message['exp'])
+
+
+def _on_token_version(message):
+    with _lock:
+        generation, versions = _user_versions.get(message['db'], (None, {}))
+        versions[message['uid']] = max(versions.get(message['uid'], 0), message['version'])
+        _user_versions[message['db']] = (generation, versions)
+
+
+# Xử lý thông báo theo loại - module khác đăng ký thêm qua register_handler()
+_handlers = {'revoke': _on_revoke, 'token_version': _on_token_version}
+
+
+def register_handler(message_type, handler):
+    """Đăng ký hàm xử lý cho 1 loại thông báo trên kênh NOTIFY (handler nhận dict message)"""
+    _handlers[message_type] = handler
+
+
+# Kênh NOTIFY khác nghe chung kết nối của listener: tên kênh -> hàm xử lý (nhận payload dạng chuỗi)
+# Đăng ký lúc import module, trước khi listener khởi động
+_channel_handlers = {}
+
+
+def register_channel(channel, handler):
+    """Nghe thêm 1 kênh NOTIFY trên database 'postgres' (vd. 'imbus' của bus.bus)"""
+    _channel_handlers[channel] = handler
+
+
+def get_generation():
+    """Thế hệ kết nối của listener (None khi listener không hoạt động)
+
+    Cache dựa trên NOTIFY chỉ tin cậy được khi được nạp trong cùng 1 thế hệ.
+    """
+    _ensure_listener()
+    return _generation
+
+
+def _dispatch(payload):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    handler = _handlers.get(message.get('type'))
+    if handler:
+        try:
+            handler(message)
+        except Exception:
+            _logger.exception("Error handling JWT cache notification %s", message.get('type'))
+
+
+def _dispatch_channel(channel, payload):
+    handler = _channel_handlers.get(channel)
+    if handler:
+        try:
+            handler(payload)
+        except Exception:
+            _logger.exception("Error handling notification on channel %s", channel)
+
+
+def _listen_loop():
+    while True:
+        try:
+            with odoo.sql_db.db_connect('postgres').cursor() as cr, selectors.DefaultSelector() as sel:
+                cr.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                for channel in _channel_handlers:
+                    cr.execute(f"LISTEN {channel}")
+                cr.commit()
+                conn = cr._cnx
+                sel.register(conn, selectors.EVENT_READ)
+                _set_listening(True)
+                while True:
+                    if sel.select(LISTEN_TIMEOUT):
+                        conn.poll()
+                        while conn.notifies:
+                            notification = conn.notifies.pop()
+                            if notification.channel == NOTIFY_CHANNEL:
+                                _dispatch(notification.payload)
+                            else:
+                                _dispatch_channel(notification.channel, notification.payload)
+                    else:
+                        now = time.time()
+                        with _lock:
+                            for state in _databases.values():
+                                state.prune(now)
+        except Exception:
+            _logger.exception("JWT revocation listener error, reconnecting in %ss", RECONNECT_DELAY)
+        _set_listening(False)
+        time.sleep(RECONNECT_DELAY)
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen_loop, name='hdi_api.jwt_revocation', daemon=True)
+            _listener.start()
+
+
+def _load_snapshot(env, generation):
+    """Nạp toàn bộ token đang bị thu hồi bằng cursor mới (thấy mọi thu hồi đã commit trước khi listener chạy)"""
+    with env.registry.cursor() as cr:
+        revocations = env(cr=cr)['jwt.token.blacklist']._get_active_revocations()
+    with _lock:
+        state = _get_db_state(env.cr.dbname)
+        for token_hash, exp in revocations.items():
+            state.add(token_hash, exp)
+        state.generation = generation
+
+
+def is_revoked(env, token_hash):
+    """Kiểm tra token_hash có bị thu hồi không - đường thường gặp không truy vấn DB"""
+    _ensure_listener()
+    db_name = env.cr.dbname
+    now = time.time()
+
+    with _lock:
+        generation = _generation
+        state = _get_db_state(db_name)
+        result = state.lookup(token_hash, generation, now)
+        need_snapshot = result is None and generation is not None and state.generation != generation
+
+    if need_snapshot:
+        try:
+            _load_snapshot(env, generation)
+        except Exception:
+            _logger.warning("Could not load JWT revocation snapshot for %s", db_name, exc_info=True)
+        with _lock:
+            result = state.lookup(token_hash, _generation, now)
+
+    if result is None:
+        return env['jwt.token.blacklist']._is_token_revoked(token_hash)
+    return result
+
+
+def get_token_version(env, uid):
+    """Bộ đếm token_version hiện tại của user - chỉ đọc DB lần đầu trong mỗi thế hệ listener"""
+    _ensure_listener()
+    db_name = env.cr.dbname
+    with _lock:
+        generation = _generation
+        cached_generation, versions = _user_versions.get(db_name, (None, {}))
+        if generation is not None and cached_generation == generation and uid in versions:
+            return versions[uid]
+
+    version = env['res.users'].sudo()._get_api_token_version(uid)
+    if generation is not None:
+        with _lock:
+            cached_generation, versions = _user_versions.get(db_name, (None, {}))
+            if cached_generation != generation:
+                versions = {}
+            # Giữ giá trị lớn hơn nếu thông báo đến trong lúc đọc DB
+            versions[uid] = max(versions.get(uid, 0), version)
+            _user_versions[db_name] = (generation, versions)
+    return version
+
+
+def remember_token_version(db_name, uid, version):
+    """Ghi nhận ngay trong worker hiện tại (không đợi NOTIFY quay về)"""
+    _on_token_version({'db': db_name, 'uid': uid, 'version': version})
+
+
+def remember(db_name, token_hash, exp):
+    """Ghi nhận ngay trong worker hiện tại (không đợi NOTIFY quay về)"""
+    with _lock:
+        _get_db_state(db_name).add(token_hash, exp)
+
+
+def notify(db_name, message_type, **values):
+    """Phát thông báo tới mọi worker (gọi sau khi commit)"""
+    payload = json.dumps(dict(values, db=db_name, type=message_type))
+    with odoo.sql_db.db_connect('postgres').cursor() as cr:
+        cr.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
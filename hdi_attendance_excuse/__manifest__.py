@@ -8,6 +8,7 @@
     'base',
     'hr',
     'hr_attendance',
+    'hdi_base',
   ],
   'data': [
     # Security
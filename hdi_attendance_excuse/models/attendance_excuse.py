@@ -4,6 +4,7 @@ Quản lý giải trình chấm công cho nhân viên
 """
 from odoo import models, fields, api
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools.sql import create_index
 from datetime import datetime, timedelta
 import pytz
 
@@ -13,7 +14,7 @@ class AttendanceExcuse(models.Model):
     _description = 'Giải trình chấm công'
     _order = 'date desc, employee_id'
     _rec_name = 'display_name'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hdi.keyset.pagination.mixin']
 
     display_name = fields.Char(
         string='Tên',
@@ -154,6 +155,17 @@ class AttendanceExcuse(models.Model):
         store=False
     )
 
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Index phục vụ phân trang keyset danh sách giải trình của nhân viên
+        create_index(
+            self.env.cr,
+            'attendance_excuse_employee_date_id_idx',
+            self._table,
+            ['employee_id', 'date DESC', 'id DESC'],
+        )
+        return res
+
     @api.depends('employee_id', 'date', 'excuse_type', 'state')
     def _compute_display_name(self):
         """Tính tên hiển thị"""
@@ -593,13 +605,13 @@ class AttendanceExcuse(models.Model):
             'excuse_type': excuse.excuse_type,
             'state': excuse.state,
             'reason': excuse.reason,
-            'requested_checkin': excuse.requested_checkin.isoformat() if excuse.requested_checkin else None,
-            'requested_checkout': excuse.requested_checkout.isoformat() if excuse.requested_checkout else None,
+            'requested_checkin': excuse.requested_checkin or None,
+            'requested_checkout': excuse.requested_checkout or None,
         }
 
     @api.model
-    def api_get_my_excuse_list(self, user_id, limit=10, offset=0, state=None):
-        """API: Lấy danh sách giải trình của user"""
+    def api_get_my_excuse_list(self, user_id, limit=10, offset=0, state=None, cursor=None, with_count=None):
+        """API: Lấy danh sách giải trình của user (phân trang keyset theo next_cursor)"""
         current_user = self.env['res.users'].browse(user_id)
         if not current_user.exists():
             raise UserError('User không tồn tại')
@@ -612,8 +624,8 @@ class AttendanceExcuse(models.Model):
         if state:
             domain.append(('state', '=', state))
 
-        excuses = self.search(domain, limit=limit, offset=offset, order='date desc')
-        total_count = self.search_count(domain)
+        excuses, next_cursor = self._keyset_search(domain, 'date', limit, cursor=cursor, offset=offset)
+        total_count = self._keyset_total_count(domain, cursor, with_count)
 
         excuse_data = []
         for excuse in excuses:
@@ -622,14 +634,14 @@ class AttendanceExcuse(models.Model):
                 'attendance_id': excuse.attendance_id.id,
                 'employee_id': excuse.employee_id.id,
                 'employee_name': excuse.employee_id.name,
-                'date': excuse.date.isoformat() if excuse.date else None,
+                'date': excuse.date or None,
                 'excuse_type': excuse.excuse_type,
                 'state': excuse.state,
                 'reason': excuse.reason,
-                'original_checkin': excuse.original_checkin.isoformat() if excuse.original_checkin else None,
-                'original_checkout': excuse.original_checkout.isoformat() if excuse.original_checkout else None,
-                'requested_checkin': excuse.requested_checkin.isoformat() if excuse.requested_checkin else None,
-                'requested_checkout': excuse.requested_checkout.isoformat() if excuse.requested_checkout else None,
+                'original_checkin': excuse.original_checkin or None,
+                'original_checkout': excuse.original_checkout or None,
+                'requested_checkin': excuse.requested_checkin or None,
+                'requested_checkout': excuse.requested_checkout or None,
             })
 
         return {
@@ -637,6 +649,7 @@ class AttendanceExcuse(models.Model):
             'total_count': total_count,
             'limit': limit,
             'offset': offset,
+            'next_cursor': next_cursor,
         }
 
     def api_get_excuse_detail(self, user_id):
@@ -660,14 +673,14 @@ class AttendanceExcuse(models.Model):
             'attendance_id': self.attendance_id.id,
             'employee_id': self.employee_id.id,
             'employee_name': self.employee_id.name,
-            'date': self.date.isoformat() if self.date else None,
+            'date': self.date or None,
             'excuse_type': self.excuse_type,
             'state': self.state,
             'reason': self.reason,
-            'original_checkin': self.original_checkin.isoformat() if self.original_checkin else None,
-            'original_checkout': self.original_checkout.isoformat() if self.original_checkout else None,
-            'requested_checkin': self.requested_checkin.isoformat() if self.requested_checkin else None,
-            'requested_checkout': self.requested_checkout.isoformat() if self.requested_checkout else None,
+            'original_checkin': self.original_checkin or None,
+            'original_checkout': self.original_checkout or None,
+            'requested_checkin': self.requested_checkin or None,
+            'requested_checkout': self.requested_checkout or None,
         }
 
     def api_submit_excuse(self, user_id):
@@ -744,7 +757,7 @@ class AttendanceExcuse(models.Model):
             'state': self.state,
             'approver_id': self.approver_id.id,
             'approver_name': self.approver_id.name,
-            'approval_date': self.approval_date.isoformat() if self.approval_date else None,
+            'approval_date': self.approval_date or None,
         }
 
     def api_reject_excuse(self, user_id, rejection_reason=''):
@@ -782,6 +795,6 @@ class AttendanceExcuse(models.Model):
             'state': self.state,
             'approver_id': self.approver_id.id,
             'approver_name': self.approver_id.name,
-            'approval_date': self.approval_date.isoformat() if self.approval_date else None,
+            'approval_date': self.approval_date or None,
             'rejection_reason': self.rejection_reason,
         }
@@ -1,11 +1,27 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools.sql import create_index
 import pytz
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+
+# Namespace của khóa advisory chấm công (pg_advisory_xact_lock(namespace, employee_id))
+ATTENDANCE_LOCK_NAMESPACE = 7301
+
+# Chấm công offline gửi bù hàng loạt (api_submit_punches)
+MAX_PUNCHES_PER_REQUEST = 100
+MAX_PUNCH_AGE = timedelta(days=7)
+# Chênh lệch đồng hồ thiết bị chấp nhận được khi thời điểm chấm công ở tương lai
+PUNCH_CLOCK_SKEW = timedelta(minutes=5)
+MAX_PUNCH_KEY_LENGTH = 64
+
+PUNCH_ACCEPTED = 'accepted'
+PUNCH_DUPLICATE = 'duplicate'
+PUNCH_REJECTED = 'rejected'
 
 
 class HRAttendance(models.Model):
-    _inherit = 'hr.attendance'
+    _name = 'hr.attendance'
+    _inherit = ['hr.attendance', 'hdi.keyset.pagination.mixin']
 
     excuse_ids = fields.One2many(
         'attendance.excuse',
@@ -53,59 +69,143 @@ class HRAttendance(models.Model):
         help='Trạng thái chi tiết của bản ghi chấm công'
     )
 
+    in_punch_key = fields.Char(
+        string='Mã chấm công vào (offline)',
+        copy=False,
+        readonly=True,
+        help='Khóa idempotency do app tạo cho lần chấm công vào gửi bù'
+    )
+
+    out_punch_key = fields.Char(
+        string='Mã chấm công ra (offline)',
+        copy=False,
+        readonly=True,
+        help='Khóa idempotency do app tạo cho lần chấm công ra gửi bù'
+    )
+
+    _sql_constraints = [
+        ('employee_in_punch_key_uniq', 'unique(employee_id, in_punch_key)',
+         'Mã chấm công vào đã được ghi nhận'),
+        ('employee_out_punch_key_uniq', 'unique(employee_id, out_punch_key)',
+         'Mã chấm công ra đã được ghi nhận'),
+    ]
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Index phục vụ phân trang keyset lịch sử chấm công
+        create_index(
+            self.env.cr,
+            'hr_attendance_employee_check_in_id_idx',
+            self._table,
+            ['employee_id', 'check_in DESC', 'id DESC'],
+        )
+        # Index cho bản ghi chưa check-out (fast path chấm công vào/ra)
+        create_index(
+            self.env.cr,
+            'hr_attendance_employee_open_idx',
+            self._table,
+            ['employee_id'],
+            where='check_out IS NULL',
+        )
+        return res
+
+    def _get_local_day_bounds(self, employee, dt):
+        """Khoảng [đầu ngày, đầu ngày hôm sau) theo múi giờ nhân viên của thời điểm dt, trả về UTC"""
+        tz = pytz.timezone(employee._get_tz() or 'UTC')
+        local = pytz.UTC.localize(dt).astimezone(tz)
+        day_start = tz.localize(datetime.combine(local.date(), time.min))
+        day_end = day_start + timedelta(days=1)
+        return (
+            day_start.astimezone(pytz.UTC).replace(tzinfo=None),
+            day_end.astimezone(pytz.UTC).replace(tzinfo=None),
+        )
+
     def _check_attendance_limit(self, record=None):
         check_record = record or self
-        
+
         if not check_record.check_in or not check_record.employee_id:
             return
 
-        # Lấy múi giờ của nhân viên
-        tz = pytz.timezone(check_record.employee_id._get_tz() or 'UTC')
-        check_in_local = check_record.check_in.astimezone(tz)
-        
-        # Xác định ngày bắt đầu và kết thúc trong múi giờ địa phương
-        day_start = check_in_local.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        # Chuyển đổi về UTC
-        day_start_utc = day_start.astimezone(pytz.UTC).replace(tzinfo=None)
-        day_end_utc = day_end.astimezone(pytz.UTC).replace(tzinfo=None)
-
-        # Tìm tất cả bản ghi chấm công trong cùng ngày của nhân viên
-        # Loại trừ 'technical' mode
-        attendances_same_day = self.search([
-            ('employee_id', '=', check_record.employee_id.id),
-            ('check_in', '>=', day_start_utc),
-            ('check_in', '<', day_end_utc),
-            ('id', '!=', check_record.id),
-        ])
-
-        completed_attendances = attendances_same_day.filtered(
-            lambda a: a.check_in and a.check_out
-        )
-        
-        if completed_attendances:
-            
+        # Ngày theo múi giờ của nhân viên, đổi về UTC
+        day_start_utc, day_end_utc = self._get_local_day_bounds(check_record.employee_id, check_record.check_in)
+
+        # Đã có bản ghi hoàn thành khác trong cùng ngày (1 câu truy vấn theo index)
+        _has_open, completed_same_day = self._get_check_in_state(
+            check_record.employee_id.id, day_start_utc, day_end_utc, exclude_id=check_record.id)
+        if completed_same_day:
             raise ValidationError(
                 f'Chỉ được phép chấm công tối đa 1 lần trong một ngày'
             )
 
+    def _lock_employee_attendance(self, employee_id):
+        """Khóa advisory theo nhân viên đến hết transaction - các lần bấm trùng chạy tuần tự"""
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(%s, %s)", [ATTENDANCE_LOCK_NAMESPACE, employee_id])
+
+    def _get_check_in_state(self, employee_id, day_start, day_end, exclude_id=None):
+        """
+        Kiểm tra điều kiện chấm công vào trong 1 câu truy vấn (index bản ghi mở + index check_in)
+
+        Args:
+            exclude_id: bỏ qua bản ghi này (ràng buộc kiểm tra chính bản ghi đang ghi)
+
+        Returns:
+            tuple: (có bản ghi chưa check-out, đã có bản ghi hoàn thành trong ngày)
+        """
+        self.flush_model(['employee_id', 'check_in', 'check_out'])
+        self.env.cr.execute("""
+            SELECT COALESCE(bool_or(check_out IS NULL), FALSE),
+                   COALESCE(bool_or(check_out IS NOT NULL), FALSE)
+              FROM hr_attendance
+             WHERE employee_id = %(employee_id)s
+               AND id != %(exclude_id)s
+               AND (check_out IS NULL OR (check_in >= %(day_start)s AND check_in < %(day_end)s))
+        """, {
+            'employee_id': employee_id,
+            'day_start': day_start,
+            'day_end': day_end,
+            # Bản ghi chưa lưu (NewId) không có trong DB
+            'exclude_id': exclude_id if isinstance(exclude_id, int) else 0,
+        })
+        return self.env.cr.fetchone()
+
+    def _get_check_out_state(self, employee_id, tz_name):
+        """
+        Bản ghi chưa check-out gần nhất và ràng buộc 1 lần/ngày cho nó trong 1 câu truy vấn
+
+        Returns:
+            tuple: (id bản ghi mở hoặc None, đã có bản ghi hoàn thành khác cùng ngày)
+        """
+        self.flush_model(['employee_id', 'check_in', 'check_out'])
+        self.env.cr.execute("""
+            WITH open_attendance AS (
+                SELECT id,
+                       (date_trunc('day', check_in AT TIME ZONE 'UTC' AT TIME ZONE %(tz)s)
+                           AT TIME ZONE %(tz)s) AT TIME ZONE 'UTC' AS day_start
+                  FROM hr_attendance
+                 WHERE employee_id = %(employee_id)s
+                   AND check_out IS NULL
+              ORDER BY check_in DESC
+                 LIMIT 1
+            )
+            SELECT o.id,
+                   EXISTS (
+                       SELECT 1
+                         FROM hr_attendance a
+                        WHERE a.employee_id = %(employee_id)s
+                          AND a.id != o.id
+                          AND a.check_out IS NOT NULL
+                          AND a.check_in >= o.day_start
+                          AND a.check_in < o.day_start + interval '1 day'
+                   )
+              FROM open_attendance o
+        """, {'employee_id': employee_id, 'tz': tz_name})
+        return self.env.cr.fetchone() or (None, False)
+
     @api.constrains('check_in', 'employee_id', 'in_mode', 'check_out')
     def _check_max_two_attendances_per_day(self):
         for record in self:
             self._check_attendance_limit(record)
 
-    @api.model_create_multi
-    def create(self, vals_list):
-        for vals in vals_list:
-            # Tạo bản ghi tạm thời để kiểm tra
-            temp_record = self.new(vals)
-            # Gọi kiểm tra
-            self._check_attendance_limit(temp_record)
-        
-        # Nếu không có lỗi, tiếp tục tạo bình thường
-        return super().create(vals_list)
-
     @api.depends('excuse_ids', 'excuse_ids.state')
     def _compute_is_excused(self):
         for record in self:
@@ -280,51 +380,30 @@ class HRAttendance(models.Model):
 
     @api.model
     def api_check_in(self, employee_id, in_latitude=None, in_longitude=None):
-        employee = self.env['hr.employee'].browse(employee_id)
-        
-        # Kiểm tra xem đã check-in chưa (chưa check-out)
-        last_open_attendance = self.search([
-            ('employee_id', '=', employee_id),
-            ('check_out', '=', False),
-        ], limit=1)
+        """
+        Chấm công vào (fast path)
 
-        if last_open_attendance:
-            
-            raise UserError(
-                f'Chỉ được phép chấm công tối đa 1 lần trong một ngày'
-            )
+        Khóa advisory theo nhân viên rồi kiểm tra "đang có bản ghi mở / đã hoàn thành trong ngày"
+        bằng 1 câu truy vấn (cùng câu truy vấn với ràng buộc _check_attendance_limit).
+        """
+        employee = self.env['hr.employee'].browse(employee_id)
+        self._lock_employee_attendance(employee_id)
 
-        # Kiểm tra xem đã check in + check out lần đầu trong ngày chưa
-        tz = pytz.timezone(employee._get_tz() or 'UTC')
+        # Ngày theo múi giờ của nhân viên
         now = fields.Datetime.now()
-        now_local = now.astimezone(tz)
-        
-        # Xác định ngày bắt đầu và kết thúc trong múi giờ địa phương
-        day_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        # Chuyển đổi về UTC
-        day_start_utc = day_start.astimezone(pytz.UTC).replace(tzinfo=None)
-        day_end_utc = day_end.astimezone(pytz.UTC).replace(tzinfo=None)
+        day_start_utc, day_end_utc = self._get_local_day_bounds(employee, now)
+        has_open_attendance, completed_today = self._get_check_in_state(employee_id, day_start_utc, day_end_utc)
 
-        completed_today = self.search([
-            ('employee_id', '=', employee_id),
-            ('check_in', '>=', day_start_utc),
-            ('check_in', '<', day_end_utc),
-            ('check_out', '!=', False),
-        ])
-
-        if completed_today:
-            
-            warning_msg = (
+        # Đang check-in (chưa check-out) hoặc đã check in + check out trong ngày
+        if has_open_attendance or completed_today:
+            raise UserError(
                 f'Chỉ được phép chấm công tối đa 1 lần trong một ngày'
             )
-            raise UserError(warning_msg)
 
         # Tạo dữ liệu cho attendance record
         attendance_data = {
             'employee_id': employee_id,
-            'check_in': fields.Datetime.now(),
+            'check_in': now,
             'in_mode': 'manual',
         }
 
@@ -341,7 +420,7 @@ class HRAttendance(models.Model):
             except (ValueError, TypeError):
                 pass
 
-        # Tạo bản ghi chấm công
+        # Tạo bản ghi chấm công (điều kiện đã kiểm tra ở trên, dưới khóa)
         attendance = self.sudo().create(attendance_data)
 
         return {
@@ -355,18 +434,26 @@ class HRAttendance(models.Model):
 
     @api.model
     def api_check_out(self, employee_id, out_latitude=None, out_longitude=None):
-        
+        """Chấm công ra (fast path): khóa advisory theo nhân viên, tìm và kiểm tra bản ghi mở trong 1 câu truy vấn"""
+        employee = self.env['hr.employee'].browse(employee_id)
+        self._lock_employee_attendance(employee_id)
+
         # Tìm bản ghi chấm công chưa check-out
-        attendance = self.search([
-            ('employee_id', '=', employee_id),
-            ('check_out', '=', False)
-        ], limit=1, order='check_in desc')
+        attendance_id, completed_same_day = self._get_check_out_state(employee_id, employee._get_tz() or 'UTC')
 
-        if not attendance:
+        if not attendance_id:
             raise UserError(
                 'Không tìm thấy bản ghi chấm công vào. Vui lòng chấm công vào trước.'
             )
 
+        # Cùng điều kiện với ràng buộc _check_attendance_limit khi ghi check_out
+        if completed_same_day:
+            raise ValidationError(
+                f'Chỉ được phép chấm công tối đa 1 lần trong một ngày'
+            )
+
+        attendance = self.browse(attendance_id)
+
         # Kiểm tra và xóa overtime record cũ nếu tồn tại
         if attendance.check_in:
             attendance_date = attendance.check_in.date()
@@ -415,6 +502,214 @@ class HRAttendance(models.Model):
             'worked_hours': attendance.worked_hours if hasattr(attendance, 'worked_hours') else 0,
         }
 
+    def _parse_punch(self, punch, now):
+        """
+        Kiểm tra và chuẩn hóa 1 lần chấm công gửi bù
+
+        Returns:
+            tuple: (dict đã chuẩn hóa hoặc None, thông báo lỗi)
+        """
+        if not isinstance(punch, dict):
+            return None, 'Dữ liệu chấm công không hợp lệ'
+
+        key = punch.get('key')
+        if not isinstance(key, str) or not key.strip() or len(key) > MAX_PUNCH_KEY_LENGTH:
+            return None, 'Thiếu hoặc sai mã chấm công (key)'
+
+        punch_type = punch.get('type')
+        if punch_type not in ('in', 'out'):
+            return None, "Loại chấm công phải là 'in' hoặc 'out'"
+
+        # ISO 8601; có múi giờ thì đổi về UTC, không có thì coi là UTC
+        try:
+            # Python < 3.11 không nhận hậu tố 'Z'
+            timestamp = datetime.fromisoformat(str(punch.get('timestamp')).replace('Z', '+00:00'))
+        except ValueError:
+            return None, 'Thời điểm chấm công không hợp lệ'
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(pytz.UTC).replace(tzinfo=None)
+        timestamp = timestamp.replace(microsecond=0)
+
+        if timestamp > now + PUNCH_CLOCK_SKEW:
+            return None, 'Thời điểm chấm công ở tương lai'
+        if timestamp < now - MAX_PUNCH_AGE:
+            return None, f'Chỉ nhận chấm công trong vòng {MAX_PUNCH_AGE.days} ngày'
+
+        coordinates = {}
+        for name in ('latitude', 'longitude'):
+            try:
+                coordinates[name] = float(punch[name]) if punch.get(name) not in (None, '') else None
+            except (ValueError, TypeError):
+                coordinates[name] = None
+
+        return {
+            'key': key.strip(),
+            'type': punch_type,
+            'timestamp': timestamp,
+            'latitude': coordinates['latitude'],
+            'longitude': coordinates['longitude'],
+        }, None
+
+    @api.model
+    def api_submit_punches(self, employee_id, punches):
+        """
+        Ghi nhận hàng loạt lần chấm công offline (thời điểm và GPS do app gửi) trong 1 transaction
+
+        - Khóa advisory theo nhân viên (cùng khóa với chấm công vào/ra)
+        - Bỏ qua lần chấm công đã ghi nhận theo khóa idempotency (in_punch_key / out_punch_key)
+        - Đọc các bản ghi liên quan bằng 1 câu truy vấn rồi kiểm tra theo thứ tự thời gian
+          với cùng quy tắc của api_check_in / api_check_out (1 lần/ngày, phải vào trước khi ra)
+        - Tạo mới bằng 1 lần create() và đóng bản ghi đang mở bằng 1 lần write()
+
+        Returns:
+            list: kết quả theo thứ tự gửi lên [{'key', 'status', 'attendance_id', 'message'}]
+        """
+        employee = self.env['hr.employee'].browse(employee_id)
+        now = fields.Datetime.now()
+        results = [{'key': punch.get('key') if isinstance(punch, dict) else None,
+                    'status': PUNCH_REJECTED, 'attendance_id': None, 'message': None} for punch in punches]
+
+        valid = []
+        seen_keys = set()
+        for index, punch in enumerate(punches):
+            parsed, error = self._parse_punch(punch, now)
+            if error:
+                results[index]['message'] = error
+                continue
+            if (parsed['type'], parsed['key']) in seen_keys:
+                results[index].update(status=PUNCH_DUPLICATE, message='Trùng mã chấm công trong cùng yêu cầu')
+                continue
+            seen_keys.add((parsed['type'], parsed['key']))
+            valid.append((index, parsed))
+
+        if not valid:
+            return results
+
+        self._lock_employee_attendance(employee_id)
+
+        # Lần chấm công đã ghi nhận (app gửi lại sau khi mất kết nối)
+        in_keys = [parsed['key'] for _index, parsed in valid if parsed['type'] == 'in']
+        out_keys = [parsed['key'] for _index, parsed in valid if parsed['type'] == 'out']
+        recorded = {}
+        for attendance in self.sudo().search_fetch([
+            ('employee_id', '=', employee_id),
+            '|', ('in_punch_key', 'in', in_keys), ('out_punch_key', 'in', out_keys),
+        ], ['in_punch_key', 'out_punch_key']):
+            recorded[('in', attendance.in_punch_key)] = attendance.id
+            recorded[('out', attendance.out_punch_key)] = attendance.id
+
+        pending = []
+        for index, parsed in valid:
+            attendance_id = recorded.get((parsed['type'], parsed['key']))
+            if attendance_id:
+                results[index].update(status=PUNCH_DUPLICATE, attendance_id=attendance_id,
+                                      message='Đã ghi nhận trước đó')
+            else:
+                pending.append((index, parsed))
+        if not pending:
+            return results
+        pending.sort(key=lambda item: item[1]['timestamp'])
+
+        # Các bản ghi liên quan trong 1 câu truy vấn: bản ghi đang mở và bản ghi từ ngày
+        # của lần chấm công sớm nhất trở đi
+        range_start = self._get_local_day_bounds(employee, pending[0][1]['timestamp'])[0]
+        existing = self.sudo().search_fetch([
+            ('employee_id', '=', employee_id),
+            '|', '|', ('check_out', '=', False), ('check_out', '>=', range_start), ('check_in', '>=', range_start),
+        ], ['check_in', 'check_out'], order='check_in')
+
+        open_attendance = None
+        last_boundary = None
+        completed_days = set()
+        for attendance in existing:
+            if attendance.check_out:
+                completed_days.add(self._get_local_day_bounds(employee, attendance.check_in)[0])
+            else:
+                open_attendance = {'id': attendance.id, 'check_in': attendance.check_in}
+            boundary = attendance.check_out or attendance.check_in
+            last_boundary = max(last_boundary, boundary) if last_boundary else boundary
+
+        # Áp dụng theo thứ tự thời gian trên bộ nhớ
+        new_attendances = []
+        closing = None
+        for index, parsed in pending:
+            timestamp = parsed['timestamp']
+            day_start = self._get_local_day_bounds(employee, timestamp)[0]
+            result = results[index]
+
+            if parsed['type'] == 'in':
+                if open_attendance:
+                    result['message'] = 'Chưa chấm công ra cho lần chấm công vào trước'
+                    continue
+                if last_boundary and timestamp <= last_boundary:
+                    result['message'] = 'Thời điểm chấm công trước bản ghi chấm công đã có'
+                    continue
+                if day_start in completed_days:
+                    result['message'] = 'Chỉ được phép chấm công tối đa 1 lần trong một ngày'
+                    continue
+                vals = {
+                    'employee_id': employee_id,
+                    'check_in': timestamp,
+                    'in_mode': 'manual',
+                    'in_punch_key': parsed['key'],
+                    'in_latitude': parsed['latitude'],
+                    'in_longitude': parsed['longitude'],
+                }
+                new_attendances.append((vals, [index]))
+                open_attendance = {'vals': vals, 'indexes': new_attendances[-1][1], 'check_in': timestamp}
+            else:
+                if not open_attendance:
+                    result['message'] = 'Không tìm thấy bản ghi chấm công vào. Vui lòng chấm công vào trước.'
+                    continue
+                if timestamp <= open_attendance['check_in']:
+                    result['message'] = 'Thời điểm chấm công ra phải sau chấm công vào'
+                    continue
+                open_day = self._get_local_day_bounds(employee, open_attendance['check_in'])[0]
+                if open_day in completed_days:
+                    result['message'] = 'Chỉ được phép chấm công tối đa 1 lần trong một ngày'
+                    continue
+                out_vals = {
+                    'check_out': timestamp,
+                    'out_mode': 'manual',
+                    'out_punch_key': parsed['key'],
+                    'out_latitude': parsed['latitude'],
+                    'out_longitude': parsed['longitude'],
+                }
+                if 'vals' in open_attendance:
+                    open_attendance['vals'].update(out_vals)
+                    open_attendance['indexes'].append(index)
+                else:
+                    closing = (open_attendance['id'], open_attendance['check_in'], out_vals, index)
+                completed_days.add(open_day)
+                open_attendance = None
+
+            result.update(status=PUNCH_ACCEPTED, message=None)
+            last_boundary = timestamp
+
+        # Bỏ overtime cũ của các ngày được chấm công ra (giống api_check_out)
+        closed_dates = {vals['check_in'].date() for vals, _indexes in new_attendances if vals.get('check_out')}
+        if closing:
+            closed_dates.add(closing[1].date())
+        if closed_dates:
+            self.env['hr.attendance.overtime'].sudo().search([
+                ('employee_id', '=', employee_id),
+                ('date', 'in', sorted(closed_dates)),
+            ]).unlink()
+
+        # Điều kiện đã kiểm tra ở trên, dưới khóa (ràng buộc vẫn chạy khi ghi)
+        attendance_model = self.sudo()
+        if closing:
+            attendance_id, _check_in, out_vals, index = closing
+            attendance_model.browse(attendance_id).write(out_vals)
+            results[index]['attendance_id'] = attendance_id
+        if new_attendances:
+            created = attendance_model.create([vals for vals, _indexes in new_attendances])
+            for attendance, (_vals, indexes) in zip(created, new_attendances):
+                for index in indexes:
+                    results[index]['attendance_id'] = attendance.id
+
+        return results
+
     @api.model
     def auto_checkout_at_midnight(self):
         import datetime
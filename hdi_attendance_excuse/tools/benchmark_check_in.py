@@ -0,0 +1,67 @@
+"""
+Đo số câu SQL mỗi lần chấm công vào/ra: luồng cũ (search + create có ràng buộc) và fast path
+
+Chạy trong odoo shell, mọi dữ liệu tạo ra đều được rollback:
+    odoo-bin shell -d <database> --no-http < hdi_attendance_excuse/tools/benchmark_check_in.py
+"""
+import time
+
+from odoo import fields
+
+ROUNDS = 20
+
+
+def _legacy_check_in(env, employee):
+    """Luồng chấm công vào trước fast path: 2 câu search rồi create() (kiểm tra lại trong create và ràng buộc)"""
+    Attendance = env['hr.attendance']
+    now = fields.Datetime.now()
+    day_start, day_end = Attendance._get_local_day_bounds(employee, now)
+    Attendance.search([('employee_id', '=', employee.id), ('check_out', '=', False)], limit=1)
+    Attendance.search([
+        ('employee_id', '=', employee.id),
+        ('check_in', '>=', day_start),
+        ('check_in', '<', day_end),
+        ('check_out', '!=', False),
+    ])
+    Attendance.sudo().create({'employee_id': employee.id, 'check_in': now, 'in_mode': 'manual'})
+
+
+def _fast_check_in(env, employee):
+    env['hr.attendance'].api_check_in(employee.id)
+
+
+def _fast_check_out(env, employee):
+    env['hr.attendance'].api_check_out(employee.id)
+
+
+def _measure(env, label, prepare, action):
+    """Số câu SQL và thời gian trung bình của action (mỗi vòng chạy trong savepoint rồi rollback)"""
+    cr = env.cr
+    queries = elapsed = 0
+    for index in range(ROUNDS):
+        savepoint = cr.savepoint(flush=False)
+        try:
+            employee = env['hr.employee'].create({'name': f'Benchmark check-in {index}'})
+            prepare(env, employee)
+            env.flush_all()
+            env.invalidate_all()
+            start_count, start_time = cr.sql_log_count, time.perf_counter()
+            action(env, employee)
+            env.flush_all()
+            queries += cr.sql_log_count - start_count
+            elapsed += time.perf_counter() - start_time
+        finally:
+            savepoint.close(rollback=True)
+            env.invalidate_all()
+    print(f'{label:<28} {queries / ROUNDS:6.1f} queries  {elapsed / ROUNDS * 1000:7.2f} ms')
+
+
+def run(env):
+    nothing = lambda env, employee: None
+    _measure(env, 'check-in (legacy)', nothing, _legacy_check_in)
+    _measure(env, 'check-in (fast path)', nothing, _fast_check_in)
+    _measure(env, 'check-out (fast path)', _fast_check_in, _fast_check_out)
+
+
+if 'env' in globals():
+    run(env)  # noqa: F821 - biến có sẵn trong odoo shell
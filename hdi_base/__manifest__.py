@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+{
+    'name': 'HDI Base',
+    'version': '18.0.1.0.0',
+    'category': 'hdi',
+    'summary': 'Tiện ích dùng chung cho các module HDI',
+    'description': """
+HDI Base - các mixin dùng chung (đếm smart button theo nhóm, phân trang keyset, ...)
+    """,
+    'author': 'HDI',
+    'license': 'LGPL-3',
+    'depends': [
+        'base',
+    ],
+    'data': [],
+    'installable': True,
+    'application': False,
+    'auto_install': False,
+}
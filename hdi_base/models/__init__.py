@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import smart_button_mixin
+from . import keyset_pagination_mixin
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.osv import expression
+
+
+class InvalidCursorError(UserError):
+    """Cursor phân trang do client gửi lên không giải mã được (lỗi dữ liệu vào, không phải lỗi server)"""
+
+
+class HdiKeysetPaginationMixin(models.AbstractModel):
+    """Mixin phân trang theo khóa (keyset/cursor) thay cho limit/offset
+
+    Trang sau được lấy bằng điều kiện khoảng trên (sort_field, id) của bản ghi
+    cuối trang trước, nên trang 1 và trang 100 có cùng chi phí nếu có index
+    (..., sort_field, id). Cursor trả cho client là chuỗi base64 không cần hiểu.
+    """
+    _name = 'hdi.keyset.pagination.mixin'
+    _description = 'Mixin phân trang keyset'
+
+    @api.model
+    def _encode_keyset_cursor(self, record, sort_field):
+        """Mã hóa (giá trị sort_field, id) của bản ghi cuối trang thành cursor"""
+        value = record[sort_field]
+        field_type = self._fields[sort_field].type
+        if field_type == 'datetime':
+            value = fields.Datetime.to_string(value)
+        elif field_type == 'date':
+            value = fields.Date.to_string(value)
+        elif field_type == 'many2one':
+            value = value.id
+        payload = json.dumps([value, record.id]).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    @api.model
+    def _decode_keyset_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, record_id = json.loads(payload)
+            return value, int(record_id)
+        except (ValueError, TypeError):
+            raise InvalidCursorError(_('Cursor phân trang không hợp lệ'))
+
+    @api.model
+    def _keyset_search(self, domain, sort_field, limit, cursor=None, descending=True, offset=0):
+        """Tìm 1 trang theo thứ tự (sort_field, id)
+
+        Args:
+            domain (list): Điều kiện lọc
+            sort_field (str): Trường sắp xếp (bắt buộc có giá trị)
+            limit (int): Số bản ghi mỗi trang
+            cursor (str): next_cursor của trang trước; không có thì dùng offset (tương thích cũ)
+            descending (bool): Sắp xếp giảm dần
+            offset (int): Chỉ dùng khi không có cursor
+
+        Returns:
+            tuple: (records, next_cursor) - next_cursor là None ở trang cuối
+        """
+        direction = 'desc' if descending else 'asc'
+        if cursor:
+            value, last_id = self._decode_keyset_cursor(cursor)
+            operator = '<' if descending else '>'
+            domain = expression.AND([domain, [
+                '|', (sort_field, operator, value),
+                '&', (sort_field, '=', value), ('id', operator, last_id),
+            ]])
+            offset = 0
+
+        # Lấy dư 1 bản ghi để biết còn trang sau mà không cần đếm
+        records = self.search(domain, limit=limit + 1, offset=offset, order=f'{sort_field} {direction}, id {direction}')
+        if len(records) <= limit:
+            return records, None
+        records = records[:limit]
+        return records, self._encode_keyset_cursor(records[-1], sort_field)
+
+    @api.model
+    def _keyset_total_count(self, domain, cursor=None, with_count=None):
+        """Tổng số bản ghi - mặc định chỉ đếm ở trang đầu, trang sau đếm khi client yêu cầu"""
+        if with_count is None:
+            with_count = not cursor
+        return self.search_count(domain) if with_count else None
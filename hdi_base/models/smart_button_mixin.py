@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class HdiSmartButtonMixin(models.AbstractModel):
+    """Mixin đếm bản ghi liên quan bằng 1 read_group cho cả recordset
+
+    Dùng cho các trường đếm trên smart button / kanban / list để số query
+    không tăng theo số bản ghi đang hiển thị.
+    """
+    _name = 'hdi.smart.button.mixin'
+    _description = 'Mixin đếm smart button theo nhóm'
+
+    def _get_grouped_count_map(self, comodel_name, domain, groupby, aggregate='__count'):
+        """Đếm bản ghi của comodel theo 1 trường groupby - 1 query
+
+        Returns:
+            dict: {giá trị groupby (id nếu là many2one): số lượng}
+        """
+        groups = self.env[comodel_name]._read_group(domain, [groupby], [aggregate])
+        field = self.env[comodel_name]._fields[groupby]
+        if field.type == 'many2one':
+            return {record.id: count for record, count in groups}
+        return dict(groups)
+
+    def _get_related_count_map(self, comodel_name, inverse_name, domain=None, distinct_field=None, field_name=None):
+        """Đếm bản ghi comodel trỏ về từng bản ghi của self qua inverse_name
+
+        Bản ghi đang sửa trên form (onchange) được đếm theo field_name trong bộ nhớ
+        nếu có, không thì dùng số liệu của bản ghi gốc trong DB.
+
+        Args:
+            comodel_name (str): Model cần đếm
+            inverse_name (str): Trường many2one trên comodel trỏ về self
+            domain (list): Điều kiện lọc thêm
+            distinct_field (str): Nếu có, đếm số giá trị khác nhau của trường này
+            field_name (str): Trường one2many của self tương ứng với inverse_name
+
+        Returns:
+            dict: {record.id: số lượng} cho mọi bản ghi trong self
+        """
+        origin_ids = [rid for rid in self._origin.ids if rid]
+        counts = {}
+        if origin_ids:
+            aggregate = f'{distinct_field}:count_distinct' if distinct_field else '__count'
+            counts = self._get_grouped_count_map(
+                comodel_name,
+                [(inverse_name, 'in', origin_ids)] + list(domain or []),
+                inverse_name,
+                aggregate,
+            )
+        result = {}
+        for record in self:
+            if field_name and not (record._origin.id and record.id == record._origin.id):
+                # Đang sửa trên form: dữ liệu chưa lưu DB
+                related = record[field_name].filtered_domain(list(domain or []))
+                result[record.id] = len(related.mapped(distinct_field)) if distinct_field else len(related)
+            else:
+                result[record.id] = counts.get(record._origin.id, 0)
+        return result
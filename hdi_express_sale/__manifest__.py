@@ -4,7 +4,7 @@
     'category': 'hdi',
     'description': 'Extended sales management features for HDI',
     'author': 'HDI',
-    'depends': ['sale_management', 'bus'],
+    'depends': ['sale_management', 'bus', 'hdi_base'],
     'data': [
         'data/express_shipping_order_sequence.xml',
         'security/ir.model.access.csv',
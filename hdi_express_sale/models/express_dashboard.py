@@ -4,6 +4,7 @@ import json
 
 class ShippingOrderDashboard(models.TransientModel):
     _name = 'shipping.order.dashboard'
+    _inherit = ['hdi.smart.button.mixin']
     _description = 'Bảng điều khiển Phiếu Gửi Hàng'
 
     # Thống kê tổng quan - Cards trên đầu
@@ -76,23 +77,21 @@ class ShippingOrderDashboard(models.TransientModel):
         readonly=True
     )
 
+    def _get_state_counts(self):
+        """Đếm đơn của user hiện tại theo trạng thái - 1 query cho tất cả thẻ thống kê"""
+        return self._get_grouped_count_map(
+            'shipping.order', [('sender_id', '=', self.env.user.id)], 'state'
+        )
+
     @api.depends()
     def _compute_statistics(self):
         """Calculate main statistics for top cards"""
+        state_counts = self._get_state_counts()
         for record in self:
-            current_user = self.env.user
-            domain = [('sender_id', '=', current_user.id)]
-            
-            total = self.env['shipping.order'].search_count(domain)
-            delivered = self.env['shipping.order'].search_count(
-                domain + [('state', '=', 'delivered')]
-            )
-            cancelled = self.env['shipping.order'].search_count(
-                domain + [('state', '=', 'cancelled')]
-            )
-            pending = self.env['shipping.order'].search_count(
-                domain + [('state', 'in', ['waiting_pickup', 'in_transit', 'forwarded'])]
-            )
+            total = sum(state_counts.values())
+            delivered = state_counts.get('delivered', 0)
+            cancelled = state_counts.get('cancelled', 0)
+            pending = sum(state_counts.get(state, 0) for state in ['waiting_pickup', 'in_transit', 'forwarded'])
             
             success_rate = (delivered / total * 100) if total > 0 else 0
             
@@ -105,22 +104,14 @@ class ShippingOrderDashboard(models.TransientModel):
     @api.depends()
     def _compute_detailed_statistics(self):
         """Calculate detailed statistics for charts"""
+        state_counts = self._get_state_counts()
         for record in self:
-            current_user = self.env.user
-            domain = [('sender_id', '=', current_user.id)]
-            
-            record.waiting_pickup_orders = self.env['shipping.order'].search_count(
-                domain + [('state', '=', 'waiting_pickup')]
-            )
-            record.in_transit_orders = self.env['shipping.order'].search_count(
-                domain + [('state', '=', 'in_transit')]
-            )
-            record.return_orders = self.env['shipping.order'].search_count(
-                domain + [('state', 'in', ['return_approved', 'return_completed'])]
-            )
-            record.forwarded_orders = self.env['shipping.order'].search_count(
-                domain + [('state', '=', 'forwarded')]
+            record.waiting_pickup_orders = state_counts.get('waiting_pickup', 0)
+            record.in_transit_orders = state_counts.get('in_transit', 0)
+            record.return_orders = sum(
+                state_counts.get(state, 0) for state in ['return_approved', 'return_completed']
             )
+            record.forwarded_orders = state_counts.get('forwarded', 0)
 
     @api.depends()
     def _compute_chart_data(self):
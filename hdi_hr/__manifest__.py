@@ -11,6 +11,7 @@
     'hr',
     'hr_attendance',
     'hr_holidays',
+    'hdi_base',
   ],
   'data': [
     # Security
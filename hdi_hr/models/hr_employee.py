@@ -1,10 +1,12 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
 from datetime import date
 
 
 class HrEmployee(models.Model):
-    _inherit = 'hr.employee'
+    _name = 'hr.employee'
+    _inherit = ['hr.employee', 'hdi.keyset.pagination.mixin']
 
     start_work_date = fields.Date(
         string='Ngày bắt đầu làm việc',
@@ -17,6 +19,17 @@ class HrEmployee(models.Model):
         store=True
     )
 
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Index phục vụ phân trang keyset danh sách nhân viên (sắp xếp theo tên)
+        create_index(
+            self.env.cr,
+            'hr_employee_name_id_idx',
+            self._table,
+            ['name', 'id'],
+        )
+        return res
+
     @api.depends('start_work_date')
     def _compute_seniority(self):
         """Tính thâm niên hiển thị theo dạng: X năm Y tháng"""
@@ -1,9 +1,23 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools.sql import create_index
 
 
 class HrLeave(models.Model):
-    _inherit = 'hr.leave'
+    _name = 'hr.leave'
+    _inherit = ['hr.leave', 'hdi.keyset.pagination.mixin']
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Index phục vụ phân trang keyset danh sách đơn nghỉ của nhân viên
+        create_index(
+            self.env.cr,
+            'hr_leave_employee_date_from_id_idx',
+            self._table,
+            ['employee_id', 'date_from DESC', 'id DESC'],
+        )
+        return res
 
     @api.model
     def api_get_leave_types(self):
@@ -22,34 +36,41 @@ class HrLeave(models.Model):
         return types_data
 
     @api.model
-    def api_get_remaining_days(self, user_id):
-        """API method để lấy số ngày phép còn lại của user"""
-        current_user = self.env['res.users'].browse(user_id)
-        if not current_user.exists():
-            raise UserError('User không tồn tại')
-
-        employee = current_user.employee_id
-        if not employee:
-            raise UserError('User không phải là nhân viên')
+    def _get_remaining_days_by_type(self, employee):
+        """Số ngày phép còn lại theo từng loại nghỉ (3 câu truy vấn, không phụ thuộc số loại nghỉ)
+
+        Mỗi loại lấy phân bổ đã duyệt gần nhất; số đã dùng là số đơn đã duyệt
+        kể từ ngày bắt đầu của phân bổ đó.
+        """
+        leave_types = self.env['hr.leave.type'].search_fetch([('active', '=', True)], ['name'])
+
+        allocations = {}
+        for allocation in self.env['hr.leave.allocation'].search_fetch([
+            ('employee_id', '=', employee.id),
+            ('holiday_status_id', 'in', leave_types.ids),
+            ('state', '=', 'validate'),
+        ], ['holiday_status_id', 'date_from', 'number_of_days'], order='date_from desc, id desc'):
+            allocations.setdefault(allocation.holiday_status_id.id, allocation)
+
+        used_leaves = {}
+        if allocations:
+            domain = expression.AND([
+                [('employee_id', '=', employee.id), ('state', '=', 'validate')],
+                expression.OR([
+                    [('holiday_status_id', '=', type_id), ('date_from', '>=', allocation.date_from)]
+                    for type_id, allocation in allocations.items()
+                ]),
+            ])
+            used_leaves = {
+                leave_type.id: count
+                for leave_type, count in self._read_group(domain, ['holiday_status_id'], ['__count'])
+            }
 
-        leave_types = self.env['hr.leave.type'].search([('active', '=', True)])
         remaining_days = []
-
         for leave_type in leave_types:
-            allocation = self.env['hr.leave.allocation'].search([
-                ('employee_id', '=', employee.id),
-                ('holiday_status_id', '=', leave_type.id),
-                ('state', '=', 'validate'),
-            ], order='date_from desc', limit=1)
-
+            allocation = allocations.get(leave_type.id)
             if allocation:
-                used_leaves = self.search_count([
-                    ('employee_id', '=', employee.id),
-                    ('holiday_status_id', '=', leave_type.id),
-                    ('state', '=', 'validate'),
-                    ('date_from', '>=', allocation.date_from),
-                ])
-                remaining = allocation.number_of_days - used_leaves
+                remaining = allocation.number_of_days - used_leaves.get(leave_type.id, 0)
             else:
                 remaining = 0
 
@@ -58,6 +79,20 @@ class HrLeave(models.Model):
                 'leave_type_name': leave_type.name,
                 'remaining_days': remaining,
             })
+        return remaining_days
+
+    @api.model
+    def api_get_remaining_days(self, user_id):
+        """API method để lấy số ngày phép còn lại của user"""
+        current_user = self.env['res.users'].browse(user_id)
+        if not current_user.exists():
+            raise UserError('User không tồn tại')
+
+        employee = current_user.employee_id
+        if not employee:
+            raise UserError('User không phải là nhân viên')
+
+        remaining_days = self._get_remaining_days_by_type(employee)
 
         return {
             'employee_id': employee.id,
@@ -66,8 +101,12 @@ class HrLeave(models.Model):
         }
 
     @api.model
-    def api_get_leave_list(self, user_id, limit=10, offset=0, state=None):
-        """API method để lấy danh sách đơn xin nghỉ"""
+    def api_get_leave_list(self, user_id, limit=10, offset=0, state=None, cursor=None, with_count=None):
+        """API method để lấy danh sách đơn xin nghỉ
+
+        Phân trang keyset: truyền next_cursor của trang trước vào cursor;
+        total_count chỉ tính ở trang đầu hoặc khi with_count=True.
+        """
         current_user = self.env['res.users'].browse(user_id)
         if not current_user.exists():
             raise UserError('User không tồn tại')
@@ -88,8 +127,8 @@ class HrLeave(models.Model):
             domain.append(('state', '=', state))
 
         # Lấy danh sách leave
-        leaves = self.search(domain, limit=limit, offset=offset, order='date_from desc')
-        total_count = self.search_count(domain)
+        leaves, next_cursor = self._keyset_search(domain, 'date_from', limit, cursor=cursor, offset=offset)
+        total_count = self._keyset_total_count(domain, cursor, with_count)
 
         leaves_data = []
         for leave in leaves:
@@ -98,8 +137,8 @@ class HrLeave(models.Model):
                 'employee_id': leave.employee_id.id,
                 'employee_name': leave.employee_id.name,
                 'leave_type': leave.holiday_status_id.name,
-                'date_from': leave.date_from.isoformat() if leave.date_from else None,
-                'date_to': leave.date_to.isoformat() if leave.date_to else None,
+                'date_from': leave.date_from or None,
+                'date_to': leave.date_to or None,
                 'number_of_days': leave.number_of_days,
                 'state': leave.state,
             })
@@ -109,6 +148,7 @@ class HrLeave(models.Model):
             'total_count': total_count,
             'limit': limit,
             'offset': offset,
+            'next_cursor': next_cursor,
         }
 
     @api.model
@@ -138,8 +178,8 @@ class HrLeave(models.Model):
             'employee_id': leave.employee_id.id,
             'employee_name': leave.employee_id.name,
             'leave_type': leave.holiday_status_id.name,
-            'date_from': leave.date_from.isoformat() if leave.date_from else None,
-            'date_to': leave.date_to.isoformat() if leave.date_to else None,
+            'date_from': leave.date_from or None,
+            'date_to': leave.date_to or None,
             'number_of_days': leave.number_of_days,
             'state': leave.state,
             'name': leave.name or '',
@@ -191,8 +231,8 @@ class HrLeave(models.Model):
             'id': leave.id,
             'employee_id': leave.employee_id.id,
             'leave_type': leave.holiday_status_id.name,
-            'date_from': leave.date_from.isoformat() if leave.date_from else None,
-            'date_to': leave.date_to.isoformat() if leave.date_to else None,
+            'date_from': leave.date_from or None,
+            'date_to': leave.date_to or None,
             'state': leave.state,
         }
 
@@ -237,8 +277,8 @@ class HrLeave(models.Model):
             'id': self.id,
             'employee_id': self.employee_id.id,
             'leave_type': self.holiday_status_id.name,
-            'date_from': self.date_from.isoformat() if self.date_from else None,
-            'date_to': self.date_to.isoformat() if self.date_to else None,
+            'date_from': self.date_from or None,
+            'date_to': self.date_to or None,
             'state': self.state,
         }
 
@@ -12,6 +12,7 @@ HDI Payroll Management System
     'license': 'LGPL-3',
     'depends': [
         'base',
+        'hdi_base',
         'hr',
         'hr_contract',
         'hr_attendance',
@@ -31,6 +32,7 @@ HDI Payroll Management System
         'data/hr_tax_bracket_data.xml',
         'data/hr_allowance_type_data.xml',
         'data/hr_salary_rule_data.xml',
+        'data/hr_payroll_cron.xml',
 
         # Views - Placeholder
         'views/hr_employee_views.xml',
@@ -41,6 +43,11 @@ HDI Payroll Management System
         'views/hr_loan_views.xml',
         'views/hr_discipline_views.xml',
         'views/hr_tax_views.xml',
+        'views/hr_payslip_recompute_views.xml',
+        'views/hr_payslip_archive_views.xml',
+
+        # Wizards
+        'wizard/hr_payslip_comparison_wizard_views.xml',
 
         # Menu
         'views/menu.xml',
@@ -5,6 +5,8 @@ from . import hr_contract
 from . import hr_payroll_structure
 from . import hr_salary_rule
 from . import hr_payslip
+from . import hr_payslip_recompute
+from . import hr_payslip_archive
 from . import hr_allowance
 from . import hr_loan
 from . import hr_discipline
@@ -3,6 +3,14 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
 
+# Các trường hợp đồng ảnh hưởng tới kết quả tính lương
+CONTRACT_PAYROLL_FIELDS = [
+    'wage', 'insurance_salary',
+    'meal_allowance', 'transport_allowance', 'phone_allowance',
+    'housing_allowance', 'onsite_allowance', 'uniform_allowance',
+    'position_allowance', 'responsibility_allowance', 'other_allowance',
+]
+
 
 class HrContract(models.Model):
     _inherit = 'hr.contract'
@@ -127,3 +135,28 @@ class HrContract(models.Model):
                       (not a.date_from or a.date_from <= date_to) and
                       (not a.date_to or a.date_to >= date_from)
         )
+
+    def write(self, vals):
+        changed = set(vals) & set(CONTRACT_PAYROLL_FIELDS)
+        res = super().write(vals)
+        if changed and not self.env.context.get('skip_payslip_recompute'):
+            self._enqueue_affected_payslips(changed)
+        return res
+
+    def _enqueue_affected_payslips(self, changed_fields):
+        """Đưa phiếu lương bị ảnh hưởng bởi thay đổi hợp đồng vào hàng đợi
+
+        Ngày hiệu lực lấy từ context 'payroll_effective_date' (nếu có),
+        mặc định là ngày bắt đầu hợp đồng.
+        """
+        effective_date = self.env.context.get('payroll_effective_date')
+        Payslip = self.env['hr.payslip'].sudo()
+        Queue = self.env['hr.payslip.recompute.queue'].sudo()
+        for contract in self:
+            payslips = Payslip._search_recompute_candidates(
+                employee_ids=contract.employee_id.ids,
+                date_from=effective_date or contract.date_start,
+                date_to=contract.date_end,
+                contract_ids=contract.ids,
+            )
+            Queue._enqueue_payslips(payslips, 'contract', contract, changed_fields)
@@ -4,7 +4,8 @@ from odoo import api, fields, models, _
 
 
 class HrEmployee(models.Model):
-    _inherit = 'hr.employee'
+    _name = 'hr.employee'
+    _inherit = ['hr.employee', 'hdi.smart.button.mixin']
 
     # ==================== THÔNG TIN THUẾ ====================
     tax_id = fields.Char('Mã số thuế', tracking=True)
@@ -44,6 +45,15 @@ class HrEmployee(models.Model):
     total_loan_balance = fields.Monetary('Tổng nợ còn lại', currency_field='currency_id',
                                          compute='_compute_loan_balance')
 
+    # Tổng hợp công nợ (lưu DB) - cập nhật khi trả góp qua hr.loan.balance
+    loan_debt_count = fields.Integer('Số khoản còn nợ', compute='_compute_loan_debt_summary', store=True)
+    loan_debt_advance = fields.Monetary('Nợ tạm ứng', currency_field='currency_id',
+                                        compute='_compute_loan_debt_summary', store=True)
+    loan_debt_loan = fields.Monetary('Nợ khoản vay', currency_field='currency_id',
+                                     compute='_compute_loan_debt_summary', store=True)
+    loan_debt_total = fields.Monetary('Tổng công nợ', currency_field='currency_id',
+                                      compute='_compute_loan_debt_summary', store=True)
+
     # ==================== KHEN THƯỞNG/KỶ LUẬT ====================
     discipline_ids = fields.One2many('hr.discipline', 'employee_id', string='Kỷ luật')
     reward_ids = fields.One2many('hr.reward', 'employee_id', string='Khen thưởng')
@@ -54,8 +64,10 @@ class HrEmployee(models.Model):
 
     @api.depends('dependent_ids', 'dependent_ids.is_active')
     def _compute_dependent_count(self):
+        counts = self._get_related_count_map(
+            'hr.employee.dependent', 'employee_id', [('is_active', '=', True)], field_name='dependent_ids')
         for employee in self:
-            employee.dependent_count = len(employee.dependent_ids.filtered('is_active'))
+            employee.dependent_count = counts[employee.id]
 
     @api.depends('personal_deduction', 'dependent_count', 'dependent_deduction')
     def _compute_total_deduction(self):
@@ -63,19 +75,49 @@ class HrEmployee(models.Model):
             employee.total_deduction = employee.personal_deduction + (
                         employee.dependent_count * employee.dependent_deduction)
 
+    def _read_group_loans(self, domain, groupby, aggregates):
+        """read_group trên hr.loan cho cả recordset nhân viên (bỏ qua bản ghi chưa lưu)"""
+        employee_ids = [eid for eid in self._origin.ids if eid]
+        if not employee_ids:
+            return []
+        return self.env['hr.loan'].sudo()._read_group(
+            [('employee_id', 'in', employee_ids)] + domain, groupby, aggregates,
+        )
+
     def _compute_loan_count(self):
+        counts = self.sudo()._get_related_count_map(
+            'hr.loan', 'employee_id', [('state', '=', 'approved'), ('balance', '>', 0)])
         for employee in self:
-            employee.active_loan_count = len(
-                employee.loan_ids.filtered(lambda l: l.state == 'approved' and l.balance > 0))
+            employee.active_loan_count = counts[employee.id]
 
     def _compute_loan_balance(self):
+        groups = self._read_group_loans(
+            [('state', '=', 'approved')], ['employee_id'], ['balance:sum'])
+        balance_map = {employee.id: balance for employee, balance in groups}
+        for employee in self:
+            employee.total_loan_balance = balance_map.get(employee._origin.id, 0.0)
+
+    @api.depends('loan_ids.state', 'loan_ids.balance', 'loan_ids.loan_type')
+    def _compute_loan_debt_summary(self):
+        groups = self._read_group_loans(
+            [('state', '=', 'approved'), ('balance', '>', 0)],
+            ['employee_id', 'loan_type'], ['__count', 'balance:sum'])
+        summary = {}
+        for employee, loan_type, count, balance in groups:
+            vals = summary.setdefault(employee.id, {'count': 0, 'advance': 0.0, 'loan': 0.0})
+            vals['count'] += count
+            vals[loan_type] += balance
         for employee in self:
-            employee.total_loan_balance = sum(
-                employee.loan_ids.filtered(lambda l: l.state == 'approved').mapped('balance'))
+            vals = summary.get(employee._origin.id, {'count': 0, 'advance': 0.0, 'loan': 0.0})
+            employee.loan_debt_count = vals['count']
+            employee.loan_debt_advance = vals['advance']
+            employee.loan_debt_loan = vals['loan']
+            employee.loan_debt_total = vals['advance'] + vals['loan']
 
     def _compute_payslip_count(self):
+        counts = self._get_related_count_map('hr.payslip', 'employee_id')
         for employee in self:
-            employee.payslip_count = len(employee.payslip_ids)
+            employee.payslip_count = counts[employee.id]
 
     def action_view_payslips(self):
         self.ensure_one()
@@ -61,10 +61,11 @@ class HrLoan(models.Model):
             else:
                 loan.installment_amount = loan.amount
 
-    @api.depends('line_ids.paid')
+    @api.depends('amount', 'line_ids.paid', 'line_ids.amount')
     def _compute_balance(self):
+        paid_map = self._get_paid_amount_map()
         for loan in self:
-            loan.paid_amount = sum(loan.line_ids.filtered('paid').mapped('amount'))
+            loan.paid_amount = paid_map.get(loan.id, 0.0)
             loan.balance = loan.amount - loan.paid_amount
             # Chỉ chuyển sang 'paid' nếu có giá trị khoản vay > 0
             # và số tiền đã trả >= tổng khoản vay. Tránh trường hợp mới tạo (amount=0)
@@ -74,6 +75,23 @@ class HrLoan(models.Model):
             elif loan.state == 'paid' and loan.paid_amount < loan.amount:
                 loan.state = 'approved'
 
+    def _get_paid_amount_map(self):
+        """Tổng số tiền đã trả theo khoản vay - 1 query cho cả recordset
+
+        Bản ghi chưa lưu (onchange) vẫn tính trên bộ nhớ vì DB chưa có dữ liệu.
+        """
+        stored_loans = self.filtered(lambda l: isinstance(l.id, int))
+        paid_map = {}
+        if stored_loans:
+            groups = self.env['hr.loan.line'].sudo()._read_group(
+                [('loan_id', 'in', stored_loans.ids), ('paid', '=', True)],
+                ['loan_id'], ['amount:sum'],
+            )
+            paid_map = {loan.id: amount for loan, amount in groups}
+        for loan in self - stored_loans:
+            paid_map[loan.id] = sum(loan.line_ids.filtered('paid').mapped('amount'))
+        return paid_map
+
     def action_approve(self):
         """Duyệt khoản vay"""
         for loan in self:
@@ -6,8 +6,12 @@ from dateutil.relativedelta import relativedelta
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools import float_round
+from odoo.tools.sql import create_index
 from datetime import timedelta
 
+# Chỉ phiếu lương chưa duyệt mới được tính lại khi có thay đổi hồi tố
+RECOMPUTE_PAYSLIP_STATES = ('draft', 'verify')
+
 
 class HrPayslip(models.Model):
     _name = 'hr.payslip'
@@ -141,11 +145,45 @@ class HrPayslip(models.Model):
     # Payment
     paid_date = fields.Date('Ngày thanh toán', readonly=True, copy=False)
 
+    # Lưu trữ chi tiết (kỳ đã đóng)
+    is_lines_archived = fields.Boolean('Đã lưu trữ chi tiết', readonly=True, copy=False)
+    archive_ids = fields.One2many('hr.payslip.archive', 'slip_id', 'Lưu trữ')
+    archive_content_html = fields.Html('Chi tiết lưu trữ', compute='_compute_archive_content_html', sanitize=False)
+
     _sql_constraints = [
         ('payslip_employee_unique', 'unique(employee_id, date_from, date_to, company_id)',
          'Mỗi nhân viên chỉ có 1 phiếu lương trong 1 kỳ!')
     ]
 
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Index phục vụ tìm phiếu lương bị ảnh hưởng khi thay đổi hồi tố
+        create_index(
+            self.env.cr,
+            'hr_payslip_recompute_lookup_idx',
+            self._table,
+            ['employee_id', 'date_to', 'date_from', 'struct_id'],
+            where="state IN ('draft', 'verify')",
+        )
+        return res
+
+    @api.model
+    def _search_recompute_candidates(self, employee_ids=None, date_from=None, date_to=None,
+                                    struct_ids=None, contract_ids=None):
+        """Tìm phiếu lương chưa duyệt bị ảnh hưởng theo nhân viên, kỳ lương, cấu trúc"""
+        domain = [('state', 'in', RECOMPUTE_PAYSLIP_STATES)]
+        if employee_ids is not None:
+            domain.append(('employee_id', 'in', list(employee_ids)))
+        if date_from:
+            domain.append(('date_to', '>=', date_from))
+        if date_to:
+            domain.append(('date_from', '<=', date_to))
+        if struct_ids is not None:
+            domain.append(('struct_id', 'in', list(struct_ids)))
+        if contract_ids is not None:
+            domain.append(('contract_id', 'in', list(contract_ids)))
+        return self.search(domain)
+
     @api.depends('line_ids.total')
     def _compute_summary(self):
         """Tính tổng các khoản từ salary rule lines"""
@@ -168,6 +206,15 @@ class HrPayslip(models.Model):
             net_line = lines.filtered(lambda l: l.code == 'NET')
             payslip.net_wage = sum(net_line.mapped('total'))
 
+    @api.depends('archive_ids')
+    def _compute_archive_content_html(self):
+        for payslip in self:
+            payslip.archive_content_html = payslip.archive_ids[:1].content_html or False
+
+    def action_print_archive(self):
+        """In chi tiết phiếu lương từ bản lưu trữ"""
+        return self.env.ref('hdi_hr_payroll.action_report_payslip_archive').report_action(self.archive_ids)
+
     @api.onchange('employee_id', 'date_from', 'date_to')
     def _onchange_employee(self):
         """Tự động điền contract khi chọn nhân viên"""
@@ -326,6 +373,8 @@ class HrPayslip(models.Model):
                 raise UserError(_('Vui lòng chọn Nhân viên trước khi tính lương!'))
             if not payslip.contract_id:
                 raise UserError(_('Vui lòng chọn Hợp đồng trước khi tính lương!'))
+            if payslip.is_lines_archived:
+                raise UserError(_('Chi tiết phiếu lương %s đã được lưu trữ, không thể tính lại!') % payslip.name)
 
             # Tự động chọn cấu trúc lương nếu chưa có
             if not payslip.struct_id:
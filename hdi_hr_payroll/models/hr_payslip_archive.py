@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from dateutil.relativedelta import relativedelta
+from markupsafe import Markup, escape
+
+from odoo import api, fields, models, _
+from odoo.tools import format_amount
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_HORIZON_MONTHS = 24
+
+ARCHIVE_LINE_FIELDS = [
+    'slip_id', 'salary_rule_id', 'name', 'code', 'category_id', 'sequence',
+    'quantity', 'rate', 'amount', 'total', 'appears_on_payslip',
+]
+ARCHIVE_WORKED_DAYS_FIELDS = ['slip_id', 'work_entry_type_id', 'name', 'code', 'number_of_days', 'number_of_hours', 'sequence']
+ARCHIVE_INPUT_FIELDS = ['slip_id', 'name', 'code', 'amount', 'sequence']
+
+
+class HrPayslipArchive(models.Model):
+    """Lưu trữ chi tiết phiếu lương đã đóng kỳ - 1 tài liệu JSON cho mỗi phiếu
+
+    Giữ cho các bảng hr.payslip.line / input / worked.days nhỏ gọn.
+    """
+    _name = 'hr.payslip.archive'
+    _description = 'Lưu trữ chi tiết phiếu lương'
+    _order = 'date_from desc, id desc'
+
+    slip_id = fields.Many2one('hr.payslip', 'Phiếu lương', required=True, ondelete='cascade', index=True)
+    employee_id = fields.Many2one(related='slip_id.employee_id', store=True)
+    date_from = fields.Date(related='slip_id.date_from', store=True)
+    date_to = fields.Date(related='slip_id.date_to', store=True)
+    company_id = fields.Many2one(related='slip_id.company_id', store=True)
+    currency_id = fields.Many2one(related='slip_id.currency_id')
+
+    data = fields.Json('Dữ liệu lưu trữ', readonly=True)
+    line_count = fields.Integer('Số dòng lương', readonly=True)
+    archived_date = fields.Datetime('Ngày lưu trữ', readonly=True, default=fields.Datetime.now)
+
+    content_html = fields.Html('Chi tiết', compute='_compute_content_html', sanitize=False)
+
+    _sql_constraints = [
+        ('slip_unique', 'unique(slip_id)', 'Mỗi phiếu lương chỉ có 1 bản lưu trữ!')
+    ]
+
+    def _compute_content_html(self):
+        for archive in self:
+            archive.content_html = archive._render_archive_html()
+
+    def _render_archive_html(self):
+        """Hiển thị dữ liệu JSON dạng bảng (dùng cho form và bản in)"""
+        self.ensure_one()
+        data = self.data or {}
+        currency = self.currency_id
+
+        def table(title, headers, rows):
+            head = ''.join(f'<th>{escape(h)}</th>' for h in headers)
+            body = ''.join(
+                '<tr>' + ''.join(f'<td>{escape(cell)}</td>' for cell in row) + '</tr>'
+                for row in rows
+            )
+            return (f'<h5>{escape(title)}</h5><table class="table table-sm o_main_table">'
+                    f'<thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>')
+
+        def money(value):
+            return format_amount(self.env, value or 0.0, currency) if currency else value
+
+        html = table(_('Chi tiết lương'), [_('Tên'), _('Mã'), _('Số lượng'), _('Tỷ lệ (%)'), _('Đơn giá'), _('Thành tiền')], [
+            (l['name'], l['code'], l['quantity'], l['rate'], money(l['amount']), money(l['total']))
+            for l in data.get('lines', []) if l.get('appears_on_payslip', True)
+        ])
+        html += table(_('Ngày công'), [_('Mô tả'), _('Mã'), _('Số ngày'), _('Số giờ')], [
+            (w['name'], w['code'], w['number_of_days'], w['number_of_hours'])
+            for w in data.get('worked_days', [])
+        ])
+        html += table(_('Các khoản khác'), [_('Tên'), _('Mã'), _('Số tiền')], [
+            (i['name'], i['code'], money(i['amount']))
+            for i in data.get('inputs', [])
+        ])
+        return Markup(html)
+
+    @api.model
+    def _get_archive_horizon_months(self):
+        value = self.env['ir.config_parameter'].sudo().get_param('hdi_hr_payroll.archive_horizon_months')
+        try:
+            return int(value) if value else DEFAULT_ARCHIVE_HORIZON_MONTHS
+        except ValueError:
+            return DEFAULT_ARCHIVE_HORIZON_MONTHS
+
+    @api.model
+    def _cron_archive_closed_payslips(self, batch_size=500):
+        """Chuyển chi tiết phiếu lương đã thanh toán, cũ hơn horizon, sang bảng lưu trữ"""
+        cutoff = fields.Date.today().replace(day=1) - relativedelta(months=self._get_archive_horizon_months())
+        domain = [
+            ('state', '=', 'paid'),
+            ('date_to', '<', cutoff),
+            ('is_lines_archived', '=', False),
+        ]
+        Payslip = self.env['hr.payslip'].sudo()
+        payslips = Payslip.search(domain, order='date_to, id', limit=batch_size)
+        if payslips:
+            self._archive_payslips(payslips)
+        self.env['ir.cron']._notify_progress(done=len(payslips), remaining=Payslip.search_count(domain))
+        return True
+
+    @api.model
+    def _archive_payslips(self, payslips):
+        """Đóng gói line/input/worked days thành JSON rồi xóa trực tiếp bằng SQL
+
+        Xóa bằng SQL (không qua ORM) để không kích hoạt tính lại các trường tổng
+        (basic_wage, gross_wage, net_wage...) đã lưu trên phiếu lương.
+        """
+        slip_ids = payslips.ids
+        documents = {slip_id: {'lines': [], 'worked_days': [], 'inputs': []} for slip_id in slip_ids}
+
+        for model_name, field_names, key in [
+            ('hr.payslip.line', ARCHIVE_LINE_FIELDS, 'lines'),
+            ('hr.payslip.worked.days', ARCHIVE_WORKED_DAYS_FIELDS, 'worked_days'),
+            ('hr.payslip.input', ARCHIVE_INPUT_FIELDS, 'inputs'),
+        ]:
+            rows = self.env[model_name].sudo().search_read(
+                [('slip_id', 'in', slip_ids)], field_names, order='slip_id, sequence, id', load=None)
+            for row in rows:
+                slip_id = row.pop('slip_id')
+                row.pop('id', None)
+                documents[slip_id][key].append(row)
+
+        # Bổ sung mã nhóm để bản in không phụ thuộc dữ liệu cấu hình hiện tại
+        category_ids = {l['category_id'] for doc in documents.values() for l in doc['lines'] if l['category_id']}
+        category_codes = {
+            category.id: category.code
+            for category in self.env['hr.salary.rule.category'].sudo().browse(category_ids)
+        }
+        for doc in documents.values():
+            for line in doc['lines']:
+                line['category_code'] = category_codes.get(line['category_id'])
+
+        self.sudo().create([{
+            'slip_id': slip_id,
+            'data': doc,
+            'line_count': len(doc['lines']),
+        } for slip_id, doc in documents.items()])
+
+        cr = self.env.cr
+        for table in ('hr_payslip_line', 'hr_payslip_worked_days', 'hr_payslip_input'):
+            cr.execute(f"DELETE FROM {table} WHERE slip_id = ANY(%s)", [slip_ids])
+        cr.execute("UPDATE hr_payslip SET is_lines_archived = TRUE WHERE id = ANY(%s)", [slip_ids])
+
+        for model_name in ('hr.payslip.line', 'hr.payslip.worked.days', 'hr.payslip.input'):
+            self.env[model_name].invalidate_model()
+        payslips.invalidate_recordset(['line_ids', 'worked_days_line_ids', 'input_line_ids', 'is_lines_archived'])
+        _logger.info("Archived lines of %s payslips", len(slip_ids))
+        return True
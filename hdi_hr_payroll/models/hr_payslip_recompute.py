@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models, _
+
+from .hr_payslip import RECOMPUTE_PAYSLIP_STATES
+
+_logger = logging.getLogger(__name__)
+
+
+class HrPayslipRecomputeQueue(models.Model):
+    """Hàng đợi tính lại phiếu lương khi hợp đồng / quy tắc lương thay đổi hồi tố"""
+    _name = 'hr.payslip.recompute.queue'
+    _description = 'Hàng đợi tính lại phiếu lương'
+    _order = 'create_date desc, id desc'
+
+    payslip_id = fields.Many2one('hr.payslip', 'Phiếu lương', required=True, ondelete='cascade', index=True)
+    employee_id = fields.Many2one(related='payslip_id.employee_id', store=True, index=True)
+    date_from = fields.Date(related='payslip_id.date_from', store=True)
+    date_to = fields.Date(related='payslip_id.date_to', store=True)
+
+    reason = fields.Selection([
+        ('contract', 'Thay đổi hợp đồng'),
+        ('salary_rule', 'Thay đổi quy tắc lương'),
+    ], 'Lý do', required=True)
+    source_ref = fields.Reference([
+        ('hr.contract', 'Hợp đồng'),
+        ('hr.salary.rule', 'Quy tắc lương'),
+    ], 'Nguồn thay đổi')
+    changed_fields = fields.Char('Trường thay đổi')
+
+    state = fields.Selection([
+        ('pending', 'Chờ tính lại'),
+        ('done', 'Đã tính lại'),
+        ('failed', 'Lỗi'),
+    ], 'Trạng thái', default='pending', required=True, index=True)
+
+    old_net_wage = fields.Monetary('Thực lĩnh cũ')
+    new_net_wage = fields.Monetary('Thực lĩnh mới')
+    net_wage_delta = fields.Monetary('Chênh lệch', compute='_compute_net_wage_delta', store=True)
+
+    error_message = fields.Text('Lỗi')
+    processed_date = fields.Datetime('Thời điểm tính lại', readonly=True)
+
+    company_id = fields.Many2one(related='payslip_id.company_id', store=True)
+    currency_id = fields.Many2one(related='payslip_id.currency_id')
+
+    @api.depends('state', 'old_net_wage', 'new_net_wage')
+    def _compute_net_wage_delta(self):
+        for entry in self:
+            entry.net_wage_delta = entry.new_net_wage - entry.old_net_wage if entry.state == 'done' else 0.0
+
+    @api.model
+    def _enqueue_payslips(self, payslips, reason, source=None, changed_fields=None):
+        """Đưa phiếu lương vào hàng đợi (bỏ qua phiếu đã có bản ghi chờ xử lý)"""
+        if not payslips:
+            return self.browse()
+
+        pending = self.search([('payslip_id', 'in', payslips.ids), ('state', '=', 'pending')])
+        queued_ids = set(pending.mapped('payslip_id').ids)
+        source_ref = f'{source._name},{source.id}' if source else False
+
+        vals_list = [{
+            'payslip_id': payslip.id,
+            'reason': reason,
+            'source_ref': source_ref,
+            'changed_fields': ', '.join(sorted(changed_fields or [])),
+            'old_net_wage': payslip.net_wage,
+        } for payslip in payslips if payslip.id not in queued_ids]
+
+        entries = self.create(vals_list)
+        if entries:
+            cron = self.env.ref('hdi_hr_payroll.ir_cron_payslip_recompute_queue', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        return entries
+
+    @api.model
+    def _cron_process_queue(self, batch_size=100):
+        """Tính lại các phiếu lương trong hàng đợi theo từng lô"""
+        entries = self.search([('state', '=', 'pending')], order='id', limit=batch_size)
+        for entry in entries:
+            payslip = entry.payslip_id
+            if payslip.state not in RECOMPUTE_PAYSLIP_STATES:
+                entry.write({
+                    'state': 'failed',
+                    'error_message': _('Phiếu lương đã ở trạng thái %s, không tính lại') % payslip.state,
+                    'processed_date': fields.Datetime.now(),
+                })
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    payslip.compute_sheet()
+                    entry.write({
+                        'state': 'done',
+                        'new_net_wage': payslip.net_wage,
+                        'error_message': False,
+                        'processed_date': fields.Datetime.now(),
+                    })
+            except Exception as e:
+                _logger.warning("Recompute payslip %s failed: %s", payslip.id, e)
+                entry.write({
+                    'state': 'failed',
+                    'error_message': str(e),
+                    'processed_date': fields.Datetime.now(),
+                })
+
+        remaining = self.search_count([('state', '=', 'pending')])
+        self.env['ir.cron']._notify_progress(done=len(entries), remaining=remaining)
+        return True
+
+    @api.model
+    def get_net_wage_delta_by_employee(self, domain=None):
+        """Tổng chênh lệch thực lĩnh theo nhân viên - dùng cho báo cáo rà soát"""
+        groups = self._read_group(
+            [('state', '=', 'done')] + list(domain or []),
+            ['employee_id'], ['net_wage_delta:sum', '__count'],
+        )
+        return [{
+            'employee_id': employee.id,
+            'employee_name': employee.name,
+            'net_wage_delta': delta,
+            'payslip_count': count,
+        } for employee, delta, count in groups]
+
+    def action_retry(self):
+        """Đưa lại các bản ghi lỗi vào hàng đợi"""
+        self.filtered(lambda e: e.state == 'failed').write({'state': 'pending', 'error_message': False})
+        cron = self.env.ref('hdi_hr_payroll.ir_cron_payslip_recompute_queue', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return True
+
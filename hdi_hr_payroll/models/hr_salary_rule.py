@@ -4,6 +4,14 @@ from odoo import api, fields, models, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.exceptions import UserError, ValidationError
 
+# Các trường quy tắc lương ảnh hưởng tới kết quả tính lương
+SALARY_RULE_PAYROLL_FIELDS = [
+    'active', 'sequence', 'category_id', 'struct_id',
+    'condition_select', 'condition_range', 'condition_python',
+    'amount_select', 'amount_fixed', 'amount_percentage',
+    'amount_percentage_base', 'amount_python_compute',
+]
+
 
 class HrSalaryRule(models.Model):
     _name = 'hr.salary.rule'
@@ -141,3 +149,20 @@ result = contract.wage
                 raise UserError(_('Lỗi tính toán Python của rule %s: %s\n\nCode:\n%s') % (
                     self.code, str(e), self.amount_python_compute
                 ))
+
+    def write(self, vals):
+        changed = set(vals) & set(SALARY_RULE_PAYROLL_FIELDS)
+        old_structs = self._get_payroll_structures() if changed else None
+        res = super().write(vals)
+        if changed and not self.env.context.get('skip_payslip_recompute'):
+            structs = old_structs | self._get_payroll_structures()
+            payslips = self.env['hr.payslip'].sudo()._search_recompute_candidates(struct_ids=structs.ids)
+            self.env['hr.payslip.recompute.queue'].sudo()._enqueue_payslips(
+                payslips, 'salary_rule', self[:1], changed)
+        return res
+
+    def _get_payroll_structures(self):
+        """Cấu trúc lương đang dùng các rule này (qua struct_id hoặc rule_ids)"""
+        structs = self.mapped('struct_id')
+        structs |= self.env['hr.payroll.structure'].sudo().search([('rule_ids', 'in', self.ids)])
+        return structs
@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 
-# Wizard files will be imported here
+from . import hr_payslip_comparison_wizard
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+DEFAULT_PERCENT_THRESHOLD = 20.0
+DEFAULT_AMOUNT_THRESHOLD = 500000.0
+
+
+class HrPayslipComparisonWizard(models.TransientModel):
+    """So sánh chi tiết lương giữa 2 kỳ - tính bằng 1 câu SQL gom nhóm"""
+    _name = 'hr.payslip.comparison.wizard'
+    _description = 'So sánh phiếu lương giữa 2 kỳ'
+
+    current_date_from = fields.Date(
+        'Kỳ này - từ ngày', required=True,
+        default=lambda self: fields.Date.today().replace(day=1)
+    )
+    current_date_to = fields.Date(
+        'Kỳ này - đến ngày', required=True,
+        default=lambda self: fields.Date.today().replace(day=1) + relativedelta(months=1, days=-1)
+    )
+    previous_date_from = fields.Date(
+        'Kỳ trước - từ ngày', required=True,
+        default=lambda self: fields.Date.today().replace(day=1) - relativedelta(months=1)
+    )
+    previous_date_to = fields.Date(
+        'Kỳ trước - đến ngày', required=True,
+        default=lambda self: fields.Date.today().replace(day=1) - relativedelta(days=1)
+    )
+
+    percent_threshold = fields.Float(
+        'Ngưỡng chênh lệch (%)',
+        default=lambda self: self._get_threshold_param('percent_threshold', DEFAULT_PERCENT_THRESHOLD),
+        help='Dòng có |% thay đổi| >= ngưỡng này được đánh dấu bất thường'
+    )
+    amount_threshold = fields.Float(
+        'Ngưỡng chênh lệch (số tiền)',
+        default=lambda self: self._get_threshold_param('amount_threshold', DEFAULT_AMOUNT_THRESHOLD),
+        help='Chỉ đánh dấu bất thường khi |chênh lệch| >= số tiền này'
+    )
+
+    company_id = fields.Many2one('res.company', 'Công ty', required=True, default=lambda self: self.env.company)
+    line_ids = fields.One2many('hr.payslip.comparison.line', 'wizard_id', 'Chi tiết so sánh')
+
+    @api.model
+    def _get_threshold_param(self, key, default):
+        value = self.env['ir.config_parameter'].sudo().get_param(f'hdi_hr_payroll.comparison_{key}')
+        try:
+            return float(value) if value else default
+        except ValueError:
+            return default
+
+    def action_compare(self):
+        """Tính chênh lệch theo nhân viên / mã rule và mở danh sách kết quả"""
+        self.ensure_one()
+        if self.current_date_from > self.current_date_to or self.previous_date_from > self.previous_date_to:
+            raise UserError(_('Ngày bắt đầu phải trước ngày kết thúc!'))
+
+        self.line_ids.unlink()
+        self._compute_comparison_lines()
+
+        return {
+            'name': _('So sánh lương %s - %s') % (
+                self.previous_date_from.strftime('%m/%Y'), self.current_date_from.strftime('%m/%Y')),
+            'type': 'ir.actions.act_window',
+            'res_model': 'hr.payslip.comparison.line',
+            'view_mode': 'list',
+            'domain': [('wizard_id', '=', self.id)],
+            'context': {'search_default_outlier': 1},
+        }
+
+    def _compute_comparison_lines(self):
+        """INSERT ... SELECT: gom nhóm 2 kỳ theo (nhân viên, mã rule) trong 1 lần quét"""
+        self.ensure_one()
+        self.env['hr.payslip'].flush_model(['employee_id', 'date_from', 'date_to', 'state', 'company_id'])
+        self.env['hr.payslip.line'].flush_model(['slip_id', 'code', 'name', 'total'])
+
+        self.env.cr.execute("""
+            WITH period_totals AS (
+                SELECT s.employee_id,
+                       l.code,
+                       MAX(l.name) AS name,
+                       SUM(l.total) FILTER (WHERE s.date_from >= %(cur_from)s AND s.date_to <= %(cur_to)s) AS current_total,
+                       SUM(l.total) FILTER (WHERE s.date_from >= %(prev_from)s AND s.date_to <= %(prev_to)s) AS previous_total
+                  FROM hr_payslip_line l
+                  JOIN hr_payslip s ON s.id = l.slip_id
+                 WHERE s.company_id = %(company_id)s
+                   AND s.state != 'cancel'
+                   AND ((s.date_from >= %(cur_from)s AND s.date_to <= %(cur_to)s)
+                     OR (s.date_from >= %(prev_from)s AND s.date_to <= %(prev_to)s))
+              GROUP BY s.employee_id, l.code
+            ), deltas AS (
+                SELECT t.employee_id,
+                       t.code,
+                       t.name,
+                       COALESCE(t.previous_total, 0) AS previous_total,
+                       COALESCE(t.current_total, 0) AS current_total,
+                       COALESCE(t.current_total, 0) - COALESCE(t.previous_total, 0) AS delta
+                  FROM period_totals t
+            )
+            INSERT INTO hr_payslip_comparison_line (
+                wizard_id, employee_id, department_id, code, name,
+                previous_total, current_total, delta, delta_percent, is_outlier,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT %(wizard_id)s,
+                   d.employee_id,
+                   e.department_id,
+                   d.code,
+                   d.name,
+                   d.previous_total,
+                   d.current_total,
+                   d.delta,
+                   CASE WHEN d.previous_total != 0 THEN d.delta / ABS(d.previous_total) * 100 END,
+                   ABS(d.delta) >= %(amount_threshold)s
+                       AND (d.previous_total = 0
+                            OR ABS(d.delta / d.previous_total * 100) >= %(percent_threshold)s),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM deltas d
+              JOIN hr_employee e ON e.id = d.employee_id
+        """, {
+            'wizard_id': self.id,
+            'company_id': self.company_id.id,
+            'cur_from': self.current_date_from,
+            'cur_to': self.current_date_to,
+            'prev_from': self.previous_date_from,
+            'prev_to': self.previous_date_to,
+            'amount_threshold': abs(self.amount_threshold),
+            'percent_threshold': abs(self.percent_threshold),
+            'uid': self.env.uid,
+        })
+        self.env['hr.payslip.comparison.line'].invalidate_model()
+        self.invalidate_recordset(['line_ids'])
+
+
+class HrPayslipComparisonLine(models.TransientModel):
+    _name = 'hr.payslip.comparison.line'
+    _description = 'Dòng so sánh phiếu lương'
+    _order = 'is_outlier desc, employee_id, code'
+
+    wizard_id = fields.Many2one('hr.payslip.comparison.wizard', required=True, ondelete='cascade', index=True)
+    employee_id = fields.Many2one('hr.employee', 'Nhân viên', readonly=True)
+    department_id = fields.Many2one('hr.department', 'Phòng ban', readonly=True)
+    code = fields.Char('Mã', readonly=True)
+    name = fields.Char('Khoản lương', readonly=True)
+
+    previous_total = fields.Float('Kỳ trước', digits='Payroll', readonly=True)
+    current_total = fields.Float('Kỳ này', digits='Payroll', readonly=True)
+    delta = fields.Float('Chênh lệch', digits='Payroll', readonly=True)
+    delta_percent = fields.Float('Chênh lệch (%)', digits=(16, 2), readonly=True)
+    is_outlier = fields.Boolean('Bất thường', readonly=True)
@@ -12,6 +12,7 @@ HDI Warehouse Management System
     'depends': [
         'stock',
         'barcodes',
+        'hdi_base',
     ],
     'data': [
         # Security
@@ -7,7 +7,7 @@ from odoo.exceptions import UserError, ValidationError
 class HdiBatch(models.Model):
     _name = 'hdi.batch'
     _description = 'Batch / LPN / Pallet'
-    _inherit = ['mail.thread', 'mail.activity.mixin', 'barcodes.barcode_events_mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'barcodes.barcode_events_mixin', 'hdi.smart.button.mixin']
     _order = 'create_date desc, id desc'
 
     # ===== BASIC INFO =====
@@ -235,15 +235,19 @@ class HdiBatch(models.Model):
 
     @api.depends('move_ids', 'quant_ids')
     def _compute_counts(self):
+        move_counts = self._get_related_count_map('stock.move', 'batch_id', field_name='move_ids')
+        quant_counts = self._get_related_count_map('stock.quant', 'batch_id', field_name='quant_ids')
         for batch in self:
-            batch.move_count = len(batch.move_ids)
-            batch.quant_count = len(batch.quant_ids)
+            batch.move_count = move_counts[batch.id]
+            batch.quant_count = quant_counts[batch.id]
 
     @api.depends('quant_ids.product_id')
     def _compute_product_count(self):
         """Count distinct products in batch"""
+        counts = self._get_related_count_map(
+            'stock.quant', 'batch_id', distinct_field='product_id', field_name='quant_ids')
         for batch in self:
-            batch.product_count = len(batch.quant_ids.mapped('product_id'))
+            batch.product_count = counts[batch.id]
 
     def action_start_receiving(self):
         """Start receiving process"""
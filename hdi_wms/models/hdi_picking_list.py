@@ -8,7 +8,7 @@ class HdiPickingList(models.Model):
     """Bảng kê lấy hàng - Picking List for warehouse operations"""
     _name = 'hdi.picking.list'
     _description = 'Bảng kê lấy hàng'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'hdi.smart.button.mixin']
     _order = 'create_date desc, id desc'
 
     # ===== BASIC INFO =====
@@ -186,8 +186,9 @@ class HdiPickingList(models.Model):
 
     @api.depends('line_ids')
     def _compute_line_count(self):
+        counts = self._get_related_count_map('hdi.picking.list.line', 'picking_list_id', field_name='line_ids')
         for rec in self:
-            rec.line_count = len(rec.line_ids)
+            rec.line_count = counts[rec.id]
 
     @api.depends('line_ids.planned_qty', 'line_ids.picked_qty', 'line_ids.scanned_qty')
     def _compute_quantities(self):
@@ -5,7 +5,8 @@ from odoo import models, fields
 
 class ProductProduct(models.Model):
 
-    _inherit = 'product.product'
+    _name = 'product.product'
+    _inherit = ['product.product', 'hdi.smart.button.mixin']
     
     abc_classification = fields.Selection([
         ('a', 'Class A - Fast Moving'),
@@ -30,8 +31,6 @@ class ProductProduct(models.Model):
     )
     
     def _compute_batch_count(self):
+        counts = self._get_related_count_map('hdi.batch', 'product_id', [('state', '!=', 'cancel')])
         for product in self:
-            product.batch_count = self.env['hdi.batch'].search_count([
-                ('product_id', '=', product.id),
-                ('state', '!=', 'cancel'),
-            ])
+            product.batch_count = counts[product.id]
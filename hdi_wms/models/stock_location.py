@@ -5,7 +5,8 @@ from odoo.exceptions import ValidationError
 
 
 class StockLocation(models.Model):
-    _inherit = 'stock.location'
+    _name = 'stock.location'
+    _inherit = ['stock.location', 'hdi.smart.button.mixin']
 
     # ===== WAREHOUSE COORDINATES =====
     coordinate_x = fields.Integer(
@@ -196,8 +197,9 @@ class StockLocation(models.Model):
     @api.depends('batch_ids')
     def _compute_batch_count(self):
         """Count batches in location"""
+        counts = self._get_related_count_map('hdi.batch', 'location_id', field_name='batch_ids')
         for location in self:
-            location.batch_count = len(location.batch_ids)
+            location.batch_count = counts[location.id]
 
     def action_view_batches(self):
         """View all batches in this location"""
@@ -5,7 +5,8 @@ from odoo.exceptions import UserError
 
 
 class StockPicking(models.Model):
-    _inherit = 'stock.picking'
+    _name = 'stock.picking'
+    _inherit = ['stock.picking', 'hdi.smart.button.mixin']
 
     batch_ids = fields.One2many(
         'hdi.batch',
@@ -275,14 +276,16 @@ class StockPicking(models.Model):
 
     @api.depends('batch_ids')
     def _compute_batch_count(self):
+        counts = self._get_related_count_map('hdi.batch', 'picking_id', field_name='batch_ids')
         for picking in self:
-            picking.batch_count = len(picking.batch_ids)
+            picking.batch_count = counts[picking.id]
 
     @api.depends('picking_list_ids')
     def _compute_picking_list_count(self):
         """Count picking lists"""
+        counts = self._get_related_count_map('hdi.picking.list', 'picking_id', field_name='picking_list_ids')
         for picking in self:
-            picking.picking_list_count = len(picking.picking_list_ids)
+            picking.picking_list_count = counts[picking.id]
 
     def action_create_batch(self):
         self.ensure_one()